@@ -0,0 +1,278 @@
+import json
+import os
+import shutil
+import sys
+import time
+import tracemalloc
+from typing import Callable
+
+from benchmarks.synthetic import SyntheticDataset
+from death_app.data.data_loader import DataLoader
+from death_app.data.data_validator import DataValidator
+from death_app.data.dataset_cache import DatasetCache
+from death_app.data.processor import DataProcessor
+from death_app.plots.plotter import Plotter
+
+# countries x years x causes
+SCALES = {
+    "small": (100, 30, 40),
+    "medium": (1000, 60, 150),
+    "large": (5000, 60, 300),
+}
+PATH_TO_DATA = "res/benchmarks"
+PATH_TO_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+class Case:
+    """
+    One measured call, setup runs before each call and isn't measured
+    """
+
+    def __init__(
+        self, function: Callable[[], object], setup: Callable[[], None] = None
+    ) -> None:
+        """
+        :param function: function without arguments which calls measured method
+        :param setup: function which prepares state before each call, e.g. clears cache
+        """
+        self.function = function
+        self.setup = setup or (lambda: None)
+
+    def measure(self, repeat: int) -> dict[str, float]:
+        """
+        Measure time of call, the best of repeats, and peak of memory allocated by it in a separate call,
+        so tracing of allocations doesn't slow down measured time
+        :param repeat: number of timed calls
+        :return: dictionary with 'seconds' and 'peak_mb'
+        """
+        seconds = []
+        for _ in range(repeat):
+            self.setup()
+            start = time.perf_counter()
+            self.function()
+            seconds.append(time.perf_counter() - start)
+        self.setup()
+        tracemalloc.start()
+        try:
+            self.function()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return {"seconds": min(seconds), "peak_mb": peak / 2**20}
+
+
+def make_cases(path_to_death: str, path_to_index: str) -> dict[str, Case]:
+    """
+    Calls of public methods of loader, processor, plotter and validator with typical input of the app.
+    Saving and exporting figures to files isn't measured.
+    :param path_to_death: path to death dataset
+    :param path_to_index: path to index dataset
+    :return: name of case -> case
+    """
+    cache = DatasetCache(path_to_death)
+    loader = DataLoader(path_to_death, path_to_index)
+    processor, plotter = DataProcessor(), Plotter()
+    validator = DataValidator(path_to_death, path_to_index)
+
+    def clear(*properties: str) -> Callable[[], None]:
+        return lambda: [loader.__dict__.pop(name, None) for name in properties]
+
+    countries = loader.get_list_of_countries()[:20]
+    start, end = loader.get_range_years_for_country(countries)
+    years = (start, end)
+    levels = loader.get_types_of_development()
+    cause = loader.get_death_causes()[0]
+    top = 10
+    rows = loader.get_data_from_specific_countries_and_year(countries, start, end)
+    rates = loader.get_rates_from_specific_countries_and_year(countries, start, end)
+    summed = loader.get_summed_data_from_specific_countries(countries, start, end)
+    development_rows = loader.get_data_by_level_of_development(levels, start, end)
+    development_summed = loader.get_summed_data_by_level_of_development(
+        levels, start, end
+    )
+    development_years = loader.get_data_by_level_of_development_and_year(
+        levels, start, end
+    )
+
+    cases = {
+        "DataLoader.__init__ csv": Case(
+            lambda: DataLoader(path_to_death, path_to_index),
+            lambda: shutil.rmtree(cache.path_to_cache, ignore_errors=True),
+        ),
+        "DataLoader.__init__ cache": Case(
+            lambda: DataLoader(path_to_death, path_to_index)
+        ),
+        "DataLoader.cumulative_rows": Case(
+            lambda: loader.cumulative_rows, clear("cumulative_rows")
+        ),
+        "DataLoader.cumulative_development": Case(
+            lambda: loader.cumulative_development,
+            clear("development_table", "cumulative_development"),
+        ),
+        "DataLoader.data": Case(lambda: loader.data),
+        "DataLoader.get_list_of_countries": Case(loader.get_list_of_countries),
+        "DataLoader.get_death_causes": Case(loader.get_death_causes),
+        "DataLoader.get_types_of_development": Case(loader.get_types_of_development),
+        "DataLoader.get_range_years_for_country": Case(
+            lambda: loader.get_range_years_for_country(countries)
+        ),
+        "DataLoader.get_range_of_years_for_development": Case(
+            loader.get_range_of_years_for_development
+        ),
+        "DataLoader.get_data_from_specific_countries_and_year": Case(
+            lambda: loader.get_data_from_specific_countries_and_year(
+                countries, start, end
+            )
+        ),
+        "DataLoader.get_rates_from_specific_countries_and_year": Case(
+            lambda: loader.get_rates_from_specific_countries_and_year(
+                countries, start, end
+            )
+        ),
+        "DataLoader.get_summed_data_from_specific_countries": Case(
+            lambda: loader.get_summed_data_from_specific_countries(
+                countries, start, end
+            )
+        ),
+        "DataLoader.get_data_by_level_of_development": Case(
+            lambda: loader.get_data_by_level_of_development(levels, start, end)
+        ),
+        "DataLoader.get_summed_data_by_level_of_development": Case(
+            lambda: loader.get_summed_data_by_level_of_development(levels, start, end)
+        ),
+        "DataLoader.get_data_by_level_of_development_and_year": Case(
+            lambda: loader.get_data_by_level_of_development_and_year(levels, start, end)
+        ),
+        "DataProcessor.get_top_causes_summed_by_range_of_year": Case(
+            lambda: processor.get_top_causes_summed_by_range_of_year(summed, top)
+        ),
+        "DataProcessor.get_top_causes_in_each_year": Case(
+            lambda: processor.get_top_causes_in_each_year(rows, top)
+        ),
+        "DataProcessor.get_trend_cause_in_each_year_in_countries": Case(
+            lambda: processor.get_trend_cause_in_each_year_in_countries(rows, cause)
+        ),
+        "DataProcessor.get_top_causes_summed_by_level_of_develop": Case(
+            lambda: processor.get_top_causes_summed_by_level_of_develop(
+                development_rows, top
+            )
+        ),
+        "DataProcessor.get_top_causes_in_each_year_by_level_of_develop": Case(
+            lambda: processor.get_top_causes_in_each_year_by_level_of_develop(
+                development_years, top
+            )
+        ),
+        "DataProcessor.get_trend_cause_in_each_year_by_level_of_develop": Case(
+            lambda: processor.get_trend_cause_in_each_year_by_level_of_develop(
+                development_years, cause
+            )
+        ),
+        "Plotter.plot_summed": Case(lambda: plotter.plot_summed(summed, top, years)),
+        "Plotter.plot_in_each_year": Case(
+            lambda: plotter.plot_in_each_year(
+                rates, top, years, countries, per_capita=True
+            )
+        ),
+        "Plotter.plot_trend_cause_in_each_year": Case(
+            lambda: plotter.plot_trend_cause_in_each_year(
+                rates, cause, years, per_capita=True
+            )
+        ),
+        "Plotter.plot_summed_development": Case(
+            lambda: plotter.plot_summed_development(development_summed, top, years)
+        ),
+        "Plotter.plot_development_in_each_year": Case(
+            lambda: plotter.plot_development_in_each_year(development_years, top, years)
+        ),
+        "Plotter.plot_trend_cause_by_development_by_year": Case(
+            lambda: plotter.plot_trend_cause_by_development_by_year(
+                development_years, cause, years
+            )
+        ),
+        "DataValidator.check_pipeline": Case(validator.check_pipeline),
+        "DataValidator.validate": Case(validator.validate),
+    }
+    for name in dir(validator):
+        if name.startswith("check_") and name != "check_pipeline":
+            cases[f"DataValidator.{name}"] = Case(getattr(validator, name))
+    return cases
+
+
+def find_regressions(
+    results: dict[str, dict],
+    baseline: dict[str, dict],
+    tolerance: float = 0.5,
+    min_seconds: float = 0.005,
+    min_mb: float = 1.0,
+) -> list[str]:
+    """
+    Compare results with baseline, small absolute differences are ignored as noise
+    :param results: name of case -> measured 'seconds' and 'peak_mb'
+    :param baseline: the same for stored baseline
+    :param tolerance: allowed relative growth, e.g. 0.5 for 50 %
+    :param min_seconds: allowed absolute growth of time
+    :param min_mb: allowed absolute growth of memory
+    :return: description of each regression
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for measure, slack, unit in [
+            ("seconds", min_seconds, "s"),
+            ("peak_mb", min_mb, "MB"),
+        ]:
+            limit = max(
+                baseline[name][measure] * (1 + tolerance),
+                baseline[name][measure] + slack,
+            )
+            if result[measure] > limit:
+                regressions.append(
+                    f"{name}: {measure} {result[measure]:.4f} {unit} > {limit:.4f} {unit} "
+                    f"(baseline {baseline[name][measure]:.4f} {unit})"
+                )
+    return regressions
+
+
+def run(scale: str, update: bool = False, repeat: int = 3) -> list[str]:
+    """
+    Generate datasets, measure all cases and compare them with baseline of scale
+    :param scale: name of scale, e.g. 'small', or 'countriesxyearsxcauses', e.g. '200x30x50'
+    :param update: if True results are saved as new baseline
+    :param repeat: number of timed calls of each case
+    :return: regressions, empty if there aren't any
+    """
+    size = SCALES.get(scale) or tuple(int(number) for number in scale.split("x"))
+    path_to_death, path_to_index = SyntheticDataset(*size).write(PATH_TO_DATA)
+    results = {}
+    for name, case in make_cases(path_to_death, path_to_index).items():
+        results[name] = case.measure(repeat)
+        print(
+            f"{name:<70} {results[name]['seconds'] * 1000:10.2f} ms "
+            f"{results[name]['peak_mb']:10.2f} MB"
+        )
+    baselines = {}
+    if os.path.exists(PATH_TO_BASELINE):
+        with open(PATH_TO_BASELINE) as file:
+            baselines = json.load(file)
+    if update or scale not in baselines:
+        baselines[scale] = results
+        with open(PATH_TO_BASELINE, "w") as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+        print(f"Baseline of {scale} saved in {PATH_TO_BASELINE}")
+        if not update:
+            print(
+                "Regressions weren't checked, there wasn't any baseline of this scale"
+            )
+        return []
+    return find_regressions(results, baselines[scale])
+
+
+if __name__ == "__main__":
+    regressions = run(
+        sys.argv[1] if len(sys.argv) > 1 else "small",
+        update=len(sys.argv) > 2 and sys.argv[2] == "update",
+    )
+    for regression in regressions:
+        print(f"Regression {regression}")
+    sys.exit(1 if regressions else 0)
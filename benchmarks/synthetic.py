@@ -0,0 +1,121 @@
+import os
+import string
+
+import numpy as np
+import pandas as pd
+
+
+class SyntheticDataset:
+    """
+    Generates valid datasets in format of your own datasets at any scale: countries x years x causes.
+    Each country has continuous years, population in thousands and numbers of deaths which sum to less than
+    population, so the datasets pass all checks of DataValidator. Index dataset has one row for each country.
+    """
+
+    levels = ["low", "medium", "highly"]
+
+    def __init__(self, countries: int, years: int, causes: int, seed: int = 0) -> None:
+        """
+        :param countries: number of countries, at most 26^3
+        :param years: number of years, from 1990
+        :param causes: number of causes of death
+        :param seed: seed of random numbers, the same seed gives the same datasets
+        """
+        if countries > 26**3:
+            raise ValueError("Number of countries is greater than number of codes")
+        self.countries = countries
+        self.years = years
+        self.causes = causes
+        self.seed = seed
+
+    def codes(self) -> list[str]:
+        """
+        :return: three letter codes of countries, e.g. 'AAB'
+        """
+        letters = string.ascii_uppercase
+        return [
+            letters[number // 676] + letters[number // 26 % 26] + letters[number % 26]
+            for number in range(self.countries)
+        ]
+
+    def death_dataset(self, first: int = 0, count: int = None) -> pd.DataFrame:
+        """
+        :param first: number of first country
+        :param count: number of countries, all countries from first by default
+        :return: dataframe with columns 'country', 'code', 'year', 'population' and 'd: ' causes of death
+        """
+        count = self.countries - first if count is None else count
+        codes = np.repeat(self.codes()[first : first + count], self.years)
+        population, deaths = [], []
+        for country in range(first, first + count):
+            # each country has its own random numbers, so dataset doesn't depend on chunks
+            generator = np.random.default_rng([self.seed, country])
+            people = np.round(generator.uniform(100, 100_000, self.years), 3)
+            # deaths of all causes are at most 1% of population
+            shares = generator.dirichlet(np.ones(self.causes), self.years)
+            population.append(people)
+            deaths.append(
+                np.round(
+                    shares * (people * generator.uniform(0, 0.01, self.years))[:, None],
+                    3,
+                )
+            )
+        population = np.concatenate(population)
+        deaths = np.concatenate(deaths)
+        df = pd.DataFrame(
+            deaths, columns=[f"d: Cause {cause}" for cause in range(self.causes)]
+        )
+        df.insert(0, "country", [f"Country {code}" for code in codes])
+        df.insert(1, "code", codes)
+        df.insert(2, "year", np.tile(np.arange(1990, 1990 + self.years), count))
+        df.insert(3, "population", population)
+        return df
+
+    def index_dataset(self) -> pd.DataFrame:
+        """
+        :return: dataframe with columns 'country', 'code', 'hdi' and 'development'
+        """
+        generator = np.random.default_rng(self.seed + 1)
+        codes = self.codes()
+        hdi = np.round(generator.uniform(0.3, 0.95, self.countries), 3)
+        development = np.where(
+            hdi > 0.8, "highly", np.where(hdi > 0.6, "medium", "low")
+        )
+        return pd.DataFrame(
+            {
+                "country": [f"Country {code}" for code in codes],
+                "code": codes,
+                "hdi": hdi,
+                "development": development,
+            }
+        )
+
+    def write(
+        self, path_to_folder: str, countries_in_chunk: int = 200
+    ) -> tuple[str, str]:
+        """
+        Save datasets to folder, they are made only if they don't exist yet.
+        Death dataset is generated and written in chunks of countries, so big scales fit in memory.
+        :param path_to_folder: path to folder
+        :param countries_in_chunk: number of countries generated at once
+        :return: paths to death dataset and index dataset
+        """
+        name = f"{self.countries}x{self.years}x{self.causes}_{self.seed}"
+        path_to_death = os.path.join(path_to_folder, f"death_{name}.csv")
+        path_to_index = os.path.join(path_to_folder, f"index_{name}.csv")
+        os.makedirs(path_to_folder, exist_ok=True)
+        if not os.path.exists(path_to_death):
+            path_to_tmp = f"{path_to_death}.tmp"
+            for first in range(0, self.countries, countries_in_chunk):
+                self.death_dataset(
+                    first, min(countries_in_chunk, self.countries - first)
+                ).to_csv(
+                    path_to_tmp,
+                    index=False,
+                    header=first == 0,
+                    mode="w" if first == 0 else "a",
+                )
+            os.replace(path_to_tmp, path_to_death)
+        if not os.path.exists(path_to_index):
+            self.index_dataset().to_csv(path_to_index, index=False)
+        return path_to_death, path_to_index
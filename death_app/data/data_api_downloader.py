@@ -2,35 +2,141 @@ import pandas as pd
 import wbgapi as wb
 from numpy import nan
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from death_app.data.fingerprint import atomic_open, read_manifest, write_manifest
 
 
 class DataAPIDownloader:
     """
-    Download data with countries population using WBGAPI
+    Download data with countries population using WBGAPI.
+    Responses are cached on disk for each block of years of indicator, e.g. SP.POP.TOTL 1990-1999,
+    year is downloaded again when it's older than ttl. Years which aren't cached are downloaded
+    for each block at the same time, by at most max_workers requests.
     """
 
+    # Database - (40) - Population estimates and projections
+    database = 40
+    # Measure - (SP.POP.TOTL) - Population, total
+    indicator = "SP.POP.TOTL"
+
     def __init__(
-        self, year_start: int, year_end: int, path_to_save: str, path_to_folder: str
+        self,
+        year_start: int,
+        year_end: int,
+        path_to_save: str,
+        path_to_folder: str,
+        path_to_cache: str = None,
+        ttl_days: float = 30,
+        block_years: int = 10,
+        max_workers: int = 4,
     ) -> None:
+        """
+        :param year_start: first year
+        :param year_end: last year
+        :param path_to_save: path to preprocessed dataset
+        :param path_to_folder: folder of dataset
+        :param path_to_cache: folder with cached responses, 'api_cache' in folder of dataset by default
+        :param ttl_days: number of days after which cached year is downloaded again
+        :param block_years: number of years in one block, blocks start at multiples of it
+        :param max_workers: maximal number of requests at the same time
+        """
         self.year_start = year_start
         self.year_end = year_end
         self.path_to_save = path_to_save
         self.path_to_folder = path_to_folder
+        self.path_to_cache = path_to_cache or os.path.join(path_to_folder, "api_cache")
+        self.ttl = ttl_days * 24 * 3600
+        self.block_years = block_years
+        self.max_workers = max_workers
+        # years downloaded from API, one list for each request
+        self.fetched = []
         self.get_population_dataset()
 
-    def download_population(self) -> pd.DataFrame:
+    def year_blocks(self) -> list[range]:
         """
-        Download dataset from The World Bank Api
-        Database - (40) - Population estimates and projections
-        Measure - (SP.POP.TOTL) - Population, total
-        :return: raw dataframe
+        Split years into blocks which start at multiples of block_years
+        :return: years of each block between year_start and year_end
         """
+        first = self.year_start - self.year_start % self.block_years
+        return [
+            range(
+                max(start, self.year_start),
+                min(start + self.block_years - 1, self.year_end) + 1,
+            )
+            for start in range(first, self.year_end + 1, self.block_years)
+        ]
 
-        wb.db = 40
-        df = wb.data.DataFrame(
-            ["SP.POP.TOTL"], time=range(self.year_start, self.year_end + 1)
+    def path_to_block(self, years: range) -> str:
+        """
+        :param years: years of block
+        :return: path to csv with cached response
+        """
+        start = years.start - years.start % self.block_years
+        return os.path.join(self.path_to_cache, f"{self.indicator}_{start}.csv")
+
+    def fetch(self, years: list[int]) -> pd.DataFrame:
+        """
+        Download years of indicator from The World Bank Api.
+        Axes are given, otherwise WBGAPI drops axis of time when only one year is downloaded.
+        :param years: years
+        :return: raw dataframe, codes of countries in index and columns like 'YR1990'
+        """
+        return wb.data.DataFrame(
+            [self.indicator],
+            time=years,
+            db=self.database,
+            index="economy",
+            columns="time",
         )
-        return df
+
+    def get_block(self, years: range) -> pd.DataFrame:
+        """
+        Read block from cache, years which aren't cached or are too old are downloaded and cached
+        :param years: years of block
+        :return: raw dataframe with columns of years of block
+        """
+        path_to_block = self.path_to_block(years)
+        path_to_meta = os.path.splitext(path_to_block)[0] + ".json"
+        # year -> time when it was downloaded
+        downloaded = (read_manifest(path_to_meta) or {}).get("years", {})
+        cached = None
+        if downloaded:
+            try:
+                cached = pd.read_csv(path_to_block, index_col=0)
+            except (OSError, ValueError):
+                # years of meta are lost with block, so the whole block is downloaded
+                downloaded = {}
+        now = time.time()
+        missing = [
+            year
+            for year in years
+            if now - downloaded.get(str(year), -self.ttl) >= self.ttl
+        ]
+        if missing:
+            df = self.fetch(missing)
+            self.fetched.append(missing)
+            if cached is not None:
+                df = cached.drop(columns=df.columns, errors="ignore").join(
+                    df, how="outer"
+                )
+            os.makedirs(self.path_to_cache, exist_ok=True)
+            with atomic_open(path_to_block) as file:
+                df.to_csv(file)
+            downloaded.update({str(year): now for year in missing})
+            write_manifest(path_to_meta, {"years": downloaded})
+            cached = df
+        columns = [f"YR{year}" for year in years]
+        return cached[[column for column in columns if column in cached.columns]]
+
+    def download_population(self) -> pd.DataFrame:
+        """
+        Download dataset from The World Bank Api or read it from cache
+        :return: raw dataframe
+        """
+        with ThreadPoolExecutor(self.max_workers) as pool:
+            blocks = list(pool.map(self.get_block, self.year_blocks()))
+        return pd.concat(blocks, axis=1)
 
     @staticmethod
     def preprocess_population(df: pd.DataFrame) -> pd.DataFrame:
@@ -39,7 +145,7 @@ class DataAPIDownloader:
         :param df: downloaded dataset
         :return: preprocessed dataframe
         """
-        df = df.reset_index().rename(columns={"index": "code"})
+        df = df.rename_axis("code").reset_index()
         df.columns = df.columns.str.replace("YR", "")
         df = (
             df.set_index("code")
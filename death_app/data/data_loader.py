@@ -1,5 +1,11 @@
+import numpy as np
 import pandas as pd
-from functools import lru_cache
+from functools import cached_property, lru_cache
+from death_app.data.data_preprocessing_pipeline import DataPreprocessingPipeline
+from death_app.data.dataset_cache import DatasetCache
+from death_app.data.fingerprint import file_digest, read_stamp
+from death_app.data.schema import Schema
+from death_app.metrics import metrics
 
 
 class DataLoader:
@@ -9,30 +15,228 @@ class DataLoader:
     Reads dataset and finds rows between specific years with level of development
     """
 
-    def __init__(self, path_to_dataset: str, path_to_index: str) -> None:
-        self.data = self.read_dataframe(path_to_dataset, 1000)
+    memoized = (
+        "get_list_of_countries",
+        "get_number_of_death_causes",
+        "get_death_causes",
+        "get_types_of_development",
+    )
+
+    def __init__(
+        self,
+        path_to_dataset: str,
+        path_to_index: str,
+        memory_map: bool = True,
+        path_to_development: str = None,
+        exact: bool = False,
+    ) -> None:
+        """
+        :param path_to_dataset: path to csv with input dataset
+        :param path_to_index: path to csv with index of development
+        :param memory_map: if True matrices with death causes and rates are mapped read-only from the binary cache,
+        so many app processes share one copy of data in the page cache
+        :param path_to_development: path to csv with data summed by year and level of development made by
+        preprocessing, it's used only if it was made from the same dataset and index
+        :param exact: if True number of deaths and population are float64, otherwise float32
+        """
+        self.schema = Schema(exact)
+        self.path_to_dataset = path_to_dataset
+        self.path_to_index = path_to_index
+        self.path_to_development = path_to_development
+        (
+            self.keys,
+            self.causes,
+            self.rates,
+            self.cause_columns,
+        ) = self.read_cached_dataset(path_to_dataset, memory_map)
         self.index = self.read_dataframe(path_to_index, 1000)
+        self.years = self.keys["year"].to_numpy()
+        self.countries, self.country_start, self.country_stop = self.index_countries()
+        self.country_position = {
+            country: position for position, country in enumerate(self.countries)
+        }
+        self.development_levels, self.development_codes = self.join_development()
+        # caches are bound to instance, cache on class would keep every loaded version of dataset alive
+        for name in self.memoized:
+            setattr(self, name, lru_cache(maxsize=None)(getattr(self, name)))
 
-    @staticmethod
-    def read_dataframe(path_to_file: str, chunk_size: int) -> pd.DataFrame:
+    def read_cached_dataset(
+        self, path_to_file: str, memory_map: bool
+    ) -> tuple[pd.DataFrame, np.ndarray, np.ndarray, list[str]]:
         """
-        Read from csv file
+        Read dataset from binary cache, csv is parsed only if cache is missing or stale
+        :param path_to_file: path to csv file
+        :param memory_map: map matrices with death causes and rates instead of reading them
+        :return: dataframe with columns 'country', 'code', 'year', 'population',
+        matrix with death causes, matrix with deaths per one inhabitant, names of death causes columns
+        """
+        cache = DatasetCache(path_to_file, self.schema.exact)
+        fresh = cache.is_fresh()
+        metrics.count("dataset_cache.hits" if fresh else "dataset_cache.misses")
+        if not fresh:
+            data = self.read_dataframe(path_to_file, 1000)
+            try:
+                cache.save(data)
+            except OSError:
+                # read-only folder, app works on csv
+                data = cache.sort_rows(data)
+                causes = data.iloc[:, 4:].to_numpy(dtype=self.schema.float_type)
+                return (
+                    data.iloc[:, :4],
+                    causes,
+                    cache.rates(causes, data["population"].to_numpy()),
+                    list(data.columns[4:]),
+                )
+        mmap_mode = "r" if memory_map else None
+        return (
+            cache.load_keys(),
+            cache.load_causes(mmap_mode),
+            cache.load_rates(mmap_mode),
+            cache.load_cause_columns(),
+        )
+
+    def index_countries(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Find range of rows for each country, rows are grouped by country and sorted by year
+        :return: countries name, first row of each country, row after last row of each country
+        """
+        country = self.keys["country"].to_numpy()
+        if len(country) == 0:
+            return country, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        # integer codes of categories are compared instead of names
+        codes = self.keys["country"].cat.codes.to_numpy()
+        change = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+        start = np.concatenate([[0], change])
+        stop = np.concatenate([change, [len(country)]])
+        return country[start], start, stop
+
+    def join_development(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Attach level of development to each row by country code, once at load
+        :return: levels of development in order of appearance, code of level for each row (-1 if country
+        doesn't have index of development)
+        """
+        development = self.keys["code"].map(
+            self.index.drop_duplicates("code").set_index("code")["development"]
+        )
+        codes, levels = pd.factorize(development)
+        return np.asarray(levels, dtype=object), codes.astype(np.int8)
+
+    def read_dataframe(self, path_to_file: str, chunk_size: int) -> pd.DataFrame:
+        """
+        Read from csv file with types of schema
         :param path_to_file:
         :param chunk_size:
         :return: dataframe
         """
-        chunk = pd.read_csv(path_to_file, chunksize=chunk_size)
-        return pd.concat(chunk)
+        return self.schema.read_csv(path_to_file, chunk_size)
+
+    @staticmethod
+    def drop_unused_categories(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Keep only categories which are in selected rows, plots and groups are made only for them
+        :param df: small dataframe, e.g. keys of selected rows
+        :return: copy of dataframe
+        """
+        columns = df.select_dtypes("category").columns
+        return df.assign(
+            **{column: df[column].cat.remove_unused_categories() for column in columns}
+        )
+
+    @property
+    def data(self) -> pd.DataFrame:
+        """
+        Whole dataset as one dataframe, it copies all rows so use it only when needed
+        :return: dataframe
+        """
+        return self.get_frame(slice(None))
+
+    @cached_property
+    def cumulative_rows(self) -> np.ndarray:
+        """
+        Prefix sums over rows of population (first column) and number of deaths (next columns).
+        Rows of one country are continuous and sorted by year, so sum for country between years
+        is difference of two rows.
+        :return: 2D array with one row more than dataset, first row is 0
+        """
+        values = np.column_stack([self.keys["population"].to_numpy(), self.causes])
+        cumulative = np.zeros((values.shape[0] + 1, values.shape[1]))
+        # sums of float32 values are accumulated in float64
+        np.cumsum(values, axis=0, dtype=np.float64, out=cumulative[1:])
+        return cumulative
+
+    @cached_property
+    def development_table(self) -> pd.DataFrame:
+        """
+        Population and number of deaths summed by year and level of development.
+        Table made by preprocessing is read if it's up to date, otherwise it's summed from dataset.
+        :return: dataframe with columns 'year', 'development', 'population' and death causes
+        """
+        if self.path_to_development is not None:
+            meta = DatasetCache(self.path_to_dataset, self.schema.exact).read_meta()
+            dataset_digest = (
+                meta["source_sha256"]
+                if meta is not None
+                else file_digest(self.path_to_dataset)
+            )
+            if read_stamp(self.path_to_development) == [
+                dataset_digest,
+                file_digest(self.path_to_index),
+            ]:
+                # small table of sums keeps float64 values
+                return self.schema.read_csv(
+                    self.path_to_development, 1000, values=False
+                )
+        return DataPreprocessingPipeline.aggregate_by_development(self.data, self.index)
+
+    @cached_property
+    def cumulative_development(self) -> tuple[int, np.ndarray]:
+        """
+        Prefix sums over years of population (first column) and number of deaths (next columns)
+        summed by level of development
+        :return: first year, 3D array (level of development, year, values) with one year more, first year is 0
+        """
+        table = self.development_table
+        table = table[table["development"].isin(self.development_levels)]
+        first_year = min(table["year"]) if len(table) else 0
+        summed = np.zeros(
+            (
+                len(self.development_levels),
+                (max(table["year"]) - first_year + 1) if len(table) else 0,
+                table.shape[1] - 2,
+            )
+        )
+        levels = pd.Categorical(
+            table["development"], categories=self.development_levels
+        ).codes
+        summed[levels, table["year"].to_numpy() - first_year] = table.iloc[
+            :, 2:
+        ].to_numpy()
+        cumulative = np.zeros((summed.shape[0], summed.shape[1] + 1, summed.shape[2]))
+        np.cumsum(summed, axis=1, out=cumulative[:, 1:])
+        return first_year, cumulative
+
+    def get_frame(self, rows, values: np.ndarray = None) -> pd.DataFrame:
+        """
+        Build dataframe from selected rows of dataset
+        :param rows: slice (rows are a view of the matrix) or array with row numbers
+        :param values: matrix with death causes of selected rows, default number of deaths
+        :return: dataframe with columns 'country', 'code', 'year', 'population' and death causes
+        """
+        values = self.causes[rows] if values is None else values
+        keys = self.drop_unused_categories(self.keys.iloc[rows])
+        causes = pd.DataFrame(
+            values, columns=self.cause_columns, index=keys.index, copy=False
+        )
+        return pd.concat([keys, causes], axis=1, copy=False)
 
-    @lru_cache(maxsize=None)
     def get_list_of_countries(self) -> list[str]:
         """
         Return list of available countries in application
         :return: list with countries name
         """
-        return list(self.data["country"].unique())
+        return list(self.countries)
 
-    @lru_cache(maxsize=None)
     def get_number_of_death_causes(self) -> int:
         """
         Return number of available causes of death
@@ -40,9 +244,8 @@ class DataLoader:
         next => causes_of_death
         :return: number
         """
-        return len(self.data.columns[4:])
+        return len(self.cause_columns)
 
-    @lru_cache(maxsize=None)
     def get_death_causes(self) -> list[str]:
         """
         Return  available causes of death
@@ -50,20 +253,15 @@ class DataLoader:
         next => causes_of_death "d: causes..."
         :return: list with death causes without "d: "
         """
-        return sorted([name[3:] for name in self.data.columns[4:]])
+        return sorted([name[3:] for name in self.cause_columns])
 
-    @lru_cache(maxsize=None)
     def get_types_of_development(self) -> list[str]:
         """
         Return list with types of development
         :return list of strings
         """
 
-        return list(
-            pd.merge(self.data, self.index, on=["code"], how="inner")[
-                "development"
-            ].unique()
-        )
+        return list(self.development_levels)
 
     def get_range_years_for_country(self, countries: list[str]) -> tuple:
         """
@@ -71,13 +269,18 @@ class DataLoader:
         :param countries: list of countries name
         :return: tuple (min_year, max_year)
         """
-        all_set_with_years = []
+        common_years = None
         for country in countries:
-            all_set_with_years.append(
-                set(self.data[self.data["country"] == country].year)
+            position = self.country_position[country]
+            years = self.years[
+                self.country_start[position] : self.country_stop[position]
+            ]
+            common_years = (
+                years
+                if common_years is None
+                else np.intersect1d(common_years, years, assume_unique=True)
             )
-        set_with_common_year = set.intersection(*tuple(all_set_with_years))
-        return min(set_with_common_year), max(set_with_common_year)
+        return int(min(common_years)), int(max(common_years))
 
     def get_data_from_specific_countries_and_year(
         self, countries: list[str], year_start: int, year_end: int
@@ -89,22 +292,153 @@ class DataLoader:
         :param year_end: maximal year
         :return: filtered dataset
         """
-        return self.data[
-            (self.data["country"].isin(countries))
-            & (self.data["year"].between(year_start, year_end))
+        ranges = self.get_row_ranges(countries, year_start, year_end)
+        if len(ranges) == 1:
+            # one country - matrix is not copied
+            return self.get_frame(slice(*ranges[0]))
+        return self.get_frame(self.join_row_ranges(ranges))
+
+    def get_rates_from_specific_countries_and_year(
+        self, countries: list[str], year_start: int, year_end: int
+    ) -> pd.DataFrame:
+        """
+        Get specific data from dataset with number of deaths per one inhabitant instead of number of deaths
+        :param countries: list of countries name
+        :param year_start: minimal year
+        :param year_end: maximal year
+        :return: filtered dataset, death causes columns contain deaths per one inhabitant
+        """
+        ranges = self.get_row_ranges(countries, year_start, year_end)
+        rows = slice(*ranges[0]) if len(ranges) == 1 else self.join_row_ranges(ranges)
+        return self.get_frame(rows, self.rates[rows])
+
+    def get_rows_from_specific_countries_and_year(
+        self, countries: list[str], year_start: int, year_end: int
+    ) -> np.ndarray:
+        """
+        Get numbers of rows with specific countries between specific years
+        :param countries: list of countries name
+        :param year_start: minimal year
+        :param year_end: maximal year
+        :return: array with row numbers
+        """
+        return self.join_row_ranges(
+            self.get_row_ranges(countries, year_start, year_end)
+        )
+
+    def get_row_ranges(
+        self, countries: list[str], year_start: int, year_end: int
+    ) -> list[tuple[int, int]]:
+        """
+        Find range of rows for each country between specific years
+        :param countries: list of countries name
+        :param year_start: minimal year
+        :param year_end: maximal year
+        :return: list of (first row, row after last row) in order of rows in dataset
+        """
+        ranges = []
+        for country in countries:
+            position = self.country_position.get(country)
+            if position is None:
+                continue
+            start = self.country_start[position]
+            years = self.years[start : self.country_stop[position]]
+            ranges.append(
+                (
+                    start + np.searchsorted(years, year_start, side="left"),
+                    start + np.searchsorted(years, year_end, side="right"),
+                )
+            )
+        return sorted(ranges)
+
+    @staticmethod
+    def join_row_ranges(ranges: list[tuple[int, int]]) -> np.ndarray:
+        """
+        Join ranges of rows to one array with row numbers
+        :param ranges: list of (first row, row after last row)
+        :return: array with row numbers
+        """
+        if not ranges:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(start, stop) for start, stop in ranges])
+
+    def get_summed_data_from_specific_countries(
+        self, countries: list[str], year_start: int, year_end: int
+    ) -> pd.DataFrame:
+        """
+        Get data summed between specific years for each country, from prefix sums
+        :param countries: list of countries name
+        :param year_start: minimal year
+        :param year_end: maximal year
+        :return: dataset with one row for each country, column 'year' contains maximal year
+        """
+        ranges = np.array(
+            self.get_row_ranges(countries, year_start, year_end), dtype=np.int64
+        ).reshape(-1, 2)
+        # countries without data between years are skipped
+        ranges = ranges[ranges[:, 1] > ranges[:, 0]]
+        summed = self.cumulative_rows[ranges[:, 1]] - self.cumulative_rows[ranges[:, 0]]
+        result = self.drop_unused_categories(
+            self.keys.iloc[ranges[:, 0], :2].reset_index(drop=True)
+        )
+        result["year"] = year_end
+        result["population"] = summed[:, 0]
+        return pd.concat(
+            [result, pd.DataFrame(summed[:, 1:], columns=self.cause_columns)], axis=1
+        )
+
+    def get_summed_data_by_level_of_development(
+        self, development: list[str], year_start: int, year_end: int
+    ) -> pd.DataFrame:
+        """
+        Get data summed between specific years for each level of development, from prefix sums
+        :param development: levels of development
+        :param year_start: minimal year
+        :param year_end: maximal year
+        :return: dataset with one row for each level of development, columns 'year' (maximal year),
+        'population', death causes and 'development'
+        """
+        first_year, cumulative = self.cumulative_development
+        start = np.clip(year_start - first_year, 0, cumulative.shape[1] - 1)
+        stop = np.clip(year_end - first_year + 1, 0, cumulative.shape[1] - 1)
+        codes = [
+            code
+            for code, level in enumerate(self.development_levels)
+            if level in development
         ]
+        summed = cumulative[codes, stop] - cumulative[codes, start]
+        result = pd.DataFrame({"year": year_end, "population": summed[:, 0]})
+        result = pd.concat(
+            [result, pd.DataFrame(summed[:, 1:], columns=self.cause_columns)], axis=1
+        )
+        result["development"] = self.development_levels[codes]
+        return result
+
+    def get_data_by_level_of_development_and_year(
+        self, development: list[str], year_start: int, year_end: int
+    ) -> pd.DataFrame:
+        """
+        Get data summed by year and level of development
+        :param development: levels of development
+        :param year_start: minimal year
+        :param year_end: maximal year
+        :return: dataset with columns 'year', 'development', 'population' and death causes
+        """
+        table = self.development_table
+        return self.drop_unused_categories(
+            table[
+                table["year"].between(year_start, year_end)
+                & table["development"].isin(development)
+            ]
+        )
 
     def get_range_of_years_for_development(self) -> tuple:
         """
         Return tuple with minimal and maximal available year for country which have index of development
         :return: minimal year, maximal year
         """
-        develop = (
-            pd.merge(self.data, self.index, on=["code"], how="inner")
-            .drop(columns=["country_y", "hdi"])
-            .rename(columns={"country_x": "country"})
-        )
-        return min(develop["year"]), max(develop["year"])
+        years = self.years[self.development_codes >= 0]
+        return int(min(years)), int(max(years))
 
     def get_data_by_level_of_development(
         self, development: list[str], year_start: int, year_end: int
@@ -116,10 +450,18 @@ class DataLoader:
         :param year_end: maximal year
         :return: filtered dataset with last column 'development' (low, medium, highly)
         """
-        result = self.data[self.data["year"].between(year_start, year_end)]
-        develop = (
-            pd.merge(result, self.index, on=["code"], how="inner")
-            .drop(columns=["country_y", "hdi"])
-            .rename(columns={"country_x": "country"})
+        rows = np.flatnonzero(
+            (self.years >= year_start)
+            & (self.years <= year_end)
+            & np.isin(
+                self.development_codes,
+                [
+                    code
+                    for code, level in enumerate(self.development_levels)
+                    if level in development
+                ],
+            )
         )
-        return develop[develop["development"].isin(development)]
+        result = self.get_frame(rows)
+        result["development"] = self.development_levels[self.development_codes[rows]]
+        return result
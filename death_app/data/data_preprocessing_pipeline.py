@@ -1,5 +1,24 @@
-from numpy import nan, select
+import os
+from typing import Optional
+
+from numpy import float64, nan, select
 import pandas as pd
+from death_app.data.dataset_cache import DatasetCache
+from death_app.data.fingerprint import (
+    RowHashSet,
+    block_names,
+    file_digest,
+    file_stat,
+    hash_blocks,
+    hash_frame,
+    hash_json,
+    read_manifest,
+    read_stage_stamp,
+    write_manifest,
+    write_stage_stamp,
+    write_stamp,
+)
+from death_app.data.schema import Schema
 
 
 class DataPreprocessingPipeline:
@@ -8,8 +27,19 @@ class DataPreprocessingPipeline:
     - annual-number-of-deaths-by-cause.csv
     - human-development-index.csv
     - population_since_1990.csv if download from google drive
+    In streaming mode death dataset is never loaded whole, it's cleaned, joined with population
+    and saved chunk by chunk. To drop duplicates across chunks 8 bytes hash of each distinct row is kept,
+    so memory grows with number of rows, but much slower than memory of whole dataset.
+    Datasets are read and saved with compact types of Schema, float64 values only in exact mode.
+    With manifest only (code, year) blocks of death and population data sets which changed since the last run
+    are preprocessed again and merged into saved datasets. If no raw data set changed, nothing is read.
+    Death, population and index data sets are read and preprocessed by independent stages, which can run
+    at the same time before make_app_input. With cache of stages, stage whose inputs and parameters
+    are the same as when it made its saved output is skipped.
     """
 
+    version = 1
+
     def __init__(
         self,
         path_death: str,
@@ -20,28 +50,43 @@ class DataPreprocessingPipeline:
         path_index: str,
         path_save_index: str,
         path_to_save_input: str,
+        path_save_development: str = None,
+        streaming: bool = False,
+        chunk_size: int = 100_000,
+        exact: bool = False,
+        path_to_manifest: str = None,
+        cache_stages: bool = False,
     ) -> None:
+        self.schema = Schema(exact)
+        self.cache_stages = cache_stages
+        # stage -> hash of its inputs and parameters
+        self.keys = {}
+        self.skipped = set()
+        self.path_to_manifest = path_to_manifest
+        self.manifest = None
+        self.updated = False
         self.population_from_api = population_from_api
-        self.df_death = self.read_dataset(path_to_file=path_death, chunk_size=1000)
-        if not self.population_from_api:
-            self.df_population = self.read_dataset(
-                path_to_file=path_population, chunk_size=100
-            )
-        else:
-            self.df_population = self.read_dataset(
-                path_to_file=path_save_population, chunk_size=1000
-            )
-        self.df_index = self.read_dataset(path_to_file=path_index, chunk_size=100)
+        self.streaming = streaming
+        self.chunk_size = chunk_size
+        self.path_death = path_death
+        self.path_population = path_population
+        self.path_index = path_index
+        # datasets are read by stages in preprocess_data
+        self.df_death = None
+        self.df_population = None
+        self.df_index = None
 
         self.path_save_death = path_save_death
         self.path_save_population = path_save_population
         self.path_save_index = path_save_index
         self.path_save_input = path_to_save_input
+        self.path_save_development = path_save_development
+        self.df_development = None
 
-    @staticmethod
-    def read_dataset(path_to_file: str, chunk_size: int) -> pd.DataFrame:
-        chunk = pd.read_csv(path_to_file, chunksize=chunk_size)
-        return pd.concat(chunk)
+    def read_dataset(
+        self, path_to_file: str, chunk_size: int, values: bool = True
+    ) -> pd.DataFrame:
+        return self.schema.read_csv(path_to_file, chunk_size, values)
 
     @staticmethod
     def rename_columns_name_death(name_columns: list[str]) -> list[str]:
@@ -54,24 +99,31 @@ class DataPreprocessingPipeline:
         ]
         return name_columns
 
-    def preprocess_data_death(self) -> None:
+    @classmethod
+    def clean_death(cls, df_death: pd.DataFrame) -> pd.DataFrame:
         """
-        Make preprocessing for death data set.
+        Clean rows of death data set, duplicates aren't dropped
+        :param df_death: raw death data set or its chunk
+        :return: cleaned dataframe
         """
         # Drop unnecessary columns
         drop_columns = ["Number of executions (Amnesty International)"]
-        self.df_death = self.df_death.drop(drop_columns, axis=1)
+        df_death = df_death.drop(drop_columns, axis=1)
 
         # Rename columns name
         name_columns = {"Entity": "country", "Year": "year", "Code": "code"}
-        self.df_death = self.df_death.rename(columns=name_columns)
-        self.df_death.columns = self.rename_columns_name_death(
-            list(self.df_death.columns)
-        )
+        df_death = df_death.rename(columns=name_columns)
+        df_death.columns = cls.rename_columns_name_death(list(df_death.columns))
 
         # Drop rows without code and fill NaN 0
-        self.df_death = self.df_death[self.df_death["code"].notna()]
-        self.df_death = self.df_death.fillna(0)
+        df_death = df_death[df_death["code"].notna()]
+        return df_death.fillna({column: 0 for column in df_death.columns[3:]})
+
+    def preprocess_data_death(self) -> None:
+        """
+        Make preprocessing for death data set.
+        """
+        self.df_death = self.clean_death(self.df_death)
 
         # Drop duplicates
         self.df_death = self.df_death.drop_duplicates()
@@ -104,9 +156,7 @@ class DataPreprocessingPipeline:
         self.df_population = self.df_population.replace("..", nan).fillna(
             method="ffill"
         )
-        self.df_population["population"] = self.df_population["population"].astype(
-            float
-        )
+        self.df_population = self.schema.apply(self.df_population)
 
         # Drop duplicates
         self.df_population = self.df_population.drop_duplicates()
@@ -132,7 +182,9 @@ class DataPreprocessingPipeline:
 
         # Calculate mean for hdi
         self.df_index = (
-            self.df_index.groupby(["country", "code"]).mean()["hdi"].reset_index()
+            self.df_index.groupby(["country", "code"], observed=True)
+            .mean()["hdi"]
+            .reset_index()
         )
 
         # level of development
@@ -143,6 +195,7 @@ class DataPreprocessingPipeline:
         ]
         values = ["highly", "medium", "low"]
         self.df_index["development"] = select(conditions, values)
+        self.df_index = self.schema.apply(self.df_index)
 
         # Drop duplicates
         self.df_index = self.df_index.drop_duplicates()
@@ -158,9 +211,27 @@ class DataPreprocessingPipeline:
         ‘population’, float, 0 - 3e6 , population size in thousands;
         ‘d: cause of death1’, float, 0 >=, in thousands;
         """
+        input_data = self.join_population(self.df_death)
+
+        # Drop duplicates
+        input_data = input_data.drop_duplicates()
+
+        # Save to csv and binary cache read by the app
+        input_data.to_csv(self.path_save_input, index=False)
+        DatasetCache(self.path_save_input, self.schema.exact).save(input_data)
+
+        # Summed by level of development, used by development analyses
+        self.df_development = self.aggregate_by_development(input_data, self.df_index)
+
+    def join_population(self, df_death: pd.DataFrame) -> pd.DataFrame:
+        """
+        Merge preprocessed death data set or its chunk with population data set
+        :param df_death: preprocessed death data
+        :return: dataframe with columns 'country', 'code', 'year', 'population' and death causes in thousands
+        """
         # merge to dataframe
         input_data = pd.merge(
-            self.df_death, self.df_population, on=["code", "year"], how="inner"
+            df_death, self.df_population, on=["code", "year"], how="inner"
         )
         # Change position column 'population'
         last_column = input_data.pop("population")
@@ -171,27 +242,458 @@ class DataPreprocessingPipeline:
 
         #  Change population size and number of death to in thousands
         input_data.iloc[:, 3:] = input_data.iloc[:, 3:] / 1000
+        return self.schema.apply(input_data)
 
-        # Drop duplicates
-        input_data = input_data.drop_duplicates()
+    def stream_app_input_data(self) -> None:
+        """
+        Preprocess death data set chunk by chunk, join each chunk with population and append it to
+        preprocessed death dataset and app input dataset. Duplicates are dropped across chunks with
+        hashes of rows. Binary cache of input dataset is made by DataLoader when the app reads it.
+        If no row is left, datasets of the previous run are replaced by empty ones.
+        """
+        self.read_skipped_outputs()
+        seen_death, seen_input = RowHashSet(), RowHashSet()
+        self.df_development = None
+        chunks = self.schema.read_chunks(self.path_death, self.chunk_size)
+        saved = False
+        empty = None
+        for chunk in chunks:
+            df_death = self.clean_death(chunk)
+            df_death = df_death[seen_death.first_seen(df_death)]
+            if df_death.empty:
+                # merge with empty dataframe changes order of columns
+                empty = df_death
+                continue
+            input_data = self.join_population(df_death)
+            input_data = input_data[seen_input.first_seen(input_data)]
 
-        # Save to csv
-        input_data.to_csv(self.path_save_input, index=False)
+            # the first saved chunk makes new files with header
+            mode = "a" if saved else "w"
+            df_death.to_csv(
+                self.path_save_death, mode=mode, header=not saved, index=False
+            )
+            input_data.to_csv(
+                self.path_save_input, mode=mode, header=not saved, index=False
+            )
+            saved = True
 
-    def preprocess_data(self) -> None:
+            if input_data.empty:
+                continue
+            # summed tables of chunks are summed again, size depends on number of years and levels
+            development = self.aggregate_by_development(input_data, self.df_index)
+            if self.df_development is not None:
+                development = self.add_development(self.df_development, development)
+            self.df_development = development
+        if not saved and empty is not None:
+            empty.to_csv(self.path_save_death, index=False)
+            columns = list(empty.columns)
+            input_data = pd.DataFrame(
+                columns=columns[:3] + ["population"] + columns[3:]
+            )
+            input_data.to_csv(self.path_save_input, index=False)
+            self.df_development = self.aggregate_by_development(
+                input_data, self.df_index
+            )
+
+    @staticmethod
+    def add_development(*tables: pd.DataFrame) -> pd.DataFrame:
         """
-        Make preprocessing for all dataset
+        Add tables summed by year and level of development
+        :param tables: dataframes with columns 'year', 'development', 'population' and death causes
+        :return: dataframe with one row for each year and level of development
         """
-        self.preprocess_data_death()
+        return (
+            pd.concat(tables)
+            .groupby(["year", "development"], observed=True)
+            .sum(numeric_only=True)
+            .reset_index()
+        )
+
+    @staticmethod
+    def aggregate_by_development(
+        input_data: pd.DataFrame, df_index: pd.DataFrame
+    ) -> pd.DataFrame:
+        """
+        Sum population and number of deaths by year and level of development
+        :param input_data: dataframe with app input data
+        :param df_index: dataframe with columns 'code' and 'development'
+        :return: dataframe with columns 'year', 'development', 'population' and death causes,
+        values are summed in float64
+        """
+        develop = pd.merge(
+            input_data,
+            df_index[["code", "development"]].drop_duplicates("code"),
+            on=["code"],
+            how="inner",
+        )
+        values = develop.columns[3:].drop("development")
+        develop = develop.astype({column: float64 for column in values})
+        return (
+            develop.groupby(["year", "development"], observed=True)
+            .sum(numeric_only=True)
+            .reset_index()
+        )
+
+    def make_manifest(self) -> dict:
+        """
+        Describe preprocessed data sets, each (code, year) block of death and population data sets
+        has its own fingerprint
+        :return: dictionary saved next to preprocessed datasets
+        """
+        return {
+            **self.parameters(),
+            "columns": list(self.df_death.columns),
+            "death": hash_blocks(self.df_death, ["code", "year"]),
+            "population": hash_blocks(self.df_population, ["code", "year"]),
+            "index": hash_frame(self.df_index),
+        }
+
+    def read_manifest(self) -> Optional[dict]:
+        """
+        Read manifest of the last run if saved datasets can be updated
+        :return: manifest or None if datasets have to be made from scratch
+        """
+        if self.path_to_manifest is None:
+            return None
+        saved = read_manifest(self.path_to_manifest)
+        if saved is None or saved.get("columns") != self.manifest["columns"]:
+            return None
+        return saved if self.outputs_match(saved) else None
+
+    def parameters(self) -> dict:
+        """
+        :return: parameters of preprocessing, saved datasets can be updated only if they are the same
+        """
+        return {
+            "version": self.version,
+            "exact": self.schema.exact,
+            "population_from_api": self.population_from_api,
+        }
+
+    def outputs_match(self, saved: dict) -> bool:
+        """
+        :param saved: manifest of the last run
+        :return: True if saved datasets were made with the same parameters and weren't changed or replaced
+        by another program since the last run
+        """
+        if any(saved.get(key) != value for key, value in self.parameters().items()):
+            return False
+        if set(saved.get("outputs", {})) != set(self.output_paths()):
+            return False
+        return all(
+            os.path.exists(path) and file_stat(path) == stat
+            for path, stat in saved["outputs"].items()
+        )
+
+    def source_paths(self) -> list[str]:
+        """
+        :return: paths to raw data sets, population downloaded from API is already preprocessed
+        """
+        path_to_population = (
+            self.path_save_population
+            if self.population_from_api
+            else self.path_population
+        )
+        return [self.path_death, path_to_population, self.path_index]
+
+    def is_unchanged(self) -> bool:
+        """
+        Check if raw data sets are the same as in the last run, then saved datasets are up to date.
+        Stat of raw file is compared first, file is read and hashed only if its stat changed, e.g. it was copied.
+        Stats in manifest are updated, so the next check doesn't hash the file again.
+        :return: True if whole preprocessing can be skipped
+        """
+        if self.path_to_manifest is None or self.streaming:
+            return False
+        saved = read_manifest(self.path_to_manifest)
+        if saved is None or not self.outputs_match(saved):
+            return False
+        sources = saved.get("sources", {})
+        if set(sources) != set(self.source_paths()):
+            return False
+        touched = False
+        for path, source in sources.items():
+            if not os.path.exists(path):
+                return False
+            stat = file_stat(path)
+            if stat == source["stat"]:
+                continue
+            if file_digest(path) != source["sha256"]:
+                return False
+            source["stat"] = stat
+            touched = True
+        if touched:
+            write_manifest(self.path_to_manifest, saved)
+        return True
+
+    def output_paths(self) -> list[str]:
+        """
+        :return: paths to all saved datasets, population downloaded from API is checked as raw data set
+        """
+        outputs = [self.path_save_death, self.path_save_input, self.path_save_index]
         if not self.population_from_api:
-            self.preprocess_data_population()
+            outputs.append(self.path_save_population)
+        if self.path_save_development is not None:
+            outputs.append(self.path_save_development)
+        return outputs
+
+    @staticmethod
+    def changed_blocks(saved: dict, manifest: dict, datasets: list[str]) -> set[str]:
+        """
+        Find blocks which are new, changed or removed in any of datasets
+        :param saved: manifest of the last run
+        :param manifest: manifest of current data
+        :param datasets: names of datasets, e.g. 'death'
+        :return: names of blocks, e.g. 'AFG:1990'
+        """
+        blocks = set()
+        for dataset in datasets:
+            blocks |= set(saved[dataset]) | set(manifest[dataset])
+        return {
+            block
+            for block in blocks
+            if any(
+                saved[dataset].get(block) != manifest[dataset].get(block)
+                for dataset in datasets
+            )
+        }
+
+    def merge_blocks(
+        self, path_to_file: str, rows: Optional[pd.DataFrame], blocks: set[str]
+    ) -> pd.DataFrame:
+        """
+        Replace rows of blocks in saved dataset
+        :param path_to_file: path to saved dataset
+        :param rows: new rows of blocks or None
+        :param blocks: names of changed blocks, their saved rows are dropped
+        :return: merged dataset
+        """
+        saved = self.read_dataset(path_to_file, chunk_size=1000)
+        parts = [saved[~block_names(saved, ["code", "year"]).isin(blocks)]]
+        if rows is not None:
+            parts.append(rows)
+        merged = self.schema.apply(pd.concat(parts, ignore_index=True))
+        merged.to_csv(path_to_file, index=False)
+        return merged
+
+    def update_app_input_data(self, saved: dict) -> None:
+        """
+        Preprocess again only blocks which changed since the last run and merge them into saved datasets.
+        Rows of new blocks are appended to saved files, which aren't read then.
+        Raw death data set is still read, cleaned and hashed whole to find changed blocks, so cost of update
+        grows with size of data set, only writing of outputs depends on size of change.
+        :param saved: manifest of the last run
+        """
+        death_blocks = self.changed_blocks(saved, self.manifest, ["death"])
+        input_blocks = self.changed_blocks(
+            saved, self.manifest, ["death", "population"]
+        )
+        index_changed = saved["index"] != self.manifest["index"]
+        self.updated = True
+        if not input_blocks and not index_changed:
+            # saved datasets are up to date
+            return
+
+        names = block_names(self.df_death, ["code", "year"])
+        if any(block in saved["death"] for block in death_blocks):
+            self.df_death.to_csv(self.path_save_death, index=False)
+        elif death_blocks:
+            self.df_death[names.isin(death_blocks)].to_csv(
+                self.path_save_death, mode="a", header=False, index=False
+            )
+
+        df_death = self.df_death[names.isin(input_blocks)]
+        # merge with empty dataframe changes order of columns
+        rows = (
+            None if df_death.empty else self.join_population(df_death).drop_duplicates()
+        )
+        # saved input has rows of block only if block was in both datasets
+        appended = not index_changed and not any(
+            block in saved["death"] and block in saved["population"]
+            for block in input_blocks
+        )
+        if not appended:
+            input_data = self.merge_blocks(self.path_save_input, rows, input_blocks)
+            DatasetCache(self.path_save_input, self.schema.exact).save(input_data)
+            self.df_development = self.aggregate_by_development(
+                input_data, self.df_index
+            )
+            return
+        if rows is None:
+            return
+        rows.to_csv(self.path_save_input, mode="a", header=False, index=False)
+        if self.path_save_development is not None:
+            self.df_development = self.add_development(
+                self.schema.read_csv(self.path_save_development, 1000, values=False),
+                self.aggregate_by_development(rows, self.df_index),
+            )
+
+    def is_fresh(
+        self,
+        stage: str,
+        outputs: list[str],
+        files: list[str] = (),
+        stages: list[str] = (),
+    ) -> bool:
+        """
+        Check if saved outputs of stage were made from the same inputs and parameters, then stage is skipped
+        :param stage: name of stage, e.g. 'death'
+        :param outputs: paths to outputs of stage, stamp is saved next to the first one
+        :param files: paths to input files
+        :param stages: names of stages whose outputs are inputs of stage
+        :return: True if stage can be skipped
+        """
+        if not self.cache_stages:
+            return False
+        self.keys[stage] = hash_json(
+            [self.version, self.schema.exact, self.population_from_api]
+            + [file_digest(path) for path in files]
+            + [self.keys[name] for name in stages]
+        )
+        if read_stage_stamp(outputs[0]) != self.keys[stage] or not all(
+            os.path.exists(path) for path in outputs
+        ):
+            return False
+        self.skipped.add(stage)
+        return True
+
+    def write_stage_stamp(self, stage: str, path_to_output: str) -> None:
+        """
+        Remember from which inputs and parameters stage made its output
+        :param stage: name of stage
+        :param path_to_output: path to saved output
+        """
+        if stage in self.keys and stage not in self.skipped:
+            write_stage_stamp(path_to_output, self.keys[stage])
+
+    def read_skipped_outputs(self) -> None:
+        """
+        Read saved outputs of skipped stages, which are needed by the next stage
+        """
+        if "death" in self.skipped and self.df_death is None:
+            self.df_death = self.read_dataset(self.path_save_death, chunk_size=1000)
+        if "population" in self.skipped and self.df_population is None:
+            self.df_population = self.read_dataset(
+                self.path_save_population, chunk_size=1000
+            )
+        if "index" in self.skipped and self.df_index is None:
+            self.df_index = self.read_dataset(self.path_save_index, chunk_size=100)
+
+    def make_death(self) -> None:
+        """
+        Read and preprocess death data set
+        """
+        if self.is_fresh("death", [self.path_save_death], files=[self.path_death]):
+            return
+        self.df_death = self.read_dataset(path_to_file=self.path_death, chunk_size=1000)
+        self.preprocess_data_death()
+
+    def make_population(self) -> None:
+        """
+        Read and preprocess population data set, population downloaded from API is already preprocessed
+        """
+        path_to_input = (
+            self.path_save_population
+            if self.population_from_api
+            else self.path_population
+        )
+        if self.is_fresh(
+            "population", [self.path_save_population], files=[path_to_input]
+        ):
+            return
+        if self.population_from_api:
+            self.df_population = self.read_dataset(
+                path_to_file=self.path_save_population, chunk_size=1000
+            )
+            return
+        # missing values are '..', so only text columns have types of schema
+        self.df_population = self.read_dataset(
+            path_to_file=self.path_population, chunk_size=100, values=False
+        )
+        self.preprocess_data_population()
+
+    def make_index(self) -> None:
+        """
+        Read and preprocess index data set
+        """
+        if self.is_fresh("index", [self.path_save_index], files=[self.path_index]):
+            return
+        self.df_index = self.read_dataset(path_to_file=self.path_index, chunk_size=100)
         self.preprocess_data_index()
-        self.prepare_app_input_data()
+
+    def preprocess_data(self) -> None:
+        """
+        Make preprocessing for all dataset
+        """
+        if self.is_unchanged():
+            # saved datasets and manifest are up to date
+            self.skipped = {"death", "population", "index", "app_input"}
+            return
+        self.make_population()
+        self.make_index()
+        if self.streaming:
+            self.stream_app_input_data()
+            return
+        self.make_death()
+        self.make_app_input()
+
+    def make_app_input(self) -> None:
+        """
+        Make app input dataset from preprocessed death and population data sets, from scratch or
+        by updating saved datasets
+        """
+        outputs = [self.path_save_input]
+        if self.path_save_development is not None:
+            outputs.append(self.path_save_development)
+        if self.is_fresh("app_input", outputs, stages=["death", "population", "index"]):
+            return
+        self.read_skipped_outputs()
+        if self.path_to_manifest is not None:
+            self.manifest = self.make_manifest()
+        saved = self.read_manifest()
+        if saved is None:
+            self.prepare_app_input_data()
+        else:
+            self.update_app_input_data(saved)
 
     def save_preprocessed_dataset(self) -> None:
         """
         Save preprocessed data
         """
-        self.df_index.to_csv(self.path_save_index, index=False)
-        self.df_population.to_csv(self.path_save_population, index=False)
-        self.df_death.to_csv(self.path_save_death, index=False)
+        if "index" not in self.skipped:
+            self.df_index.to_csv(self.path_save_index, index=False)
+            self.write_stage_stamp("index", self.path_save_index)
+        if "population" not in self.skipped:
+            self.df_population.to_csv(self.path_save_population, index=False)
+            self.write_stage_stamp("population", self.path_save_population)
+        if not (self.streaming or self.updated or "death" in self.skipped):
+            # in streaming mode and when saved datasets are updated saved while preprocessing
+            self.df_death.to_csv(self.path_save_death, index=False)
+        self.write_stage_stamp("death", self.path_save_death)
+        if "app_input" in self.skipped:
+            # saved input, development table and manifest are up to date
+            return
+        self.write_stage_stamp("app_input", self.path_save_input)
+        if self.path_save_development is not None:
+            if self.df_development is not None:
+                self.df_development.to_csv(self.path_save_development, index=False)
+            # remember from which input and index the table was made
+            write_stamp(
+                self.path_save_development,
+                [file_digest(self.path_save_input), file_digest(self.path_save_index)],
+            )
+        if self.path_to_manifest is None:
+            return
+        if self.manifest is None:
+            # datasets made in streaming mode aren't described by manifest
+            if os.path.exists(self.path_to_manifest):
+                os.remove(self.path_to_manifest)
+        else:
+            self.manifest["outputs"] = {
+                path: file_stat(path) for path in self.output_paths()
+            }
+            self.manifest["sources"] = {
+                path: {"stat": file_stat(path), "sha256": file_digest(path)}
+                for path in self.source_paths()
+            }
+            write_manifest(self.path_to_manifest, self.manifest)
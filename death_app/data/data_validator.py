@@ -1,5 +1,25 @@
-import pandas as pd
-import numpy as np
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from typing import Optional
+
+from death_app.data.fingerprint import file_stat
+from death_app.data.validation_cache import ValidationCache
+from death_app.data.validation_engine import (
+    Check,
+    ColumnsNameCheck,
+    ColumnTypeCheck,
+    ColumnValues,
+    CommonValuesCheck,
+    DuplicationCheck,
+    MinimalSizeCheck,
+    NanCheck,
+    NonNegativeCheck,
+    PopulationCheck,
+    ValidationEngine,
+    ValidationReport,
+    YearContinuityCheck,
+)
 
 
 class DataValidator:
@@ -7,349 +27,360 @@ class DataValidator:
     Checks if the new datasets follow the structure required by the app.
     """
 
-    def __init__(self, path_to_death_dataset: str, path_to_index_dataset: str) -> None:
+    # change when checks change, results of the previous version in cache aren't used
+    version = 1
+
+    def __init__(
+        self,
+        path_to_death_dataset: str,
+        path_to_index_dataset: str,
+        chunksize: int = 100_000,
+        processes: Optional[int] = None,
+        partition_size: int = 64 << 20,
+        path_to_cache: Optional[str] = None,
+    ) -> None:
+        """
+        :param path_to_death_dataset: path to new death dataset
+        :param path_to_index_dataset: path to new index dataset
+        :param chunksize: number of rows parsed at once
+        :param processes: number of processes which check parts of big dataset, default number of CPU cores
+        :param partition_size: number of bytes in part of dataset checked by one process
+        :param path_to_cache: path to json file with results of previous checks, if None results aren't cached
+        """
         self.path_to_death_dataset = path_to_death_dataset
         self.path_to_index_dataset = path_to_index_dataset
+        self.chunksize = chunksize
+        self.processes = processes or os.cpu_count() or 1
+        self.partition_size = partition_size
+        self.cache = (
+            ValidationCache(path_to_cache, self.version)
+            if path_to_cache is not None
+            else None
+        )
+
+    def engine(
+        self, path_to_dataset: str, checks: list[Check], fail_fast: bool = True
+    ) -> ValidationEngine:
+        """
+        Engine which checks dataset in one pass
+        :param path_to_dataset: path to csv file
+        :param checks: ordered checks
+        :param fail_fast: if True checking stops at the first check which fails
+        :return: validation engine
+        """
+        return ValidationEngine(
+            path_to_dataset,
+            checks,
+            chunksize=self.chunksize,
+            processes=self.processes,
+            partition_size=self.partition_size,
+            fail_fast=fail_fast,
+        )
+
+    def run_checks(self, path_to_dataset: str, *checks: Check) -> bool:
+        """
+        Run checks in one pass over dataset
+        :param path_to_dataset: path to csv file
+        :param checks: ordered checks
+        :return: True if dataset passes all checks
+        """
+        return all(
+            check.is_valid for check in self.engine(path_to_dataset, list(checks)).run()
+        )
 
     # DEATH DATASET
+    def death_dataset_checks(self) -> list[Check]:
+        """
+        Checks of death dataset in order of checking
+        """
+        return [
+            MinimalSizeCheck(5, message="Wrong minimal size in death dataset"),
+            ColumnsNameCheck(
+                ["country", "code", "year", "population"],
+                prefix="d: ",
+                message="Wrong columns name in death dataset",
+            ),
+            ColumnTypeCheck("country", str, "Wrong country type in death dataset"),
+            ColumnTypeCheck("code", str, "Wrong code type in death dataset"),
+            ColumnTypeCheck("year", int, "Wrong year type in death dataset"),
+            ColumnTypeCheck(
+                "population", float, "Wrong population type in death dataset"
+            ),
+            ColumnTypeCheck(slice(4, None), float, "Wrong death type in death dataset"),
+            NonNegativeCheck(
+                2,
+                "Wrong values in columns population or year or death causes. "
+                "Values have to be greater than or equal to 0 ",
+            ),
+            PopulationCheck(
+                "Wrong values in columns with death of causes. For all rows sum of deaths cannot exceed the "
+                "population."
+            ),
+            YearContinuityCheck(
+                "Wrong values in columns with year. For each country you have to have only one row for specific year "
+                "and the range of year must be continuous for every year"
+            ),
+            NanCheck("Wrong values, your death dataset contain NaN."),
+            DuplicationCheck("Your death datasets contain duplication."),
+        ]
+
     def check_minimal_size_in_death_dataset(self) -> bool:
         """
         Death dataset must contain columns ‘country’, ‘year’, ‘population’ and
         at least one column with cause of death and minimal one row with data
         """
-        data = pd.read_csv(self.path_to_death_dataset, nrows=1)
-        return data.shape[0] == 1 and data.shape[1] >= 5
+        return self.run_checks(self.path_to_death_dataset, MinimalSizeCheck(5))
 
     def check_columns_name_in_death_dataset(self) -> bool:
         """
         Death dataset must contain columns with name‘country’, ‘year’, ‘population’ and at least one column with causes
         of death with name starts with "d: causes"
         """
-        data = pd.read_csv(self.path_to_death_dataset, nrows=0)
-        if list(data.columns[:4]) != ["country", "code", "year", "population"]:
-            return False
-        if sum([causes.startswith("d: ") for causes in list(data.columns[4:])]) != len(
-            list(data.columns[4:])
-        ):
-            return False
-        return True
+        return self.run_checks(
+            self.path_to_death_dataset,
+            ColumnsNameCheck(["country", "code", "year", "population"], prefix="d: "),
+        )
 
     def check_country_type_in_death_dataset(self) -> bool:
         """
         Column 'country' have to contain string
         """
-        is_not_valid = True
-        for chunk in pd.read_csv(self.path_to_death_dataset, chunksize=100):
-            try:
-                chunk["country"].astype(str)
-            except ValueError:
-                is_not_valid = False
-                if ~is_not_valid:
-                    return is_not_valid
-        return is_not_valid
+        return self.run_checks(
+            self.path_to_death_dataset, ColumnTypeCheck("country", str)
+        )
 
     def check_code_type_in_death_dataset(self) -> bool:
         """
         Column 'code' have to contain string
         """
-        is_not_valid = True
-        for chunk in pd.read_csv(self.path_to_death_dataset, chunksize=100):
-            try:
-                chunk["code"].astype(str)
-            except ValueError:
-                is_not_valid = False
-                if ~is_not_valid:
-                    return is_not_valid
-        return is_not_valid
+        return self.run_checks(self.path_to_death_dataset, ColumnTypeCheck("code", str))
 
     def check_year_type_in_death_dataset(self) -> bool:
         """
         Column 'year' have to contain integer
         """
-        is_not_valid = True
-        for chunk in pd.read_csv(self.path_to_death_dataset, chunksize=100):
-            try:
-                chunk["year"].astype(int)
-            except ValueError:
-                is_not_valid = False
-                if ~is_not_valid:
-                    return is_not_valid
-        return is_not_valid
+        return self.run_checks(self.path_to_death_dataset, ColumnTypeCheck("year", int))
 
     def check_population_type_in_death_dataset(self) -> bool:
         """
         Column 'population' have to contain float
         """
-        is_not_valid = True
-        for chunk in pd.read_csv(self.path_to_death_dataset, chunksize=100):
-            try:
-                chunk["population"].astype(float)
-            except ValueError:
-                is_not_valid = False
-                if ~is_not_valid:
-                    return is_not_valid
-        return is_not_valid
+        return self.run_checks(
+            self.path_to_death_dataset, ColumnTypeCheck("population", float)
+        )
 
     def check_death_type_in_death_dataset(self) -> bool:
         """
         Columns with death causes have to contain float
         """
-        is_not_valid = True
-        for chunk in pd.read_csv(self.path_to_death_dataset, chunksize=100):
-            try:
-                chunk[chunk.columns[4:]].astype(float)
-            except ValueError:
-                is_not_valid = False
-                if ~is_not_valid:
-                    return is_not_valid
-        return is_not_valid
+        return self.run_checks(
+            self.path_to_death_dataset, ColumnTypeCheck(slice(4, None), float)
+        )
 
     def check_values_in_death_dataset(self) -> bool:
         """
         Columns with population, year and death causes have to contain values greater than or equal to 0
         """
-        is_not_valid = True
-        for chunk in pd.read_csv(self.path_to_death_dataset, chunksize=100):
-            if not (chunk.iloc[:, 2:] >= 0).all().all():
-                is_not_valid = False
-            if ~is_not_valid:
-                return is_not_valid
-        return is_not_valid
+        return self.run_checks(self.path_to_death_dataset, NonNegativeCheck(2))
 
     def check_row_values_in_death_dataset(self) -> bool:
         """
         Column population in each year have to be greater than summed causes of death
         """
-        is_not_valid = True
-        for chunk in pd.read_csv(self.path_to_death_dataset, chunksize=100):
-            if not all((chunk["population"] - chunk.iloc[:, 4:].sum(axis=1)) > 0):
-                is_not_valid = False
-        return is_not_valid
+        return self.run_checks(self.path_to_death_dataset, PopulationCheck())
 
     def check_year_and_country_in_death_dataset(self) -> bool:
         """
         Columns year for each country have to have only one row for specific year
         and the range of year must be continuous for every year
         """
-        chunk = pd.read_csv(self.path_to_death_dataset, chunksize=100)
-        data = pd.concat(chunk)
-        is_not_valid = True
-        countries = list(data["country"].unique())
-        for country in countries:
-            df_country = data[data["country"] == country]
-            years = df_country["year"]
-            is_not_valid = (sorted(years)) == list(
-                np.arange(min(years), max(years) + 1)
-            )
-            if ~is_not_valid:
-                return is_not_valid
-        return is_not_valid
+        return self.run_checks(self.path_to_death_dataset, YearContinuityCheck())
 
     def check_nan_values_in_death_dataset(self) -> bool:
         """
         Death datasets must not have NaN values
         """
-        is_not_valid = True
-        for chunk in pd.read_csv(self.path_to_death_dataset, chunksize=100):
-            is_not_valid = chunk.isna().any().sum() == 0
-            if ~is_not_valid:
-                return is_not_valid
-        return is_not_valid
+        return self.run_checks(self.path_to_death_dataset, NanCheck())
 
     def check_duplication_in_death_dataset(self) -> bool:
         """
         Death datasets must not have duplications
         """
-        is_not_valid = True
-        for chunk in pd.read_csv(self.path_to_death_dataset, chunksize=100):
-            is_not_valid = chunk.duplicated().any().sum() == 0
-            if ~is_not_valid:
-                return is_not_valid
-        return is_not_valid
+        return self.run_checks(self.path_to_death_dataset, DuplicationCheck())
 
     # INDEX DATASET
+    def index_dataset_checks(self) -> list[Check]:
+        """
+        Checks of index dataset in order of checking
+        """
+        return [
+            MinimalSizeCheck(4, 4, "Wrong minimal size in index dataset"),
+            ColumnsNameCheck(
+                ["country", "code", "hdi", "development"],
+                message="Wrong columns name in index dataset",
+            ),
+            ColumnTypeCheck("country", str, "Wrong country type in index dataset"),
+            ColumnTypeCheck("code", str, "Wrong code type in index dataset"),
+            ColumnTypeCheck("hdi", float, "Wrong hid type in index dataset"),
+            ColumnTypeCheck(
+                "development", str, "Wrong development type in index dataset"
+            ),
+            NanCheck("Wrong values, your index dataset contain NaN."),
+            DuplicationCheck("Your index datasets contain duplication."),
+        ]
+
     def check_minimal_size_in_index_dataset(self) -> bool:
         """
         Index dataset must contain columns ‘country’, ‘code’, ‘hdi’ and 'development' and minimal one row with data
         """
-        data = pd.read_csv(self.path_to_index_dataset, nrows=1)
-        return data.shape[0] == 1 and data.shape[1] == 4
+        return self.run_checks(self.path_to_index_dataset, MinimalSizeCheck(4, 4))
 
     def check_columns_name_in_index_dataset(self):
         """
         Index dataset must contain columns name: ‘country’, ‘code’, ‘hdi’ and 'development'
         """
-        data = pd.read_csv(self.path_to_index_dataset, nrows=0)
-        return list(data.columns) == ["country", "code", "hdi", "development"]
+        return self.run_checks(
+            self.path_to_index_dataset,
+            ColumnsNameCheck(["country", "code", "hdi", "development"]),
+        )
 
     def check_country_type_in_index_dataset(self) -> bool:
         """
         Column 'country' have to contain string
         """
-        is_not_valid = True
-        for chunk in pd.read_csv(self.path_to_index_dataset, chunksize=100):
-            try:
-                chunk["country"].astype(str)
-            except ValueError:
-                is_not_valid = False
-                if ~is_not_valid:
-                    return is_not_valid
-        return is_not_valid
+        return self.run_checks(
+            self.path_to_index_dataset, ColumnTypeCheck("country", str)
+        )
 
     def check_code_type_in_index_dataset(self) -> bool:
         """
         Column 'code' have to contain string
         """
-        is_not_valid = True
-        for chunk in pd.read_csv(self.path_to_index_dataset, chunksize=100):
-            try:
-                chunk["code"].astype(str)
-            except ValueError:
-                is_not_valid = False
-                if ~is_not_valid:
-                    return is_not_valid
-        return is_not_valid
+        return self.run_checks(self.path_to_index_dataset, ColumnTypeCheck("code", str))
 
     def check_hdi_type_in_index_dataset(self) -> bool:
         """
         Column 'hdi' have to contain float
         """
-        is_not_valid = True
-        for chunk in pd.read_csv(self.path_to_index_dataset, chunksize=100):
-            try:
-                chunk["hdi"].astype(float)
-            except ValueError:
-                is_not_valid = False
-                if ~is_not_valid:
-                    return is_not_valid
-        return is_not_valid
+        return self.run_checks(
+            self.path_to_index_dataset, ColumnTypeCheck("hdi", float)
+        )
 
     def check_development_type_in_index_dataset(self) -> bool:
         """
         Column 'development' have to contain string
         """
-        is_not_valid = True
-        for chunk in pd.read_csv(self.path_to_index_dataset, chunksize=100):
-            try:
-                chunk["development"].astype(str)
-            except ValueError:
-                is_not_valid = False
-                if ~is_not_valid:
-                    return is_not_valid
-        return is_not_valid
+        return self.run_checks(
+            self.path_to_index_dataset, ColumnTypeCheck("development", str)
+        )
 
     def check_nan_values_in_index_dataset(self) -> bool:
         """
         Index datasets must not have NaN values
         """
-        is_not_valid = True
-        for chunk in pd.read_csv(self.path_to_index_dataset, chunksize=100):
-            is_not_valid = chunk.isna().any().sum() == 0
-            if ~is_not_valid:
-                return is_not_valid
-        return is_not_valid
+        return self.run_checks(self.path_to_index_dataset, NanCheck())
 
     def check_duplication_in_index_dataset(self) -> bool:
         """
         Index datasets must not have duplications
         """
-        is_not_valid = True
-        for chunk in pd.read_csv(self.path_to_index_dataset, chunksize=100):
-            is_not_valid = chunk.duplicated().any().sum() == 0
-            if ~is_not_valid:
-                return is_not_valid
-        return is_not_valid
+        return self.run_checks(self.path_to_index_dataset, DuplicationCheck())
 
     def check_code_in_death_and_index(self) -> bool:
         """
         Index dataset have to contain at least one country code like in death dataset
         """
-        is_not_valid = False
-        chunk = pd.read_csv(self.path_to_index_dataset, chunksize=100)
-        index = pd.concat(chunk)
-        for chunk in pd.read_csv(self.path_to_death_dataset, chunksize=100):
-            is_not_valid = any(chunk["code"].isin(list(index.code)))
-            if is_not_valid:
-                return is_not_valid
-        return is_not_valid
+        index_codes, death_codes = ColumnValues("code"), ColumnValues("code")
+        self.run_checks(self.path_to_index_dataset, index_codes)
+        self.run_checks(self.path_to_death_dataset, death_codes)
+        check = CommonValuesCheck(index_codes, death_codes)
+        check.finish()
+        return check.is_valid
+
+    def validate(self, fail_fast: bool = False) -> ValidationReport:
+        """
+        Check both datasets, each dataset is read once and all its checks run on each chunk.
+        Death and index datasets are checked at the same time, parts of big dataset in separate processes.
+        Results of dataset which wasn't changed since the last check are taken from cache.
+        :param fail_fast: if True checking stops at the first check which fails, otherwise all checks are run
+        :return: report with results of checks
+        """
+        datasets = {
+            "death": (self.path_to_death_dataset, self.death_dataset_checks()),
+            "index": (self.path_to_index_dataset, self.index_dataset_checks()),
+        }
+        codes = {name: ColumnValues("code") for name in datasets}
+        cached, engines, stats = {}, {}, {}
+        for name, (path, checks) in datasets.items():
+            engine = self.engine(path, checks + [codes[name]], fail_fast)
+            if self.cache is not None:
+                stats[name] = file_stat(path)
+            result = (
+                self.cache.get(name, path, engine.hash_content)
+                if self.cache is not None
+                else None
+            )
+            # result of fail fast checking doesn't contain all failed checks
+            if result is not None and (
+                fail_fast or result["valid"] or not result["fail_fast"]
+            ):
+                cached[name] = result
+                codes[name].values = set(result["codes"])
+            else:
+                engines[name] = engine
+        report = ValidationReport()
+        parallel = self.processes > 1 and any(
+            len(engine.partitions[1]) > 1 for engine in engines.values()
+        )
+        with ProcessPoolExecutor(self.processes) if parallel else nullcontext() as pool:
+            futures = {name: engine.submit(pool) for name, engine in engines.items()}
+            # death dataset is reported before index dataset
+            for name, (path, _) in datasets.items():
+                if name in cached:
+                    result = cached[name]
+                    report.add(name, result["checks"], result["sha256"], cached=True)
+                else:
+                    engine = engines[name]
+                    results = [
+                        check.to_dict()
+                        for check in engine.collect(futures[name])
+                        if check is not codes[name]
+                    ]
+                    report.add(name, results, engine.digest)
+                    if self.cache is not None:
+                        self.cache.put(
+                            name,
+                            path,
+                            stats[name],
+                            engine.digest,
+                            {
+                                "sha256": engine.digest,
+                                "valid": all(result["passed"] for result in results),
+                                "fail_fast": fail_fast,
+                                "checks": results,
+                                "codes": list(codes[name].values),
+                            },
+                        )
+                if fail_fast and not report.is_valid:
+                    if pool is not None:
+                        pool.shutdown(cancel_futures=True)
+                    return report
+        check = CommonValuesCheck(
+            codes["index"],
+            codes["death"],
+            "Index dataset have to contain at least one country code like in death dataset",
+        )
+        check.finish()
+        report.add("death and index", [check.to_dict()])
+        return report
 
     def check_pipeline(self) -> bool:
         """
-        Checkin pipeline
+        Checkin pipeline, stops at the first check which fails
         """
-        if not self.check_minimal_size_in_death_dataset():
-            print("Wrong minimal size in death dataset")
-            return False
-        if not self.check_columns_name_in_death_dataset():
-            print("Wrong columns name in death dataset")
-            return False
-        if not self.check_country_type_in_death_dataset():
-            print("Wrong country type in death dataset")
-            return False
-        if not self.check_code_type_in_death_dataset():
-            print("Wrong code type in death dataset")
-            return False
-        if not self.check_year_type_in_death_dataset():
-            print("Wrong year type in death dataset")
-            return False
-        if not self.check_population_type_in_death_dataset():
-            print("Wrong population type in death dataset")
-            return False
-        if not self.check_death_type_in_death_dataset():
-            print("Wrong death type in death dataset")
-            return False
-        if not self.check_values_in_death_dataset():
-            print(
-                "Wrong values in columns population or year or death causes. "
-                "Values have to be greater than or equal to 0 "
-            )
-            return False
-        if not self.check_row_values_in_death_dataset():
-            print(
-                "Wrong values in columns with death of causes. For all rows sum of deaths cannot exceed the "
-                "population."
-            )
-            return False
-        if not self.check_year_and_country_in_death_dataset():
-            print(
-                "Wrong values in columns with year. For each country you have to have only one row for specific year "
-                "and the range of year must be continuous for every year"
-            )
-            return False
-        if not self.check_nan_values_in_death_dataset():
-            print("Wrong values, your death dataset contain NaN.")
-            return False
-        if not self.check_duplication_in_death_dataset():
-            print("Your death datasets contain duplication.")
-            return False
-        if not self.check_minimal_size_in_index_dataset():
-            print("Wrong minimal size in index dataset")
-            return False
-        if not self.check_columns_name_in_index_dataset():
-            print("Wrong columns name in index dataset")
-            return False
-        if not self.check_country_type_in_index_dataset():
-            print("Wrong country type in index dataset")
-            return False
-        if not self.check_code_type_in_index_dataset():
-            print("Wrong code type in index dataset")
-            return False
-        if not self.check_hdi_type_in_index_dataset():
-            print("Wrong hid type in index dataset")
-            return False
-        if not self.check_development_type_in_index_dataset():
-            print("Wrong development type in index dataset")
-            return False
-        if not self.check_nan_values_in_index_dataset():
-            print("Wrong values, your index dataset contain NaN.")
-            return False
-        if not self.check_duplication_in_index_dataset():
-            print("Your index datasets contain duplication.")
-            return False
-        if not self.check_code_in_death_and_index():
-            print(
-                "Index dataset have to contain at least one country code like in death dataset"
-            )
+        failed = self.validate(fail_fast=True).first_failed
+        if failed is not None:
+            print(failed["message"])
             return False
         print("New datasets are correct.")
         return True
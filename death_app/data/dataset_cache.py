@@ -0,0 +1,197 @@
+import json
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from death_app.data.fingerprint import atomic_open, file_digest
+from death_app.data.schema import Schema
+
+
+class DatasetCache:
+    """
+    Columnar binary copy of the application input dataset stored as a bundle of .npy files
+    - 'country' and 'code' as integer codes with their categories
+    - 'year' and 'population' as 1D arrays
+    - death causes as one 2D float matrix
+    - death causes per one inhabitant as 2D float matrix with the same shape, computed once when cache is saved
+    Arrays have types of Schema, float32 values unless cache is made in exact mode.
+    Rows are grouped by country and sorted by year, so each country is one continuous range of rows.
+    The bundle is keyed by sha256 of the source csv, so it's used only while the csv is unchanged.
+    """
+
+    version = 4
+
+    def __init__(self, path_to_dataset: str, exact: bool = False) -> None:
+        """
+        :param path_to_dataset: path to source csv
+        :param exact: if True values are stored as float64
+        """
+        self.path_to_dataset = path_to_dataset
+        self.schema = Schema(exact)
+        self.path_to_cache = os.path.splitext(path_to_dataset)[0] + "_cache"
+        self.path_to_meta = os.path.join(self.path_to_cache, "meta.json")
+
+    def path_to_array(self, name: str) -> str:
+        return os.path.join(self.path_to_cache, f"{name}.npy")
+
+    def read_meta(self) -> Optional[dict]:
+        """
+        Read metadata of cache
+        :return: dictionary or None if cache doesn't exist
+        """
+        try:
+            with open(self.path_to_meta) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def write_meta(self, meta: dict) -> None:
+        """
+        Write metadata atomically, readers see an old or a new file, never a partial one
+        :param meta: dictionary with metadata
+        """
+        with atomic_open(self.path_to_meta) as file:
+            json.dump(meta, file)
+
+    def is_fresh(self) -> bool:
+        """
+        Check if cache was built from current content of the source csv.
+        Hash is computed only when size or modification time of csv changed.
+        :return: True if cache can be used
+        """
+        meta = self.read_meta()
+        if meta is None or meta.get("version") != self.version:
+            return False
+        if meta.get("exact") != self.schema.exact:
+            return False
+        if not os.path.exists(self.path_to_dataset):
+            return False
+        stat = os.stat(self.path_to_dataset)
+        if stat.st_size != meta["source_size"]:
+            return False
+        if stat.st_mtime_ns == meta["source_mtime_ns"]:
+            return True
+        if file_digest(self.path_to_dataset) != meta["source_sha256"]:
+            return False
+        # same content, only touched - remember new modification time
+        meta["source_mtime_ns"] = stat.st_mtime_ns
+        try:
+            self.write_meta(meta)
+        except OSError:
+            pass
+        return True
+
+    @staticmethod
+    def sort_rows(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Group rows by country (in order of first appearance) and sort them by year
+        :param df: dataframe with columns 'country' and 'year'
+        :return: sorted dataframe with new index
+        """
+        codes, _ = pd.factorize(df["country"])
+        order = np.lexsort((df["year"].to_numpy(), codes))
+        return df.iloc[order].reset_index(drop=True)
+
+    def save(self, df: pd.DataFrame) -> None:
+        """
+        Save dataframe read from the source csv to cache
+        :param df: dataframe with columns 'country', 'code', 'year', 'population' and death causes
+        """
+        if not os.path.exists(self.path_to_cache):
+            os.makedirs(self.path_to_cache)
+        df = self.sort_rows(df)
+        # invalidate old cache before overwriting arrays
+        if os.path.exists(self.path_to_meta):
+            os.remove(self.path_to_meta)
+
+        dtypes = self.schema.dtypes(["year", "population"])
+        arrays = {
+            "year": df["year"].to_numpy(dtype=dtypes["year"]),
+            "population": df["population"].to_numpy(dtype=dtypes["population"]),
+            "causes": np.ascontiguousarray(
+                df.iloc[:, 4:].to_numpy(dtype=self.schema.float_type)
+            ),
+        }
+        arrays["rates"] = self.rates(arrays["causes"], arrays["population"])
+        for column in ["country", "code"]:
+            # sorted categories like categories parsed by read_csv
+            codes, categories = pd.factorize(df[column], sort=True)
+            arrays[f"{column}_codes"] = codes.astype(np.int32)
+            arrays[f"{column}_categories"] = np.asarray(categories, dtype=str)
+        for name, array in arrays.items():
+            with atomic_open(self.path_to_array(name), "wb") as file:
+                np.save(file, array)
+
+        stat = os.stat(self.path_to_dataset)
+        self.write_meta(
+            {
+                "version": self.version,
+                "exact": self.schema.exact,
+                "source_sha256": file_digest(self.path_to_dataset),
+                "source_size": stat.st_size,
+                "source_mtime_ns": stat.st_mtime_ns,
+                "columns": list(df.columns),
+                "rows": len(df),
+            }
+        )
+
+    def load_keys(self) -> pd.DataFrame:
+        """
+        Load columns 'country', 'code', 'year', 'population' from cache
+        :return: small dataframe with rows in the same order as in the causes matrix, 'country' and 'code'
+        are categories
+        """
+        keys = pd.DataFrame()
+        for column in ["country", "code"]:
+            keys[column] = pd.Categorical.from_codes(
+                np.load(self.path_to_array(f"{column}_codes")),
+                np.load(self.path_to_array(f"{column}_categories")).astype(object),
+            )
+        keys["year"] = np.load(self.path_to_array("year"))
+        keys["population"] = np.load(self.path_to_array("population"))
+        return keys
+
+    def load_causes(self, mmap_mode: Optional[str] = None) -> np.ndarray:
+        """
+        Load matrix with number of deaths, one column for each cause
+        :param mmap_mode: None to read into memory or 'r' to map file read-only,
+        mapped file is shared by all processes which read the same cache
+        :return: 2D array, rows in the same order as keys
+        """
+        return np.load(self.path_to_array("causes"), mmap_mode=mmap_mode)
+
+    def load_rates(self, mmap_mode: Optional[str] = None) -> np.ndarray:
+        """
+        Load matrix with number of deaths per one inhabitant, one column for each cause
+        :param mmap_mode: None to read into memory or 'r' to map file read-only
+        :return: 2D array, rows in the same order as keys
+        """
+        return np.load(self.path_to_array("rates"), mmap_mode=mmap_mode)
+
+    @staticmethod
+    def rates(causes: np.ndarray, population: np.ndarray) -> np.ndarray:
+        """
+        :param causes: matrix with number of deaths
+        :param population: population of each row
+        :return: matrix with number of deaths per one inhabitant
+        """
+        return causes / population[:, None]
+
+    def load_cause_columns(self) -> list[str]:
+        """
+        Load names of death causes columns
+        :return: list with columns name "d: ..."
+        """
+        return self.read_meta()["columns"][4:]
+
+    def load(self) -> Optional[pd.DataFrame]:
+        """
+        Load dataframe from cache
+        :return: dataframe like read from the source csv or None if cache is missing or stale
+        """
+        if not self.is_fresh():
+            return None
+        df = pd.DataFrame(self.load_causes(), columns=self.load_cause_columns())
+        return pd.concat([self.load_keys(), df], axis=1)
@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor
 from death_app.data.downloader import DataDownloader
 from config import settings
 from death_app.data.data_api_downloader import DataAPIDownloader
@@ -5,9 +6,9 @@ import pandas as pd
 import sys
 
 
-def download(new_death_datasets: bool = False) -> None:
-    # Population dataset
+def download_population(new_death_datasets: bool = False) -> None:
     if new_death_datasets:
+        # years like in your death dataset
         death = pd.read_csv(settings["paths"]["path_death"], usecols=["Year"])
         DataAPIDownloader(
             year_start=min(death["Year"]),
@@ -20,21 +21,40 @@ def download(new_death_datasets: bool = False) -> None:
             url=settings["url"]["population"],
             path_to_save=settings["paths"]["path_population"],
             path_to_folder=settings["dirs"]["raw_data"],
+            expected=settings.get("checksums", {}).get("population"),
         )
-        # Death dataset
-        DataDownloader(
-            url=settings["url"]["death"],
-            path_to_save=settings["paths"]["path_death"],
-            path_to_folder=settings["dirs"]["raw_data"],
-        )
-    # Index dataset
+
+
+def download_death() -> None:
+    DataDownloader(
+        url=settings["url"]["death"],
+        path_to_save=settings["paths"]["path_death"],
+        path_to_folder=settings["dirs"]["raw_data"],
+        expected=settings.get("checksums", {}).get("death"),
+    )
+
+
+def download_index() -> None:
     DataDownloader(
         url=settings["url"]["index"],
         path_to_save=settings["paths"]["path_index"],
         path_to_folder=settings["dirs"]["raw_data"],
+        expected=settings.get("checksums", {}).get("index"),
     )
 
 
+def download(new_death_datasets: bool = False) -> None:
+    # Population and index datasets, death dataset if you don't have your own
+    downloads = [lambda: download_population(new_death_datasets), download_index]
+    if not new_death_datasets:
+        downloads.append(download_death)
+    # datasets are downloaded at the same time, the first error is raised
+    with ThreadPoolExecutor(len(downloads)) as pool:
+        futures = [pool.submit(function) for function in downloads]
+    for future in futures:
+        future.result()
+
+
 if __name__ == "__main__":
     if sys.argv[1] == "new":
         download(False)
@@ -1,26 +1,237 @@
-import gdown
 import os
+import threading
+from typing import Optional
+
+import gdown
+import requests
+from gdown.parse_url import parse_url
+
+from death_app.data.fingerprint import file_digest, read_manifest, write_manifest
 
 
 class DataDownloader:
     """
-    Class which download a files from Google Drive and save them to folder
+    Class which download a files from Google Drive and save them to folder.
+    File is written to '<file>.part' and renamed when it's complete, interrupted download is resumed
+    from the part already saved if size and ETag of file recorded with it didn't change. File is verified against size and sha256 declared in advance, e.g. in settings,
+    or else against the ones saved in manifest of folder by the first download, so a damaged file is downloaded
+    again and download which doesn't match them is rejected. Response without size of file or with web page
+    instead of file, e.g. page of exceeded quota of Google Drive, is rejected too, unless it's a confirmation page
+    of Google Drive, then file is downloaded by gdown.
     """
 
-    def __init__(self, url: str, path_to_save: str, path_to_folder: str) -> None:
+    # downloaders running in threads share manifest of folder
+    manifest_lock = threading.Lock()
+
+    def __init__(
+        self,
+        url: str,
+        path_to_save: str,
+        path_to_folder: str,
+        retries: int = 3,
+        timeout: float = 60.0,
+        expected: Optional[dict] = None,
+    ) -> None:
+        """
+        :param url: link to file on Google Drive or any http url
+        :param path_to_save: path to downloaded file
+        :param path_to_folder: folder of file, it's created if it doesn't exist
+        :param retries: number of times interrupted download is resumed
+        :param timeout: seconds of waiting for server
+        :param expected: dictionary with 'size' and 'sha256' of file, without it the first download is trusted
+        """
         self.url = url
         self.path_to_save = path_to_save
         self.path_to_folder = path_to_folder
+        self.path_to_part = f"{path_to_save}.part"
+        self.path_to_record = f"{self.path_to_part}.json"
+        self.path_to_manifest = os.path.join(path_to_folder, "download_manifest.json")
+        self.retries = retries
+        self.timeout = timeout
+        self.expected = expected
         self.create_folder_if_not_exists()
         self.download_if_not_exists()
 
+    def direct_url(self) -> str:
+        """
+        :return: url which returns content of file, sharing link of Google Drive is changed to download link
+        """
+        file_id = self.drive_file_id()
+        if file_id is not None:
+            return f"https://drive.google.com/uc?id={file_id}&export=download&confirm=t"
+        return self.url
+
+    def drive_file_id(self) -> Optional[str]:
+        """
+        :return: id of file if url is link to Google Drive or None
+        """
+        file_id, _ = parse_url(self.url, warning=False)
+        return file_id if isinstance(file_id, str) else None
+
+    def read_entry(self) -> Optional[dict]:
+        """
+        :return: declared size and sha256 of file, the ones of file downloaded from the same url or None
+        """
+        if self.expected is not None:
+            return self.expected
+        entry = (read_manifest(self.path_to_manifest) or {}).get(
+            os.path.basename(self.path_to_save)
+        )
+        if entry is None or entry["url"] != self.url:
+            return None
+        return entry
+
+    def write_entry(self) -> None:
+        """
+        Save size and sha256 of downloaded file in manifest
+        """
+        with self.manifest_lock:
+            manifest = read_manifest(self.path_to_manifest) or {}
+            manifest[os.path.basename(self.path_to_save)] = {
+                "url": self.url,
+                "size": os.path.getsize(self.path_to_save),
+                "sha256": file_digest(self.path_to_save),
+            }
+            write_manifest(self.path_to_manifest, manifest)
+
+    @staticmethod
+    def matches(path_to_file: str, entry: dict) -> bool:
+        """
+        :param path_to_file:
+        :param entry: expected size and sha256
+        :return: True if file has expected size and content
+        """
+        return (
+            os.path.getsize(path_to_file) == entry["size"]
+            and file_digest(path_to_file) == entry["sha256"]
+        )
+
+    def read_part(self) -> tuple[int, dict]:
+        """
+        Part without record of file it was downloaded from, e.g. left by older version, is removed,
+        because its content can't be checked before the rest is appended
+        :return: size of part and record with url, size and ETag of file
+        """
+        record = read_manifest(self.path_to_record)
+        if record is None or record.get("url") != self.url:
+            self.remove_part()
+            return 0, {}
+        if not os.path.exists(self.path_to_part):
+            return 0, record
+        return os.path.getsize(self.path_to_part), record
+
+    def remove_part(self) -> None:
+        for path in (self.path_to_part, self.path_to_record):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def download_part(self) -> int:
+        """
+        Download the rest of file to part, server is asked only for bytes which aren't in part yet
+        :return: size of whole file
+        """
+        position, record = self.read_part()
+        # compressed response would have other size than file, so Content-Length and Range wouldn't match it
+        headers = {"Accept-Encoding": "identity"}
+        if position:
+            headers["Range"] = f"bytes={position}-"
+            if record.get("etag"):
+                # server sends whole file if it was changed since part was saved
+                headers["If-Range"] = record["etag"]
+        with requests.get(
+            self.direct_url(), headers=headers, stream=True, timeout=self.timeout
+        ) as response:
+            if response.status_code == 416:
+                # part is already complete, or longer than file and it's downloaded again
+                size = int(response.headers.get("Content-Range", "*/-1").split("/")[-1])
+                if size != position or size != record.get("size"):
+                    self.remove_part()
+                return size
+            response.raise_for_status()
+            if response.headers.get("Content-Type", "").startswith("text/html"):
+                file_id = self.drive_file_id()
+                if file_id is None:
+                    raise ValueError(
+                        f"{self.url} returned a web page instead of file, e.g. quota was exceeded"
+                    )
+                response.close()
+                return self.download_with_gdown(file_id)
+            length = response.headers.get("Content-Length")
+            if length is None:
+                raise ValueError(
+                    f"{self.url} didn't send size of file, so download can't be checked"
+                )
+            if response.status_code != 206:
+                # server sent whole file
+                position = 0
+            size = position + int(length)
+            if position and size != record.get("size"):
+                # file was changed since part was saved, it's downloaded again
+                self.remove_part()
+                return size
+            write_manifest(
+                self.path_to_record,
+                {"url": self.url, "size": size, "etag": response.headers.get("ETag")},
+            )
+            with open(self.path_to_part, "ab" if position else "wb") as file:
+                for chunk in response.iter_content(chunk_size=1 << 16):
+                    file.write(chunk)
+        return size
+
+    def download_with_gdown(self, file_id: str) -> int:
+        """
+        Download whole file to part with gdown, which passes confirmation page of Google Drive with its cookies
+        :param file_id: id of file on Google Drive
+        :return: size of file
+        """
+        self.remove_part()
+        if gdown.download(id=file_id, output=self.path_to_part, quiet=True) is None:
+            raise ValueError(
+                f"{self.url} returned a web page instead of file, e.g. quota of Google Drive was exceeded"
+            )
+        return os.path.getsize(self.path_to_part)
+
     def get_data_from_drive(self) -> None:
-        gdown.download(url=self.url, output=self.path_to_save, fuzzy=True)
+        """
+        Download file to part, resume it when it's interrupted and rename verified part to file
+        """
+        for _ in range(self.retries + 1):
+            try:
+                size = self.download_part()
+            except (
+                requests.ConnectionError,
+                requests.Timeout,
+                requests.exceptions.ChunkedEncodingError,
+            ):
+                continue
+            if not os.path.exists(self.path_to_part):
+                continue
+            if os.path.getsize(self.path_to_part) == size:
+                break
+        else:
+            raise IOError(f"Download of {self.url} was interrupted too many times")
+        entry = self.read_entry()
+        if entry is not None and not self.matches(self.path_to_part, entry):
+            self.remove_part()
+            raise ValueError(
+                f"Downloaded {self.path_to_save} doesn't match expected size and sha256, "
+                f"update them if the dataset was changed"
+            )
+        os.replace(self.path_to_part, self.path_to_save)
+        self.remove_part()
+        self.write_entry()
 
     def create_folder_if_not_exists(self) -> None:
         if not os.path.exists(self.path_to_folder):
-            os.makedirs(self.path_to_folder)
+            os.makedirs(self.path_to_folder, exist_ok=True)
 
     def download_if_not_exists(self) -> None:
         if not os.path.exists(self.path_to_save):
             self.get_data_from_drive()
+            return
+        entry = self.read_entry()
+        if entry is None:
+            # file downloaded before manifest was made
+            self.write_entry()
+        elif not self.matches(self.path_to_save, entry):
+            self.get_data_from_drive()
@@ -0,0 +1,257 @@
+import hashlib
+import json
+import os
+import uuid
+from contextlib import contextmanager
+from typing import IO, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def file_digest(path_to_file: str, block_size: int = 1 << 20) -> str:
+    """
+    Compute sha256 of file content, reading the file in blocks
+    :param path_to_file:
+    :param block_size: number of bytes read at once
+    :return: hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path_to_file, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_stat(path_to_file: str) -> list[int]:
+    """
+    :param path_to_file:
+    :return: size, modification time and inode of file, they change when file is written or replaced
+    """
+    stat = os.stat(path_to_file)
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+
+def path_to_stamp(path_to_output: str) -> str:
+    return os.path.splitext(path_to_output)[0] + ".stamp.json"
+
+
+def write_stamp(path_to_output: str, digests: list[str]) -> None:
+    """
+    Save digests of files from which output was made, next to the output
+    :param path_to_output: path to output file
+    :param digests: digests of input files
+    """
+    with open(path_to_stamp(path_to_output), "w") as file:
+        json.dump({"inputs": digests}, file)
+
+
+def read_stamp(path_to_output: str) -> Optional[list[str]]:
+    """
+    Read digests of files from which output was made
+    :param path_to_output: path to output file
+    :return: digests of input files or None if output or stamp doesn't exist
+    """
+    if not os.path.exists(path_to_output):
+        return None
+    try:
+        with open(path_to_stamp(path_to_output)) as file:
+            return json.load(file)["inputs"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def hash_json(value) -> str:
+    """
+    Hash value which can be saved in json, e.g. list of digests and parameters
+    :param value: value
+    :return: hex digest
+    """
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+
+def write_stage_stamp(path_to_output: str, key: str) -> None:
+    """
+    Save key of stage which made output and current state of output, next to the output
+    :param path_to_output: path to output file
+    :param key: hash of inputs and parameters of stage
+    """
+    with open(path_to_stamp(path_to_output), "w") as file:
+        json.dump({"stage": key, "stat": file_stat(path_to_output)}, file)
+
+
+def read_stage_stamp(path_to_output: str) -> Optional[str]:
+    """
+    Read key of stage which made output
+    :param path_to_output: path to output file
+    :return: key or None if output doesn't exist or was changed since the stage made it
+    """
+    if not os.path.exists(path_to_output):
+        return None
+    try:
+        with open(path_to_stamp(path_to_output)) as file:
+            stamp = json.load(file)
+        if stamp["stat"] != file_stat(path_to_output):
+            return None
+        return stamp["stage"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def hash_rows(df: pd.DataFrame) -> np.ndarray:
+    """
+    Hash each row, numbers are hashed as float, so the same value parsed as int or float has the same hash
+    :param df: rows of dataset
+    :return: 64-bit hash of each row
+    """
+    numeric = df.select_dtypes("number").columns
+    df = df.astype({column: np.float64 for column in numeric})
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+class RowHashSet:
+    """
+    64-bit hashes of rows, 8 bytes for each distinct row, so memory grows with number of rows of dataset.
+    Finds repeated rows in dataset read in chunks. Hashes are kept in sorted runs, a run is merged with
+    the previous one only when it's at least as long, so each hash is merged O(log n) times, not once per chunk.
+    """
+
+    def __init__(self) -> None:
+        self.runs = []
+
+    def __len__(self) -> int:
+        return sum(len(run) for run in self.runs)
+
+    @property
+    def hashes(self) -> np.ndarray:
+        """
+        :return: all hashes, sorted in each run
+        """
+        return np.concatenate(self.runs) if self.runs else np.empty(0, np.uint64)
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        """
+        :param hashes: hashes of rows
+        :return: True for each hash which is in set
+        """
+        found = np.zeros(len(hashes), dtype=bool)
+        for run in self.runs:
+            position = np.searchsorted(run, hashes).clip(max=len(run) - 1)
+            found |= run[position] == hashes
+        return found
+
+    def add(self, hashes: np.ndarray) -> None:
+        """
+        :param hashes: hashes which aren't in set yet
+        """
+        hashes = np.unique(hashes)
+        if len(hashes) == 0:
+            return
+        self.runs.append(hashes)
+        while len(self.runs) > 1 and len(self.runs[-2]) <= len(self.runs[-1]):
+            last = self.runs.pop()
+            # stable sort merges two sorted runs in linear time
+            self.runs[-1] = np.sort(
+                np.concatenate([self.runs[-1], last]), kind="stable"
+            )
+
+    def first_seen(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Find rows which weren't seen before, in chunk or in previous chunks, and add them to set
+        :param df: next rows of dataset
+        :return: True for each row seen for the first time, like ~df.duplicated() for the whole dataset
+        """
+        return self.first_seen_hashes(hash_rows(df))
+
+    def first_seen_hashes(self, hashes: np.ndarray) -> np.ndarray:
+        """
+        Like first_seen for rows already hashed
+        :param hashes: hashes of next rows of dataset
+        :return: True for each hash seen for the first time
+        """
+        new = ~(self.contains(hashes) | pd.Series(hashes).duplicated().to_numpy())
+        self.add(hashes[new])
+        return new
+
+
+def hash_frame(df: pd.DataFrame) -> str:
+    """
+    Hash dataframe, order of rows doesn't matter
+    :param df: dataframe
+    :return: hex digest, sum of 64-bit hashes of rows
+    """
+    return format(int(hash_rows(df).sum()), "016x")
+
+
+def block_names(df: pd.DataFrame, keys: list[str]) -> pd.Series:
+    """
+    Name block of each row
+    :param df: dataframe
+    :param keys: key columns, e.g. 'code' and 'year'
+    :return: values of key columns joined with ':', e.g. 'AFG:1990'
+    """
+    names = df[keys[0]].astype(str)
+    for key in keys[1:]:
+        names = names + ":" + df[key].astype(str)
+    return names
+
+
+def hash_blocks(df: pd.DataFrame, keys: list[str]) -> dict[str, str]:
+    """
+    Hash each block of rows with the same values of key columns, order of rows in block doesn't matter
+    :param df: dataframe without duplicated rows
+    :param keys: key columns, e.g. 'code' and 'year'
+    :return: dictionary key values joined with ':' -> hex digest of block
+    """
+    hashes = hash_rows(df)
+    group = df.groupby(keys, sort=False, observed=True).ngroup().to_numpy()
+    order = np.argsort(group, kind="stable")
+    starts = np.flatnonzero(np.diff(group[order], prepend=-1) != 0)
+    # sum of hashes wraps around 2**64
+    sums = np.add.reduceat(hashes[order], starts) if len(order) else hashes
+    names = block_names(df.iloc[order[starts]], keys)
+    return {name: format(int(value), "016x") for name, value in zip(names, sums)}
+
+
+def read_manifest(path_to_manifest: str) -> Optional[dict]:
+    """
+    Read manifest of files made by the last run
+    :param path_to_manifest: path to json file
+    :return: dictionary or None if manifest doesn't exist
+    """
+    try:
+        with open(path_to_manifest) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+@contextmanager
+def atomic_open(path_to_file: str, mode: str = "w") -> Iterator[IO]:
+    """
+    Open unique temporary file next to file and replace file with it when block ends without error,
+    readers see an old or a new file, never a partial one, and threads writing the same file don't collide
+    :param path_to_file: path to file
+    :param mode: 'w' or 'wb'
+    :return: opened temporary file
+    """
+    # unlike mkstemp, file gets the same permissions as file made by open
+    path_to_tmp = f"{path_to_file}.{uuid.uuid4().hex}.tmp"
+    descriptor = os.open(path_to_tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with open(descriptor, mode) as file:
+            yield file
+        os.replace(path_to_tmp, path_to_file)
+    except BaseException:
+        os.remove(path_to_tmp)
+        raise
+
+
+def write_manifest(path_to_manifest: str, manifest: dict) -> None:
+    """
+    Write manifest atomically, readers see an old or a new file, never a partial one
+    :param path_to_manifest: path to json file
+    :param manifest: dictionary
+    """
+    with atomic_open(path_to_manifest) as file:
+        json.dump(manifest, file)
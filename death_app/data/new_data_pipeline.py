@@ -1,26 +1,94 @@
 from death_app.data.data_validator import DataValidator
+from death_app.data.snapshot import SnapshotStore
 from config import settings
 import os
+import sys
 
 
 def check_new_data(path_to_death_dataset, path_to_index_dataset):
-    dv = DataValidator(path_to_death_dataset, path_to_index_dataset)
+    dv = DataValidator(
+        path_to_death_dataset,
+        path_to_index_dataset,
+        path_to_cache=settings["paths"]["path_validation_cache"],
+    )
     is_correct = dv.check_pipeline()
     return is_correct
 
 
+def report_new_data(path_to_death_dataset, path_to_index_dataset) -> str:
+    """
+    Run all checks of new datasets without stopping at the first error
+    :param path_to_death_dataset: path to new death dataset
+    :param path_to_index_dataset: path to new index dataset
+    :return: report in JSON with every failing check, examples of wrong rows, time and scanned rows of each check
+    """
+    dv = DataValidator(
+        path_to_death_dataset,
+        path_to_index_dataset,
+        path_to_cache=settings["paths"]["path_validation_cache"],
+    )
+    return dv.validate(fail_fast=False).to_json()
+
+
+def app_snapshots() -> SnapshotStore:
+    """
+    Versions of datasets used by application, before the first version is published
+    preprocessed datasets are used
+    :return: snapshot store
+    """
+    return SnapshotStore(
+        settings["dirs"]["snapshots"],
+        {
+            "input": settings["paths"]["path_to_save_input"],
+            "index": settings["paths"]["path_save_index"],
+            "development": settings["paths"]["path_save_development"],
+        },
+    )
+
+
+def publish_preprocessed_data():
+    """
+    Make application use preprocessed datasets, running apps load them in background.
+    Nothing is published when datasets are the same as in current version, e.g. all stages were skipped.
+    """
+    sources = {
+        "input": settings["paths"]["path_to_save_input"],
+        "index": settings["paths"]["path_save_index"],
+    }
+    if os.path.exists(settings["paths"]["path_save_development"]):
+        sources["development"] = settings["paths"]["path_save_development"]
+    snapshots = app_snapshots()
+    if not snapshots.is_current(sources):
+        snapshots.publish(sources)
+
+
+def publish_new_data():
+    """
+    Make application use new datasets, both files are published as one version
+    """
+    app_snapshots().publish(
+        {
+            "input": settings["paths"]["path_to_new_death"],
+            "index": settings["paths"]["path_to_new_index"],
+        },
+        move=True,
+    )
+
+
 def replace_new_data_if_correct():
     path_to_death_dataset = settings["paths"]["path_to_new_death"]
     path_to_index_dataset = settings["paths"]["path_to_new_index"]
     if check_new_data(path_to_death_dataset, path_to_index_dataset):
-        if not os.path.exists(settings["dirs"]["data_root"]):
-            os.makedirs(settings["dirs"]["data_root"])
-
-        # Death
-        os.replace(path_to_death_dataset, settings["paths"]["path_to_save_input"])
-        # Index
-        os.replace(path_to_index_dataset, settings["paths"]["path_save_index"])
+        publish_new_data()
 
 
 if __name__ == "__main__":
-    replace_new_data_if_correct()
+    if len(sys.argv) > 1 and sys.argv[1] == "report":
+        print(
+            report_new_data(
+                settings["paths"]["path_to_new_death"],
+                settings["paths"]["path_to_new_index"],
+            )
+        )
+    else:
+        replace_new_data_if_correct()
@@ -1,10 +1,11 @@
 from death_app.data.data_preprocessing_pipeline import DataPreprocessingPipeline
+from death_app.data.new_data_pipeline import publish_preprocessed_data
 from config import settings
 import sys
 
 
-def make(population_from_api):
-    dp = DataPreprocessingPipeline(
+def make_pipeline(population_from_api, streaming=False):
+    return DataPreprocessingPipeline(
         path_death=settings["paths"]["path_death"],
         path_population=settings["paths"]["path_population"],
         path_index=settings["paths"]["path_index"],
@@ -13,13 +14,24 @@ def make(population_from_api):
         population_from_api=population_from_api,
         path_save_index=settings["paths"]["path_save_index"],
         path_to_save_input=settings["paths"]["path_to_save_input"],
+        path_save_development=settings["paths"]["path_save_development"],
+        streaming=streaming,
+        exact=settings["types"]["exact"],
+        path_to_manifest=settings["paths"]["path_preprocess_manifest"],
+        cache_stages=True,
     )
+
+
+def make(population_from_api, streaming=False):
+    dp = make_pipeline(population_from_api, streaming)
     dp.preprocess_data()
     dp.save_preprocessed_dataset()
+    publish_preprocessed_data()
 
 
 if __name__ == "__main__":
+    streaming = len(sys.argv) > 2 and sys.argv[2] == "stream"
     if sys.argv[1] == "true":
-        make(True)
+        make(True, streaming)
     elif sys.argv[1] == "false":
-        make(False)
+        make(False, streaming)
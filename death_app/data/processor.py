@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 
@@ -10,8 +11,87 @@ class DataProcessor:
         pass
 
     @staticmethod
+    def get_top_k(values: np.ndarray, top: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Find top N values in each row of matrix with one numpy call for all rows, NaN are the smallest
+        :param values: 2D array, rows x causes of death
+        :param top: number of causes
+        :return: values and numbers of columns of top N causes in each row, sorted descending
+        """
+        top = min(top, values.shape[1])
+        ranked = np.where(np.isnan(values), -np.inf, values)
+        if top < values.shape[1]:
+            columns = np.argpartition(-ranked, top - 1, axis=1)[:, :top]
+        else:
+            columns = np.broadcast_to(np.arange(values.shape[1]), values.shape)
+        # sort only N selected causes in each row
+        order = np.argsort(
+            -np.take_along_axis(ranked, columns, axis=1), axis=1, kind="stable"
+        )
+        columns = np.take_along_axis(columns, order, axis=1)
+        return np.take_along_axis(values, columns, axis=1), columns
+
+    @staticmethod
+    def get_rates(df: pd.DataFrame, per_capita: bool) -> pd.DataFrame:
+        """
+        Get number of deaths per one inhabitant
+        :param df: dataframe with first 4 columns ['country', 'code', 'year', 'population'] next columns are death
+        causes
+        :param per_capita: if True death causes columns already contain deaths per one inhabitant
+        :return: dataframe with death causes
+        """
+        if per_capita:
+            return df.iloc[:, 4:]
+        return df.iloc[:, 4:].divide(df["population"], axis=0)
+
+    @classmethod
+    def get_top_causes_in_rows(cls, result: pd.DataFrame, top: int) -> pd.DataFrame:
+        """
+        Keep top N causes in each row, other causes are 0
+        :param result: dataframe with death causes in columns
+        :param top: number of causes
+        :return: dataframe with causes which are in top N in at least one row
+        """
+        values, columns = cls.get_top_k(result.to_numpy(dtype=np.float64), top)
+        # causes in order of appearance in rows
+        flat_columns = columns.ravel()
+        _, first = np.unique(flat_columns, return_index=True)
+        selected = flat_columns[np.sort(first)]
+        position = np.empty(result.shape[1], dtype=np.int64)
+        position[selected] = np.arange(len(selected))
+
+        top_result = np.full((result.shape[0], len(selected)), np.nan)
+        top_result[np.arange(result.shape[0])[:, None], position[columns]] = values
+        return pd.DataFrame(
+            top_result,
+            index=result.index.rename(None),
+            columns=result.columns[selected],
+        ).fillna(0)
+
+    @classmethod
+    def get_top_causes_in_rows_long(
+        cls, result: pd.DataFrame, top: int
+    ) -> pd.DataFrame:
+        """
+        Keep top N causes in each row and reshape to long format
+        :param result: dataframe with death causes in columns and index which identifies rows
+        :param top: number of causes
+        :return: dataframe with index levels as columns and columns 'Causes of death', 'values'
+        """
+        values, columns = cls.get_top_k(result.to_numpy(dtype=np.float64), top)
+        df_result = result.index.to_frame(index=False).iloc[
+            np.repeat(np.arange(result.shape[0]), columns.shape[1])
+        ]
+        df_result = df_result.reset_index(drop=True)
+        df_result["Causes of death"] = result.columns.to_numpy()[columns.ravel()]
+        df_result["values"] = values.ravel()
+        return df_result[df_result["values"].notna()].sort_values(
+            by=list(result.index.names), kind="stable"
+        )
+
+    @classmethod
     def get_top_causes_summed_by_range_of_year(
-        df: pd.DataFrame, top: int
+        cls, df: pd.DataFrame, top: int
     ) -> pd.DataFrame:
         """
         Shows top N causes of death in a set of countries, summed across specified date range
@@ -20,7 +100,11 @@ class DataProcessor:
         :return: dataframe summed by range of year with top N causes of death in specified countries
         """
         # set index and summed for country and year
-        sum_by_year = df.set_index(["country", "year"]).groupby("country").sum()
+        sum_by_year = (
+            df.set_index(["country", "year"])
+            .groupby("country", observed=True)
+            .sum(numeric_only=True)
+        )
         # Calculate death per X inhabitants
         inhabitants = 10_000
         # first  column ['population'] next columns are death causes
@@ -29,70 +113,56 @@ class DataProcessor:
             * inhabitants
         )
         # found top causes in each country
-        top_result = []
-        for index, row in result.iterrows():
-            top_result.append(row.sort_values(ascending=False)[:top])
-        # fill 0 NaN
-        return pd.DataFrame(top_result).fillna(0)
+        return cls.get_top_causes_in_rows(result, top)
 
-    @staticmethod
-    def get_top_causes_in_each_year(df: pd.DataFrame, top: int) -> pd.DataFrame:
+    @classmethod
+    def get_top_causes_in_each_year(
+        cls, df: pd.DataFrame, top: int, per_capita: bool = False
+    ) -> pd.DataFrame:
         """
         Shows top N causes of death in a set of countries, in each year from a specified date range
         :param df: dataframe with specific countries and data range
         :param top: top number of causes
+        :param per_capita: if True death causes columns in df contain deaths per one inhabitant
         :return: dataframe with top N causes of death in each year in specified countries
         """
         # Calculate death per X inhabitants
         inhabitants = 10_000
-        # first 4 columns ['country', 'code', 'year', 'population'] next columns are death causes
-        result = df.iloc[:, 4:].divide(df["population"], axis=0) * inhabitants
-        # keep info about country and year
-        result["country"] = df["country"]
-        result["year"] = df["year"]
-        # set index
-        result = result.set_index(["year", "country"]).T
-        each_year = []
-        for column in list(result.columns):
-            each_year.append(result[column].sort_values(ascending=False)[:top])
-
-        df_result = pd.DataFrame(each_year)
-        df_result = df_result.rename_axis(("year", "country"))
-        df_result = (
-            df_result.stack()
-            .reset_index()
-            .rename(columns={"level_2": "Causes of death", 0: "values"})
-            .sort_values(by=["year", "country"])
+        result = cls.get_rates(df, per_capita)
+        # keep info about year and country
+        result.index = pd.MultiIndex.from_arrays(
+            [df["year"], df["country"]], names=["year", "country"]
         )
-
+        df_result = cls.get_top_causes_in_rows_long(result, top)
+        df_result["values"] = df_result["values"] * inhabitants
         return df_result
 
     @staticmethod
     def get_trend_cause_in_each_year_in_countries(
-        df: pd.DataFrame, cause: str
+        df: pd.DataFrame, cause: str, per_capita: bool = False
     ) -> pd.DataFrame:
         """
         Shows trend in cause of death in set of countries, in each year, from a specified date range
         :param df: dataframe with specific level of development and data range
         :param cause:  one cause of death
+        :param per_capita: if True death causes columns in df contain deaths per one inhabitant
         :return: dataframe in specific range of year, in each year, with one cause of death in specified countries
         """
         # Calculate death per X inhabitants
         inhabitants = 100_000
-        # first 4 columns ['country', 'code', 'year', 'population']  next columns are death causes
-        result = df.iloc[:, 4:].divide(df["population"], axis=0) * inhabitants
-        result["country"] = df["country"]
-        result["year"] = df["year"]
         # update causes name
         cause = f"d: {cause}"
+        result = df.loc[:, ["country", "year"]]
+        if per_capita:
+            result[cause] = df[cause] * inhabitants
+        else:
+            result[cause] = df[cause] / df["population"] * inhabitants
         # return only with specific causes
-        return result.loc[:, ["country", "year", cause]].sort_values(
-            by=["country", "year"]
-        )
+        return result.sort_values(by=["country", "year"])
 
-    @staticmethod
+    @classmethod
     def get_top_causes_summed_by_level_of_develop(
-        df: pd.DataFrame, top: int
+        cls, df: pd.DataFrame, top: int
     ) -> pd.DataFrame:
         """
         Shows top N causes of death by the level of development, summed across specified date range
@@ -101,7 +171,7 @@ class DataProcessor:
         :return: dataframe summed by range of year with top N causes of death in specified level of development
         """
         # grouped by development and divide by group size
-        sum_by_level = df.groupby("development").sum()
+        sum_by_level = df.groupby("development", observed=True).sum(numeric_only=True)
         # Calculate death per X inhabitants
         inhabitants = 100_000
         # first 2 columns are 'year' and 'population' next columns are death causes
@@ -110,14 +180,11 @@ class DataProcessor:
             * inhabitants
         )
         # found top causes in each level of development
-        top_result = []
-        for index, row in result.iterrows():
-            top_result.append(row.sort_values(ascending=False)[:top])
-        return pd.DataFrame(top_result).fillna(0)
+        return cls.get_top_causes_in_rows(result, top)
 
-    @staticmethod
+    @classmethod
     def get_top_causes_in_each_year_by_level_of_develop(
-        df: pd.DataFrame, top: int
+        cls, df: pd.DataFrame, top: int
     ) -> pd.DataFrame:
         """
         Shows top N causes of death by the level of development, summed across specified date range
@@ -126,28 +193,17 @@ class DataProcessor:
         :return: dataframe summed by range of year with top N causes of death in specified level of development
         """
         # grouped by year and development
-        sum_by_level = df.groupby(["year", "development"]).sum()
+        sum_by_level = df.groupby(["year", "development"], observed=True).sum(
+            numeric_only=True
+        )
         # Calculate death per X inhabitants
         inhabitants = 100_000
         # first  column is 'population' next columns are death causes
         result = (
             sum_by_level.iloc[:, 1:].divide(sum_by_level["population"], axis=0)
             * inhabitants
-        ).T
-        each_year = []
-        for column in list(result.columns):
-            each_year.append(result[column].sort_values(ascending=False)[:top])
-
-        df_result = pd.DataFrame(each_year)
-        df_result = df_result.rename_axis(("year", "development"))
-        df_result = (
-            df_result.stack()
-            .reset_index()
-            .rename(columns={"level_2": "Causes of death", 0: "values"})
-            .sort_values(by=["year", "development"])
         )
-        # return only with specific causes
-        return df_result
+        return cls.get_top_causes_in_rows_long(result, top)
 
     @staticmethod
     def get_trend_cause_in_each_year_by_level_of_develop(
@@ -161,7 +217,9 @@ class DataProcessor:
         development
         """
         # grouped by year and development
-        sum_by_level = df.groupby(["year", "development"]).sum()
+        sum_by_level = df.groupby(["year", "development"], observed=True).sum(
+            numeric_only=True
+        )
         # Calculate death per X inhabitants
         inhabitants = 100_000
         # first  column is 'population' next columns are death causes
@@ -0,0 +1,101 @@
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+
+class Schema:
+    """
+    Types of columns of raw and preprocessed datasets, shared by all readers and writers
+    - names and codes of countries and levels of development as categories
+    - years as int16
+    - population and number of deaths as float32, or float64 in exact mode
+    - human development index always as float64, levels of development are found by comparing it with thresholds
+    Types are given to read_csv, so columns are parsed straight to compact types.
+    """
+
+    categories = [
+        "country",
+        "code",
+        "development",
+        "Entity",
+        "Code",
+        "Country Name",
+        "Country Code",
+    ]
+    integers = ["year", "Year"]
+    exact_floats = ["hdi", "Human Development Index (UNDP)"]
+
+    def __init__(self, exact: bool = False) -> None:
+        """
+        :param exact: if True values are float64 like types inferred by pandas, so results are reproduced exactly
+        """
+        self.exact = exact
+        self.float_type = np.float64 if exact else np.float32
+
+    @classmethod
+    def category_dtypes(cls) -> dict:
+        """
+        Types of text columns, read_csv ignores columns which aren't in file
+        :return: dictionary column -> 'category'
+        """
+        return {column: "category" for column in cls.categories}
+
+    def dtypes(self, columns: Iterable[str], values: bool = True) -> dict:
+        """
+        Types of columns of dataset
+        :param columns: names of columns
+        :param values: if True all other columns are floats, otherwise pandas infers their types
+        :return: dictionary column -> type
+        """
+        dtypes = {}
+        for column in columns:
+            if column in self.categories:
+                dtypes[column] = "category"
+            elif column in self.integers:
+                dtypes[column] = np.int16
+            elif column in self.exact_floats:
+                dtypes[column] = np.float64
+            elif values:
+                dtypes[column] = self.float_type
+        return dtypes
+
+    def apply(self, df: pd.DataFrame, values: bool = True) -> pd.DataFrame:
+        """
+        Cast columns of dataframe to types of schema
+        :param df: dataframe
+        :param values: if True all other columns are cast to floats
+        :return: dataframe with compact types
+        """
+        return df.astype(self.dtypes(df.columns, values))
+
+    def read_chunks(
+        self, path_to_file: str, chunk_size: int, values: bool = True
+    ) -> Iterable[pd.DataFrame]:
+        """
+        Read csv file in chunks, each chunk is parsed straight to types of schema
+        :param path_to_file:
+        :param chunk_size: number of rows in chunk
+        :param values: if True all other columns are parsed as floats
+        :return: iterator over chunks
+        """
+        columns = pd.read_csv(path_to_file, nrows=0).columns
+        return pd.read_csv(
+            path_to_file, chunksize=chunk_size, dtype=self.dtypes(columns, values)
+        )
+
+    def read_csv(
+        self, path_to_file: str, chunk_size: int, values: bool = True
+    ) -> pd.DataFrame:
+        """
+        Read csv file in chunks and join them
+        :param path_to_file:
+        :param chunk_size: number of rows in chunk
+        :param values: if True all other columns are parsed as floats
+        :return: dataframe with compact types
+        """
+        df = pd.concat(self.read_chunks(path_to_file, chunk_size, values))
+        # categories of chunks differ, so joined columns are objects
+        return df.astype(
+            {column: "category" for column in df.columns if column in self.categories}
+        )
@@ -0,0 +1,117 @@
+import os
+import shutil
+import time
+from typing import Optional
+
+from death_app.data.fingerprint import (
+    file_digest,
+    path_to_stamp,
+    read_manifest,
+    write_manifest,
+)
+
+
+class SnapshotStore:
+    """
+    Versioned snapshots of datasets used by the application.
+    Each published version is a directory with all files, made in a temporary directory and renamed when complete.
+    File CURRENT names the version used by the application and sha256 of its files, it's replaced atomically,
+    so readers see all files of the old version or all files of the new one, never a mix of them.
+    Before the first version is published, files from default paths are used.
+    """
+
+    def __init__(
+        self, path_to_root: str, defaults: dict[str, str], keep: int = 3
+    ) -> None:
+        """
+        :param path_to_root: path to directory with versions
+        :param defaults: name of file -> default path, e.g. 'input' -> 'res/data/input_dataset.csv',
+        file keeps name of its default path in each version
+        :param keep: number of newest versions kept, running apps may still read older ones
+        """
+        self.path_to_root = path_to_root
+        self.defaults = defaults
+        self.keep = keep
+        self.path_to_current = os.path.join(path_to_root, "CURRENT")
+
+    def current(self) -> Optional[str]:
+        """
+        :return: name of current version or None if nothing was published
+        """
+        pointer = read_manifest(self.path_to_current)
+        return None if pointer is None else pointer["version"]
+
+    def is_current(self, sources: dict[str, str]) -> bool:
+        """
+        Check if files have the same content as files of current version, then they don't have to be published
+        :param sources: name of file -> path to file
+        :return: True if current version has the same files
+        """
+        pointer = read_manifest(self.path_to_current)
+        if pointer is None or set(pointer.get("files", {})) != set(sources):
+            return False
+        return all(
+            file_digest(path) == pointer["files"][name]
+            for name, path in sources.items()
+        )
+
+    def paths(self, version: Optional[str]) -> dict[str, Optional[str]]:
+        """
+        Paths to files of version
+        :param version: name of version, None for default paths
+        :return: name of file -> path, None if file isn't in version
+        """
+        if version is None:
+            return dict(self.defaults)
+        paths = {}
+        for name, default in self.defaults.items():
+            path = os.path.join(self.path_to_root, version, os.path.basename(default))
+            paths[name] = path if os.path.exists(path) else None
+        return paths
+
+    def publish(self, sources: dict[str, str], move: bool = False) -> str:
+        """
+        Make new version from files and make it current
+        :param sources: name of file -> path to file, stamp next to file is copied with it
+        :param move: if True files are moved, otherwise copied
+        :return: name of new version
+        """
+        version = str(time.time_ns())
+        path_to_tmp = os.path.join(self.path_to_root, f".{version}.tmp")
+        os.makedirs(path_to_tmp)
+        digests = {name: file_digest(source) for name, source in sources.items()}
+        for name, source in sources.items():
+            target = os.path.join(path_to_tmp, os.path.basename(self.defaults[name]))
+            if os.path.exists(path_to_stamp(source)):
+                shutil.copy2(path_to_stamp(source), path_to_stamp(target))
+            if move:
+                shutil.move(source, target)
+            else:
+                shutil.copy2(source, target)
+        os.rename(path_to_tmp, os.path.join(self.path_to_root, version))
+        write_manifest(self.path_to_current, {"version": version, "files": digests})
+        self.prune()
+        return version
+
+    def versions(self) -> list[str]:
+        """
+        :return: names of published versions from the oldest
+        """
+        if not os.path.exists(self.path_to_root):
+            return []
+        return sorted(
+            name
+            for name in os.listdir(self.path_to_root)
+            if name.isdigit() and os.path.isdir(os.path.join(self.path_to_root, name))
+        )
+
+    def prune(self) -> None:
+        """
+        Remove old versions, current version and the newest ones are kept
+        """
+        current = self.current()
+        for version in self.versions()[: -self.keep]:
+            if version != current:
+                shutil.rmtree(
+                    os.path.join(self.path_to_root, version), ignore_errors=True
+                )
@@ -0,0 +1,113 @@
+import json
+import os
+from typing import Callable, Optional
+
+from death_app.data.fingerprint import atomic_open, file_stat
+
+
+class ValidationCache:
+    """
+    Results of checks of new datasets stored in one json file, keyed by name of dataset and sha256 of its content.
+    Results are valid only for the version of validator which made them.
+    Path, size, modification time and inode of checked file map to its sha256, so file which wasn't changed
+    since the last check is accepted or rejected without reading it. Copied or downloaded again file with
+    the same content is only hashed.
+    """
+
+    max_results = 32
+
+    def __init__(self, path_to_cache: str, version: int) -> None:
+        """
+        :param path_to_cache: path to json file
+        :param version: version of validator
+        """
+        self.path_to_cache = path_to_cache
+        self.version = version
+
+    def read(self) -> dict:
+        """
+        Read cache, cache of another version of validator is empty
+        :return: dictionary with 'files' and 'results'
+        """
+        try:
+            with open(self.path_to_cache) as file:
+                cache = json.load(file)
+        except (OSError, ValueError):
+            cache = None
+        if cache is None or cache.get("version") != self.version:
+            return {"version": self.version, "files": {}, "results": {}}
+        return cache
+
+    def write(self, cache: dict) -> None:
+        """
+        Write cache atomically, readers see an old or a new file, never a partial one
+        :param cache: dictionary with 'files' and 'results'
+        """
+        folder = os.path.dirname(self.path_to_cache)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        with atomic_open(self.path_to_cache) as file:
+            json.dump(cache, file)
+
+    def get(
+        self,
+        dataset: str,
+        path_to_file: str,
+        digest: Callable[[], str] = None,
+    ) -> Optional[dict]:
+        """
+        Find result of checks of file which wasn't changed since it was checked. Unknown or changed file is
+        hashed only if it has the same size as a checked file of dataset, so a copy of checked file is found too.
+        Other files aren't read here, they are hashed while they are checked.
+        :param dataset: name of dataset, e.g. 'death'
+        :param path_to_file: path to checked file
+        :param digest: function which returns sha256 of content of file
+        :return: result or None if file with the same content wasn't checked
+        """
+        cache = self.read()
+        results = cache["results"].get(dataset, {})
+        known = cache["files"].get(path_to_file)
+        stat = file_stat(path_to_file)
+        if known is not None and known["stat"] == stat:
+            return results.get(known["sha256"])
+        sizes = {
+            entry["stat"][0]
+            for entry in cache["files"].values()
+            if entry["sha256"] in results
+        }
+        if digest is None or stat[0] not in sizes:
+            return None
+        sha256 = digest()
+        result = results.get(sha256)
+        if result is not None:
+            # next time file is accepted without reading it
+            self.put(dataset, path_to_file, stat, sha256, result)
+        return result
+
+    def put(
+        self,
+        dataset: str,
+        path_to_file: str,
+        stat: list[int],
+        digest: str,
+        result: dict,
+    ) -> None:
+        """
+        Save result of checks of file
+        :param dataset: name of dataset, e.g. 'death'
+        :param path_to_file: path to checked file
+        :param stat: size, modification time and inode of file before it was read
+        :param digest: sha256 of content of file
+        :param result: result of checks
+        """
+        if file_stat(path_to_file) != stat:
+            # file was changed while it was checked
+            return
+        cache = self.read()
+        cache["files"][path_to_file] = {"stat": stat, "sha256": digest}
+        results = cache["results"].setdefault(dataset, {})
+        results.pop(digest, None)
+        results[digest] = result
+        for old in list(results)[: -self.max_results]:
+            del results[old]
+        self.write(cache)
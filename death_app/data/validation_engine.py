@@ -0,0 +1,718 @@
+import copy
+import hashlib
+import io
+import json
+import os
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from functools import cached_property
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from death_app.data.fingerprint import RowHashSet, hash_rows
+from death_app.data.schema import Schema
+
+
+class Check:
+    """
+    One rule of dataset structure. Engine gives it each chunk of dataset, rule which needs
+    more than one chunk keeps compact accumulator between chunks.
+    Check counts scanned rows and time and keeps a few examples of rows which break the rule.
+    """
+
+    max_samples = 5
+
+    def __init__(self, message: str = "") -> None:
+        """
+        :param message: message printed when dataset breaks the rule
+        """
+        self.message = message
+        self.is_valid = True
+        self.stopped = False
+        self.rows_scanned = 0
+        self.seconds = 0.0
+        self.samples = []
+
+    @property
+    def name(self) -> str:
+        return type(self).__name__
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        """
+        Check next chunk of dataset, call fail when chunk breaks the rule
+        :param chunk: next rows of dataset, index is number of row in dataset
+        """
+        raise NotImplementedError
+
+    def finish(self) -> None:
+        """
+        Check rules which need the whole dataset, called once after all chunks
+        """
+
+    def fail(self, rows: Optional[pd.DataFrame] = None, **details) -> None:
+        """
+        Mark that dataset breaks the rule and keep examples
+        :param rows: rows which break the rule
+        :param details: description of error which isn't in one row
+        """
+        self.is_valid = False
+        free = self.max_samples - len(self.samples)
+        if free <= 0:
+            return
+        if rows is None:
+            if details:
+                self.samples.append(details)
+            return
+        rows = rows.head(free)
+        for line, row in zip(rows.index, self.row_values(rows)):
+            # header is the first line of file
+            self.samples.append({"line": int(line) + 2, "values": row})
+
+    @staticmethod
+    def row_values(rows: pd.DataFrame) -> list[dict]:
+        """
+        :param rows: rows of dataset
+        :return: values of each row, missing values are None
+        """
+        return rows.astype(object).where(rows.notna(), None).to_dict("records")
+
+    def start_part(self, first: bool) -> None:
+        """
+        Prepare check for one part of dataset, before it reads the first chunk
+        :param first: if True part is at the beginning of dataset
+        """
+
+    def shift_lines(self, rows: int) -> None:
+        """
+        Move line numbers of examples from part of dataset to numbers in the whole dataset
+        :param rows: number of rows before the part
+        """
+        for sample in self.samples:
+            if "line" in sample:
+                sample["line"] += rows
+
+    def merge(self, other: "Check") -> None:
+        """
+        Add state of the same check run on another part of dataset
+        :param other: check run on another part of dataset
+        """
+        self.is_valid = self.is_valid and other.is_valid
+        self.stopped = self.stopped or other.stopped
+        self.rows_scanned += other.rows_scanned
+        self.seconds += other.seconds
+        self.samples.extend(other.samples[: self.max_samples - len(self.samples)])
+
+    def to_dict(self) -> dict:
+        """
+        :return: machine-readable result of check
+        """
+        return {
+            "check": self.name,
+            "passed": self.is_valid,
+            "message": None if self.is_valid else self.message,
+            "rows_scanned": self.rows_scanned,
+            "seconds": round(self.seconds, 6),
+            "samples": self.samples,
+        }
+
+
+class MinimalSizeCheck(Check):
+    """
+    Dataset must contain at least one row and required number of columns
+    """
+
+    def __init__(
+        self, min_columns: int, max_columns: Optional[int] = None, message: str = ""
+    ) -> None:
+        super().__init__(message)
+        self.min_columns = min_columns
+        self.max_columns = max_columns
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        if self.is_valid and (
+            chunk.shape[1] < self.min_columns
+            or (self.max_columns is not None and chunk.shape[1] > self.max_columns)
+        ):
+            self.fail(columns=chunk.shape[1])
+
+    def finish(self) -> None:
+        if self.rows_scanned == 0:
+            self.fail(rows_in_dataset=0)
+
+
+class ColumnsNameCheck(Check):
+    """
+    Dataset must start with required columns, names of next columns must start with prefix
+    """
+
+    def __init__(
+        self,
+        columns: list[str],
+        prefix: Optional[str] = None,
+        message: str = "",
+    ) -> None:
+        """
+        :param columns: names of first columns
+        :param prefix: prefix of names of next columns, if None dataset contains only required columns
+        :param message: message printed when dataset breaks the rule
+        """
+        super().__init__(message)
+        self.columns = columns
+        self.prefix = prefix
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        columns = list(chunk.columns)
+        if self.prefix is None:
+            is_valid = columns == self.columns
+        else:
+            is_valid = columns[: len(self.columns)] == self.columns and all(
+                column.startswith(self.prefix)
+                for column in columns[len(self.columns) :]
+            )
+        if self.is_valid and not is_valid:
+            self.fail(columns=columns)
+
+
+class ColumnTypeCheck(Check):
+    """
+    Columns must be convertible to type
+    """
+
+    def __init__(
+        self, columns: Union[slice, str], dtype: type, message: str = ""
+    ) -> None:
+        """
+        :param columns: name of column or slice of columns positions
+        :param dtype: required type
+        :param message: message printed when dataset breaks the rule
+        """
+        super().__init__(message)
+        self.columns = columns
+        self.dtype = dtype
+
+    @property
+    def name(self) -> str:
+        if isinstance(self.columns, slice):
+            columns = f"{self.columns.start or ''}:{self.columns.stop or ''}"
+        else:
+            columns = self.columns
+        return f"{type(self).__name__}({columns}, {self.dtype.__name__})"
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        if isinstance(self.columns, slice):
+            values = chunk.iloc[:, self.columns]
+        else:
+            values = chunk[[self.columns]]
+        try:
+            values.astype(self.dtype)
+        except ValueError:
+            invalid = pd.Series(False, index=chunk.index)
+            if self.dtype in (int, float):
+                numbers = values.apply(pd.to_numeric, errors="coerce")
+                invalid = (numbers.isna() & values.notna()).any(axis=1)
+                if self.dtype is int:
+                    invalid |= values.isna().any(axis=1)
+            self.fail(chunk[invalid])
+
+
+class NonNegativeCheck(Check):
+    """
+    Columns from position have to contain values greater than or equal to 0
+    """
+
+    def __init__(self, first_column: int, message: str = "") -> None:
+        super().__init__(message)
+        self.first_column = first_column
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        invalid = ~(chunk.iloc[:, self.first_column :] >= 0).all(axis=1)
+        if invalid.any():
+            self.fail(chunk[invalid])
+
+
+class PopulationCheck(Check):
+    """
+    Population in each row have to be greater than summed causes of death
+    """
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        invalid = ~((chunk["population"] - chunk.iloc[:, 4:].sum(axis=1)) > 0)
+        if invalid.any():
+            self.fail(chunk[invalid])
+
+
+class YearContinuityCheck(Check):
+    """
+    Each country has only one row for specific year and the range of years is continuous.
+    Keeps bitmap of seen years for each country between chunks, so memory depends on number of countries
+    and years, not on size of dataset.
+    """
+
+    max_years = 10
+
+    def __init__(self, message: str = "") -> None:
+        super().__init__(message)
+        # country -> (first year, seen years from first year)
+        self.years = {}
+
+    def add_years(self, country, first: int, seen: np.ndarray) -> np.ndarray:
+        """
+        Mark years of country as seen
+        :param country: name of country
+        :param first: year of the first element of seen
+        :param seen: bitmap of years from first
+        :return: bitmap of years from first which were already seen
+        """
+        if country not in self.years:
+            self.years[country] = (first, seen)
+            return np.zeros_like(seen)
+        known_first, known = self.years[country]
+        start = min(first, known_first)
+        stop = max(first + len(seen), known_first + len(known))
+        if start < known_first or stop > known_first + len(known):
+            grown = np.zeros(stop - start, dtype=bool)
+            grown[known_first - start : known_first - start + len(known)] = known
+            known_first, known = start, grown
+            self.years[country] = (known_first, known)
+        part = known[first - known_first : first - known_first + len(seen)]
+        repeated = part & seen
+        part |= seen
+        return repeated
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        for country, years in chunk.groupby("country", sort=False, observed=True)[
+            "year"
+        ]:
+            values = years.to_numpy(dtype=np.int64)
+            first = values.min()
+            seen = np.zeros(values.max() - first + 1, dtype=bool)
+            seen[values - first] = True
+            repeated = self.add_years(country, first, seen)[values - first]
+            repeated |= years.duplicated().to_numpy()
+            if repeated.any():
+                self.fail(chunk.loc[years.index[repeated]])
+
+    def merge(self, other: "YearContinuityCheck") -> None:
+        super().merge(other)
+        for country, (first, seen) in other.years.items():
+            repeated = self.add_years(country, first, seen)
+            if repeated.any():
+                years = first + np.flatnonzero(repeated)[: self.max_years]
+                self.fail(country=country, repeated_years=years.tolist())
+
+    def finish(self) -> None:
+        for country, (first, seen) in self.years.items():
+            if not seen.all():
+                years = first + np.flatnonzero(~seen)[: self.max_years]
+                self.fail(country=country, missing_years=years.tolist())
+
+
+class NanCheck(Check):
+    """
+    Dataset must not have NaN values
+    """
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        invalid = chunk.isna().any(axis=1)
+        if invalid.any():
+            self.fail(chunk[invalid])
+
+
+class DuplicationCheck(Check):
+    """
+    Dataset must not have duplicated rows.
+    Keeps sorted 64-bit hashes of rows between chunks, so duplicates are found anywhere in dataset.
+    Part of dataset which isn't the first one also keeps hashes of its rows with number of row where each
+    was seen first, so rows repeated from previous parts are reported with their lines as in one pass.
+    """
+
+    def __init__(self, message: str = "") -> None:
+        super().__init__(message)
+        self.hashes = RowHashSet()
+        self.keep_rows = False
+        # (hashes, numbers of rows) of rows seen for the first time, in order of dataset
+        self.first_rows = []
+
+    def start_part(self, first: bool) -> None:
+        self.keep_rows = not first
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        hashes = hash_rows(chunk)
+        new = self.hashes.first_seen_hashes(hashes)
+        if self.keep_rows:
+            self.first_rows.append((hashes[new], chunk.index.to_numpy()[new]))
+        if not new.all():
+            self.fail(chunk[~new])
+
+    def shift_lines(self, rows: int) -> None:
+        super().shift_lines(rows)
+        self.first_rows = [
+            (hashes, numbers + rows) for hashes, numbers in self.first_rows
+        ]
+
+    def merge(self, other: "DuplicationCheck") -> None:
+        if other.first_rows:
+            hashes = np.concatenate([hashes for hashes, _ in other.first_rows])
+            numbers = np.concatenate([numbers for _, numbers in other.first_rows])
+            repeated = numbers[self.hashes.contains(hashes)][: self.max_samples]
+            if len(repeated):
+                # values of rows are read by engine, rows of part aren't kept
+                other.is_valid = False
+                other.samples = sorted(
+                    other.samples + [{"line": int(number) + 2} for number in repeated],
+                    key=lambda sample: sample.get("line", 0),
+                )
+        super().merge(other)
+        known = self.hashes.contains(other.hashes.hashes)
+        if known.any() and not other.first_rows:
+            self.fail(rows_repeated_in_other_part=int(known.sum()))
+        self.hashes.add(other.hashes.hashes[~known])
+
+
+class ColumnValues(Check):
+    """
+    Collects distinct values of column, never fails
+    """
+
+    def __init__(self, column: str) -> None:
+        super().__init__()
+        self.column = column
+        self.values = set()
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        self.values.update(chunk[self.column].unique())
+
+    def merge(self, other: "ColumnValues") -> None:
+        super().merge(other)
+        self.values.update(other.values)
+
+
+class CommonValuesCheck(Check):
+    """
+    Columns of two datasets must have at least one common value, compares values collected by ColumnValues
+    """
+
+    def __init__(
+        self, first: ColumnValues, second: ColumnValues, message: str = ""
+    ) -> None:
+        super().__init__(message)
+        self.first = first
+        self.second = second
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        pass
+
+    def finish(self) -> None:
+        if len(self.first.values & self.second.values) == 0:
+            self.fail()
+
+
+class ValidationReport:
+    """
+    Results of checks of datasets in order of checking, with time, scanned rows and examples of errors
+    """
+
+    def __init__(self) -> None:
+        # results of checks with name of dataset
+        self.checks = []
+        # name of dataset -> sha256 of content and if results were taken from cache
+        self.datasets = {}
+
+    def add(
+        self,
+        dataset: str,
+        results: list[dict],
+        digest: Optional[str] = None,
+        cached: bool = False,
+    ) -> None:
+        """
+        :param dataset: name of checked dataset
+        :param results: results of finished checks, see Check.to_dict
+        :param digest: sha256 of content of dataset
+        :param cached: True if results were taken from cache
+        """
+        self.checks.extend({"dataset": dataset, **result} for result in results)
+        if digest is not None:
+            self.datasets[dataset] = {"sha256": digest, "cached": cached}
+
+    @property
+    def is_valid(self) -> bool:
+        return all(result["passed"] for result in self.checks)
+
+    @property
+    def first_failed(self) -> Optional[dict]:
+        return next((result for result in self.checks if not result["passed"]), None)
+
+    def to_dict(self) -> dict:
+        """
+        :return: machine-readable report
+        """
+        return {
+            "valid": self.is_valid,
+            "datasets": self.datasets,
+            "checks": self.checks,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2, default=str)
+
+
+class ValidationEngine:
+    """
+    Reads dataset once in big chunks and gives each chunk to every check.
+    Checks are ordered, in fail fast mode the first check which fails is the verdict, so after a check fails
+    the following checks are skipped and only previous checks still read next chunks. In full mode
+    all checks read all chunks. Big dataset is split into byte ranges of fixed size aligned to lines, which
+    are checked in separate processes and merged in order of checks.
+    Content of dataset is hashed while it's read, sha256 of each range is combined into one digest.
+    """
+
+    def __init__(
+        self,
+        path_to_dataset: str,
+        checks: list[Check],
+        chunksize: int = 100_000,
+        processes: int = 1,
+        partition_size: int = 64 << 20,
+        fail_fast: bool = True,
+    ) -> None:
+        """
+        :param path_to_dataset: path to csv file
+        :param checks: ordered checks
+        :param chunksize: number of rows parsed at once
+        :param processes: maximal number of parts checked at the same time
+        :param partition_size: number of bytes in one part, the end of part is moved to the end of line
+        :param fail_fast: if True checking stops at the first check which fails
+        """
+        self.path_to_dataset = path_to_dataset
+        self.checks = checks
+        self.chunksize = chunksize
+        self.processes = processes
+        self.partition_size = partition_size
+        self.fail_fast = fail_fast
+        self.digest = None
+
+    @cached_property
+    def partitions(self) -> tuple[bytes, list[tuple[int, int]]]:
+        """
+        Split rows of dataset into byte ranges, each range starts at the beginning of line.
+        Ranges depend only on content of dataset and partition size, so digest of dataset doesn't depend
+        on number of processes.
+        :return: header line and list of (start, stop) of ranges
+        """
+        size = os.path.getsize(self.path_to_dataset)
+        with open(self.path_to_dataset, "rb") as file:
+            header = file.readline()
+            bounds = [file.tell()]
+            while bounds[-1] + self.partition_size < size:
+                file.seek(bounds[-1] + self.partition_size - 1)
+                file.readline()
+                if file.tell() >= size:
+                    break
+                bounds.append(file.tell())
+        bounds.append(max(size, bounds[-1]))
+        return header, list(zip(bounds[:-1], bounds[1:]))
+
+    def submit(self, pool: Optional[Executor] = None) -> list[Future]:
+        """
+        Start checking each part of dataset
+        :param pool: executor which checks parts, if None parts are checked now in this process
+        :return: futures with results of parts
+        """
+        header, ranges = self.partitions
+        futures = []
+        for number, (start, stop) in enumerate(ranges):
+            checks = copy.deepcopy(self.checks)
+            for check in checks:
+                check.start_part(number == 0)
+            arguments = (
+                self.path_to_dataset,
+                header,
+                start,
+                stop,
+                checks,
+                self.chunksize,
+                self.fail_fast,
+            )
+            if pool is None:
+                future = Future()
+                future.set_result(check_partition(*arguments))
+            else:
+                future = pool.submit(check_partition, *arguments)
+            futures.append(future)
+        return futures
+
+    def collect(self, futures: list[Future]) -> list[Check]:
+        """
+        Merge results of parts in order of checks and finish checks
+        :param futures: futures returned by submit
+        :return: checks which were finished, in fail fast mode the last one is the first check which failed
+        """
+        first_failed = len(self.checks)
+        rows = 0
+        digest = hashlib.sha256(self.partitions[0])
+        for future in futures:
+            checks, part_failed, part_rows, part_digest = future.result()
+            digest.update(part_digest)
+            for check, part_check in zip(self.checks, checks):
+                part_check.shift_lines(rows)
+                check.merge(part_check)
+            rows += part_rows
+            first_failed = min(first_failed, part_failed)
+        self.digest = digest.hexdigest()
+        self.read_sample_values()
+        finished = []
+        for check in self.checks[: first_failed + 1]:
+            start = time.perf_counter()
+            check.finish()
+            check.seconds += time.perf_counter() - start
+            finished.append(check)
+            if self.fail_fast and not check.is_valid:
+                break
+        return finished
+
+    def read_sample_values(self) -> None:
+        """
+        Read values of examples which have only number of line, e.g. rows repeated from previous part
+        """
+        samples = [
+            sample
+            for check in self.checks
+            for sample in check.samples
+            if "line" in sample and "values" not in sample
+        ]
+        if not samples:
+            return
+        # the first line of file has number 1 in examples and 0 in skiprows
+        lines = {sample["line"] - 1 for sample in samples}
+        rows = pd.read_csv(
+            self.path_to_dataset,
+            skiprows=lambda line: line > 0 and line not in lines,
+            nrows=len(lines),
+            dtype=Schema.category_dtypes(),
+        )
+        values = dict(zip(sorted(lines), Check.row_values(rows)))
+        for sample in samples:
+            sample["values"] = values[sample["line"] - 1]
+
+    def hash_content(self) -> str:
+        """
+        Hash dataset without checking it, digest is the same as digest computed while it's checked
+        :return: hex digest
+        """
+        header, ranges = self.partitions
+        digest = hashlib.sha256(header)
+        for start, stop in ranges:
+            with FileRange(self.path_to_dataset, b"", start, stop) as part:
+                digest.update(part.hash_rest())
+        return digest.hexdigest()
+
+    def run(self) -> list[Check]:
+        """
+        Run all checks in one pass over dataset, parts of big dataset are checked in parallel
+        :return: checks which were finished, in fail fast mode the last one is the first check which failed
+        """
+        if len(self.partitions[1]) == 1 or self.processes == 1:
+            return self.collect(self.submit())
+        with ProcessPoolExecutor(self.processes) as pool:
+            return self.collect(self.submit(pool))
+
+
+class FileRange(io.RawIOBase):
+    """
+    Binary file object which reads header line and then only bytes from start to stop of file,
+    bytes from start to stop are hashed while they are read
+    """
+
+    def __init__(self, path_to_file: str, header: bytes, start: int, stop: int):
+        super().__init__()
+        self.file = open(path_to_file, "rb")
+        self.file.seek(start)
+        self.header = header
+        self.remaining = stop - start
+        self.digest = hashlib.sha256()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self.header:
+            size = min(len(buffer), len(self.header))
+            buffer[:size] = self.header[:size]
+            self.header = self.header[size:]
+            return size
+        size = self.file.readinto(
+            memoryview(buffer)[: min(len(buffer), self.remaining)]
+        )
+        self.digest.update(memoryview(buffer)[:size])
+        self.remaining -= size
+        return size
+
+    def hash_rest(self) -> bytes:
+        """
+        Hash bytes which weren't read
+        :return: sha256 of bytes from start to stop
+        """
+        while self.remaining > 0:
+            block = self.file.read(min(self.remaining, 1 << 20))
+            if not block:
+                break
+            self.digest.update(block)
+            self.remaining -= len(block)
+        return self.digest.digest()
+
+    def close(self) -> None:
+        self.file.close()
+        super().close()
+
+
+def check_partition(
+    path_to_dataset: str,
+    header: bytes,
+    start: int,
+    stop: int,
+    checks: list[Check],
+    chunksize: int,
+    fail_fast: bool = True,
+) -> tuple[list[Check], int, int, bytes]:
+    """
+    Give each chunk of one part of dataset to ordered checks.
+    Check which can't read chunk, e.g. because of wrong type of column, fails and stops.
+    :param path_to_dataset: path to csv file
+    :param header: first line of csv file
+    :param start: first byte of part, at the beginning of line
+    :param stop: byte after the end of part, at the beginning of line
+    :param checks: ordered checks
+    :param chunksize: number of rows parsed at once
+    :param fail_fast: if True after a check fails the following checks are skipped
+    :return: checks with state after the part, position of the first failed check, number of read rows
+    and sha256 of part
+    """
+    first_failed = len(checks)
+    rows = 0
+    part = FileRange(path_to_dataset, header, start, stop)
+    with io.BufferedReader(part) as file:
+        # only text columns have types of schema, wrong values of other columns are found by checks
+        dtypes = Schema.category_dtypes()
+        for chunk in pd.read_csv(file, chunksize=chunksize, dtype=dtypes):
+            rows += chunk.shape[0]
+            for number, check in enumerate(checks[:first_failed]):
+                if check.stopped:
+                    continue
+                start_time = time.perf_counter()
+                try:
+                    check.update(chunk)
+                except (KeyError, TypeError, ValueError) as error:
+                    check.fail(error=f"{type(error).__name__}: {error}")
+                    check.stopped = True
+                check.seconds += time.perf_counter() - start_time
+                check.rows_scanned += chunk.shape[0]
+                if fail_fast and not check.is_valid:
+                    first_failed = number
+                    break
+            if first_failed == 0:
+                break
+        digest = part.hash_rest()
+    return checks, first_failed, rows, digest
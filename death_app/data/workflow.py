@@ -0,0 +1,217 @@
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable
+
+from config import settings
+from death_app.data.data_validator import DataValidator
+from death_app.data.download_data import (
+    download_death,
+    download_index,
+    download_population,
+)
+from death_app.data.new_data_pipeline import (
+    check_new_data,
+    publish_new_data,
+    publish_preprocessed_data,
+)
+from death_app.data.preprocess import make_pipeline
+
+
+class Stage:
+    """
+    One step of workflow, it starts when all stages it depends on are finished
+    """
+
+    def __init__(
+        self, name: str, function: Callable[[], None], depends_on: list[str] = None
+    ) -> None:
+        """
+        :param name: unique name of stage
+        :param function: function without arguments which makes the step
+        :param depends_on: names of stages which have to finish first
+        """
+        self.name = name
+        self.function = function
+        self.depends_on = depends_on or []
+        self.seconds = None
+
+    def run(self) -> None:
+        """
+        Run function of stage and measure its time
+        """
+        start = time.perf_counter()
+        try:
+            self.function()
+        finally:
+            self.seconds = time.perf_counter() - start
+
+
+class Workflow:
+    """
+    Dependency graph of stages. Stages whose dependencies are finished run at the same time in a thread pool,
+    they mostly wait for network, disk or C code of pandas. Progress and time of each stage are reported.
+    When a stage fails, stages which depend on it aren't started and the error is raised
+    after running stages finish.
+    """
+
+    def __init__(
+        self,
+        stages: list[Stage],
+        max_workers: int = 4,
+        report: Callable[[str], None] = print,
+    ) -> None:
+        """
+        :param stages: stages of workflow
+        :param max_workers: maximal number of stages running at the same time
+        :param report: function which shows progress, e.g. print
+        """
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Stage {stage.name} is defined twice")
+            self.stages[stage.name] = stage
+        self.max_workers = max_workers
+        self.report = report
+        self.order = self.sort_stages()
+
+    def sort_stages(self) -> list[str]:
+        """
+        Sort stages topologically
+        :return: names of stages, each stage is after stages it depends on
+        """
+        for stage in self.stages.values():
+            for name in stage.depends_on:
+                if name not in self.stages:
+                    raise ValueError(f"Stage {stage.name} depends on unknown {name}")
+        order, done = [], set()
+        while len(order) < len(self.stages):
+            ready = [
+                name
+                for name, stage in self.stages.items()
+                if name not in done and all(dep in done for dep in stage.depends_on)
+            ]
+            if not ready:
+                cycle = sorted(set(self.stages) - done)
+                raise ValueError(f"Stages {', '.join(cycle)} depend on each other")
+            order += ready
+            done.update(ready)
+        return order
+
+    def run(self) -> dict[str, float]:
+        """
+        Run all stages
+        :return: time of each stage in seconds
+        """
+        pending = list(self.order)
+        finished, running = set(), {}
+        error = None
+        start = time.perf_counter()
+        with ThreadPoolExecutor(self.max_workers) as pool:
+            while True:
+                if error is None:
+                    for name in list(pending):
+                        if all(dep in finished for dep in self.stages[name].depends_on):
+                            pending.remove(name)
+                            self.report(f"Started {name}")
+                            running[pool.submit(self.stages[name].run)] = name
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    seconds = self.stages[name].seconds
+                    if future.exception() is not None:
+                        error = error or future.exception()
+                        self.report(f"Failed {name} after {seconds:.2f} s")
+                        continue
+                    finished.add(name)
+                    self.report(
+                        f"[{len(finished)}/{len(self.stages)}] Finished {name} in {seconds:.2f} s"
+                    )
+        if error is not None:
+            if pending:
+                self.report(f"Skipped {', '.join(pending)}")
+            raise error
+        self.report(f"Workflow finished in {time.perf_counter() - start:.2f} s")
+        return {name: self.stages[name].seconds for name in self.order}
+
+
+def validate_app_data() -> None:
+    """
+    Check preprocessed datasets like your own datasets
+    """
+    validator = DataValidator(
+        settings["paths"]["path_to_save_input"],
+        settings["paths"]["path_save_index"],
+        path_to_cache=settings["paths"]["path_validation_cache"],
+    )
+    if not validator.check_pipeline():
+        raise ValueError("Preprocessed datasets aren't correct")
+
+
+def validate_new_data() -> None:
+    """
+    Check your own datasets
+    """
+    if not check_new_data(
+        settings["paths"]["path_to_new_death"], settings["paths"]["path_to_new_index"]
+    ):
+        raise ValueError("New datasets aren't correct")
+
+
+def preprocessing_stages(new_death_datasets: bool) -> list[Stage]:
+    """
+    Download datasets which don't exist yet, preprocess them, check the result and make application use it.
+    Death, population and index datasets are downloaded and preprocessed independently.
+    :param new_death_datasets: if True your own death dataset is used and population is downloaded
+    from World Bank API for its years
+    :return: stages of workflow
+    """
+    pipeline = make_pipeline(population_from_api=new_death_datasets)
+    stages = [
+        Stage("download_population", lambda: download_population(new_death_datasets)),
+        Stage("download_index", download_index),
+        Stage(
+            "preprocess_population", pipeline.make_population, ["download_population"]
+        ),
+        Stage("preprocess_index", pipeline.make_index, ["download_index"]),
+    ]
+    if new_death_datasets:
+        stages.append(Stage("preprocess_death", pipeline.make_death))
+    else:
+        stages += [
+            Stage("download_death", download_death),
+            Stage("preprocess_death", pipeline.make_death, ["download_death"]),
+        ]
+    return stages + [
+        Stage(
+            "make_app_input",
+            pipeline.make_app_input,
+            ["preprocess_death", "preprocess_population", "preprocess_index"],
+        ),
+        Stage("save", pipeline.save_preprocessed_dataset, ["make_app_input"]),
+        Stage("validate", validate_app_data, ["save"]),
+        Stage("publish", publish_preprocessed_data, ["validate"]),
+    ]
+
+
+def check_stages() -> list[Stage]:
+    """
+    Check your own datasets and make application use them
+    :return: stages of workflow
+    """
+    return [
+        Stage("validate", validate_new_data),
+        Stage("publish", publish_new_data, ["validate"]),
+    ]
+
+
+if __name__ == "__main__":
+    workflows = {
+        "all": lambda: preprocessing_stages(False),
+        "missing": lambda: preprocessing_stages(True),
+        "check": check_stages,
+    }
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    Workflow(workflows[sys.argv[1]](), max_workers).run()
@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+from typing import Callable
+
+from death_app.data.fingerprint import atomic_open
+
+
+class Span:
+    """
+    Measures time of block of code and records it in metrics when block ends
+    """
+
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics: "Metrics", name: str) -> None:
+        self.metrics = metrics
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.metrics.record(self.name, time.perf_counter() - self.start)
+
+
+class NullSpan:
+    """
+    Span of disabled metrics, it does nothing
+    """
+
+    __slots__ = ()
+
+    def __enter__(self) -> "NullSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Metrics:
+    """
+    Timing spans and counters of one app process, shared by all sessions and threads.
+    Span keeps number of calls, total, maximal and last time of named stage, e.g. 'loader.get_summed_data'.
+    Counters count events, e.g. hits of cache; collectors return counters which are read only when
+    metrics are shown or written, e.g. statistics of LRU caches. When metrics are disabled,
+    span returns one shared object which does nothing and count returns at once.
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        """
+        :param enabled: if False nothing is recorded
+        """
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        # name -> [count, total seconds, max seconds, last seconds]
+        self.spans = {}
+        self.counters = {}
+        self.collectors = {}
+
+    def span(self, name: str):
+        """
+        Measure time of block of code, use it as context manager: with metrics.span('plotter.plot_summed'): ...
+        :param name: name of stage
+        :return: span or shared span which does nothing if metrics are disabled
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name)
+
+    def record(self, name: str, seconds: float) -> None:
+        """
+        Add time of one call of stage
+        :param name: name of stage
+        :param seconds: time of call
+        """
+        with self.lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                self.spans[name] = [1, seconds, seconds, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                stats[2] = max(stats[2], seconds)
+                stats[3] = seconds
+
+    def count(self, name: str, value: int = 1) -> None:
+        """
+        Increase counter
+        :param name: name of counter, e.g. 'dataset_cache.hit'
+        :param value: increase
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def collect(self, name: str, collector: Callable[[], dict[str, int]]) -> None:
+        """
+        Register function which returns counters when metrics are read, function with the same name is replaced
+        :param name: name of collector, prefix of its counters
+        :param collector: function which returns counter name -> value
+        """
+        with self.lock:
+            self.collectors[name] = collector
+
+    def snapshot(self) -> dict:
+        """
+        :return: dictionary with 'spans', name -> dictionary with 'count', 'total', 'max' and 'last' seconds,
+        and 'counters', name -> value
+        """
+        with self.lock:
+            spans = {
+                name: dict(zip(["count", "total", "max", "last"], stats))
+                for name, stats in self.spans.items()
+            }
+            counters = dict(self.counters)
+            collectors = dict(self.collectors)
+        for prefix, collector in collectors.items():
+            for name, value in collector().items():
+                counters[f"{prefix}.{name}"] = value
+        return {"spans": spans, "counters": counters}
+
+    def to_prometheus(self) -> str:
+        """
+        Metrics in text format of Prometheus, e.g. for textfile collector of node exporter
+        :return: text
+        """
+        snapshot = self.snapshot()
+        lines = [
+            "# HELP death_app_span_seconds Time of stages of the app.",
+            "# TYPE death_app_span_seconds summary",
+        ]
+        for name, stats in sorted(snapshot["spans"].items()):
+            lines.append(
+                f'death_app_span_seconds_count{{span="{name}"}} {stats["count"]}'
+            )
+            lines.append(
+                f'death_app_span_seconds_sum{{span="{name}"}} {stats["total"]}'
+            )
+        lines += [
+            "# HELP death_app_span_max_seconds Maximal time of stages of the app.",
+            "# TYPE death_app_span_max_seconds gauge",
+        ]
+        for name, stats in sorted(snapshot["spans"].items()):
+            lines.append(f'death_app_span_max_seconds{{span="{name}"}} {stats["max"]}')
+        lines += [
+            "# HELP death_app_events_total Events of the app, e.g. hits and misses of caches.",
+            "# TYPE death_app_events_total counter",
+        ]
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f'death_app_events_total{{name="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path_to_file: str) -> None:
+        """
+        Write metrics in text format of Prometheus atomically, scraper sees an old or a new file.
+        Sessions of app write it at the same time, each one to its own temporary file.
+        :param path_to_file: path to file, e.g. 'res/metrics/death_app.prom'
+        """
+        os.makedirs(os.path.dirname(path_to_file) or ".", exist_ok=True)
+        with atomic_open(path_to_file) as file:
+            file.write(self.to_prometheus())
+
+    def reset(self) -> None:
+        """
+        Remove recorded spans and counters
+        """
+        with self.lock:
+            self.spans.clear()
+            self.counters.clear()
+
+
+# metrics of app process, enabled by user interface when it's set in settings
+metrics = Metrics()
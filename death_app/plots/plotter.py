@@ -1,5 +1,6 @@
 import pandas as pd
 from death_app.data.processor import DataProcessor
+from death_app.metrics import metrics
 from config import settings
 import os
 from plotly.graph_objects import Figure
@@ -23,7 +24,8 @@ class Plotter:
         :return: plots
         """
         # get processed data
-        result = self.data_processor.get_top_causes_summed_by_range_of_year(df, top)
+        with metrics.span("processor.get_top_causes_summed_by_range_of_year"):
+            result = self.data_processor.get_top_causes_summed_by_range_of_year(df, top)
         # if is only one country plot will be grouped else stacked
         # interactive plot bar horizontal
 
@@ -78,6 +80,15 @@ class Plotter:
             os.makedirs(settings["paths"]["path_to_plots"])
         fig.write_image(settings["paths"]["path_to_plots"] + f"/{file_name}")
 
+    @staticmethod
+    def fig_to_png(fig: Figure) -> bytes:
+        """
+        Render fig to PNG in memory, without writing a file
+        :param fig: plots
+        :return: content of PNG file
+        """
+        return fig.to_image(format="png")
+
     @staticmethod
     def remove_fig(file_name: str) -> None:
         """
@@ -88,7 +99,12 @@ class Plotter:
             os.remove(settings["paths"]["path_to_plots"] + f"/{file_name}")
 
     def plot_in_each_year(
-        self, df: pd.DataFrame, top: int, years: tuple, list_of_countries: list[str]
+        self,
+        df: pd.DataFrame,
+        top: int,
+        years: tuple,
+        list_of_countries: list[str],
+        per_capita: bool = False,
     ) -> Figure:
         """
         Shows top N causes of death in a set of countries, in each year from a specified date range.'
@@ -96,10 +112,14 @@ class Plotter:
         :param top: number of causes
         :param years: data range
         :param list_of_countries: list with countries name
+        :param per_capita: if True death causes columns in df contain deaths per one inhabitant
         :return: plots
         """
         # get processed data
-        result = self.data_processor.get_top_causes_in_each_year(df, top)
+        with metrics.span("processor.get_top_causes_in_each_year"):
+            result = self.data_processor.get_top_causes_in_each_year(
+                df, top, per_capita
+            )
         countries = " ".join(
             [
                 name + " and" if idx < len(list_of_countries) - 1 else name
@@ -144,18 +164,20 @@ class Plotter:
         return fig
 
     def plot_trend_cause_in_each_year(
-        self, df: pd.DataFrame, cause: str, years: tuple
+        self, df: pd.DataFrame, cause: str, years: tuple, per_capita: bool = False
     ) -> Figure:
         """
 
         :param df:
         :param cause:
         :param years:
+        :param per_capita: if True death causes columns in df contain deaths per one inhabitant
         :return:
         """
-        result = self.data_processor.get_trend_cause_in_each_year_in_countries(
-            df, cause
-        )
+        with metrics.span("processor.get_trend_cause_in_each_year_in_countries"):
+            result = self.data_processor.get_trend_cause_in_each_year_in_countries(
+                df, cause, per_capita
+            )
         fig = px.line(
             result,
             x="year",
@@ -189,7 +211,10 @@ class Plotter:
         :return: plots
         """
         # get processed data
-        result = self.data_processor.get_top_causes_summed_by_level_of_develop(df, top)
+        with metrics.span("processor.get_top_causes_summed_by_level_of_develop"):
+            result = self.data_processor.get_top_causes_summed_by_level_of_develop(
+                df, top
+            )
         # if is only one level of development - plot will be grouped else stacked
         # interactive plot bar horizontal
         causes = "causes" if top > 1 else "cause"
@@ -244,9 +269,12 @@ class Plotter:
         :return: plots
         """
         # get processed data
-        result = self.data_processor.get_top_causes_in_each_year_by_level_of_develop(
-            df, top
-        )
+        with metrics.span("processor.get_top_causes_in_each_year_by_level_of_develop"):
+            result = (
+                self.data_processor.get_top_causes_in_each_year_by_level_of_develop(
+                    df, top
+                )
+            )
         causes = "causes" if top > 1 else "cause"
         fig = px.scatter(
             result,
@@ -294,9 +322,12 @@ class Plotter:
         :return: plots
         """
         # get processed data
-        result = self.data_processor.get_trend_cause_in_each_year_by_level_of_develop(
-            df, cause
-        )
+        with metrics.span("processor.get_trend_cause_in_each_year_by_level_of_develop"):
+            result = (
+                self.data_processor.get_trend_cause_in_each_year_by_level_of_develop(
+                    df, cause
+                )
+            )
         fig = px.line(
             result,
             x="year",
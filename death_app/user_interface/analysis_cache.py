@@ -0,0 +1,188 @@
+import os
+from functools import lru_cache
+
+from plotly.graph_objects import Figure
+
+from death_app.data.data_loader import DataLoader
+from death_app.metrics import metrics
+from death_app.plots.plotter import Plotter
+
+
+class AnalysisCache:
+    """
+    Data loader and plotter shared by all sessions of one app process.
+    Filtered data, figures and exported PNG files are memoized for each input (countries or levels, top N or cause, years)
+    in a bounded LRU cache, so a rerun with the same input doesn't compute the analysis again.
+    Filtering of data, making of figures and export to PNG are measured by spans of metrics.
+    """
+
+    memoized = (
+        "get_range_years_for_country",
+        "plot_summed",
+        "plot_in_each_year",
+        "plot_trend_cause_in_each_year",
+        "plot_summed_development",
+        "plot_development_in_each_year",
+        "plot_trend_cause_by_development_by_year",
+        "export_png",
+    )
+
+    def __init__(
+        self, data_loader: DataLoader, plotter: Plotter, max_entries: int = 128
+    ) -> None:
+        self.data_loader = data_loader
+        self.plotter = plotter
+        for name in self.memoized:
+            setattr(self, name, lru_cache(maxsize=max_entries)(getattr(self, name)))
+
+    def cache_counters(self) -> dict[str, int]:
+        """
+        Hits and misses of memoized methods
+        :return: counter name, e.g. 'plot_summed.hits' -> value
+        """
+        counters = {}
+        for name in self.memoized:
+            info = getattr(self, name).cache_info()
+            counters[f"{name}.hits"] = info.hits
+            counters[f"{name}.misses"] = info.misses
+        return counters
+
+    @staticmethod
+    def files_signature(paths: tuple) -> tuple:
+        """
+        Describe current version of files, signature changes when any file is replaced or modified
+        :param paths: paths to files
+        :return: tuple with path, size and modification time of each file
+        """
+        signature = []
+        for path in paths:
+            if path is not None and os.path.exists(path):
+                stat = os.stat(path)
+                signature.append((path, stat.st_size, stat.st_mtime_ns))
+            else:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def export_png(self, plot_name: str, *args) -> bytes:
+        """
+        Render memoized figure to PNG, each figure is rendered once
+        :param plot_name: name of method which makes the figure, e.g. 'plot_summed'
+        :param args: input of this method
+        :return: content of PNG file
+        """
+        fig = getattr(self, plot_name)(*args)
+        with metrics.span("plotter.fig_to_png"):
+            return self.plotter.fig_to_png(fig)
+
+    def get_range_years_for_country(self, countries: tuple) -> tuple:
+        """
+        Return tuple with minimal and maximal available year for countries
+        :param countries: tuple of countries name
+        :return: tuple (min_year, max_year)
+        """
+        with metrics.span("loader.get_range_years_for_country"):
+            return self.data_loader.get_range_years_for_country(list(countries))
+
+    def plot_summed(self, countries: tuple, top: int, years: tuple) -> Figure:
+        """
+        Top N causes of death in a set of countries, summed across specified date range
+        :param countries: tuple of countries name
+        :param top: number of causes
+        :param years: data range
+        :return: plots
+        """
+        with metrics.span("loader.get_summed_data_from_specific_countries"):
+            df = self.data_loader.get_summed_data_from_specific_countries(
+                countries=list(countries), year_start=years[0], year_end=years[1]
+            )
+        with metrics.span("plotter.plot_summed"):
+            return self.plotter.plot_summed(df, top, years)
+
+    def plot_in_each_year(self, countries: tuple, top: int, years: tuple) -> Figure:
+        """
+        Top N causes of death in a set of countries, in each year from a specified date range
+        :param countries: tuple of countries name
+        :param top: number of causes
+        :param years: data range
+        :return: plots
+        """
+        with metrics.span("loader.get_rates_from_specific_countries_and_year"):
+            df = self.data_loader.get_rates_from_specific_countries_and_year(
+                countries=list(countries), year_start=years[0], year_end=years[1]
+            )
+        with metrics.span("plotter.plot_in_each_year"):
+            return self.plotter.plot_in_each_year(
+                df, top, years, list(countries), per_capita=True
+            )
+
+    def plot_trend_cause_in_each_year(
+        self, countries: tuple, cause: str, years: tuple
+    ) -> Figure:
+        """
+        Trend in cause of death in set of countries, in each year, from a specified date range
+        :param countries: tuple of countries name
+        :param cause: one cause of death
+        :param years: data range
+        :return: plots
+        """
+        with metrics.span("loader.get_rates_from_specific_countries_and_year"):
+            df = self.data_loader.get_rates_from_specific_countries_and_year(
+                countries=list(countries), year_start=years[0], year_end=years[1]
+            )
+        with metrics.span("plotter.plot_trend_cause_in_each_year"):
+            return self.plotter.plot_trend_cause_in_each_year(
+                df, cause, years, per_capita=True
+            )
+
+    def plot_summed_development(
+        self, development: tuple, top: int, years: tuple
+    ) -> Figure:
+        """
+        Top N causes of death by the level of development, summed across specified date range
+        :param development: tuple of levels of development
+        :param top: number of causes
+        :param years: data range
+        :return: plots
+        """
+        with metrics.span("loader.get_summed_data_by_level_of_development"):
+            df = self.data_loader.get_summed_data_by_level_of_development(
+                development=list(development), year_start=years[0], year_end=years[1]
+            )
+        with metrics.span("plotter.plot_summed_development"):
+            return self.plotter.plot_summed_development(df, top, years)
+
+    def plot_development_in_each_year(
+        self, development: tuple, top: int, years: tuple
+    ) -> Figure:
+        """
+        Top N causes of death by the level of development, in each year from a specified date range
+        :param development: tuple of levels of development
+        :param top: number of causes
+        :param years: data range
+        :return: plots
+        """
+        with metrics.span("loader.get_data_by_level_of_development_and_year"):
+            df = self.data_loader.get_data_by_level_of_development_and_year(
+                development=list(development), year_start=years[0], year_end=years[1]
+            )
+        with metrics.span("plotter.plot_development_in_each_year"):
+            return self.plotter.plot_development_in_each_year(df, top, years)
+
+    def plot_trend_cause_by_development_by_year(
+        self, development: tuple, cause: str, years: tuple
+    ) -> Figure:
+        """
+        Trend in cause of death by level of development from a specified date range
+        :param development: tuple of levels of development
+        :param cause: one cause of death
+        :param years: data range
+        :return: plots
+        """
+        with metrics.span("loader.get_data_by_level_of_development_and_year"):
+            df = self.data_loader.get_data_by_level_of_development_and_year(
+                development=list(development), year_start=years[0], year_end=years[1]
+            )
+        with metrics.span("plotter.plot_trend_cause_by_development_by_year"):
+            return self.plotter.plot_trend_cause_by_development_by_year(
+                df, cause, years
+            )
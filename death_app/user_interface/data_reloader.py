@@ -0,0 +1,104 @@
+import threading
+import time
+import traceback
+from typing import Callable, Hashable, Optional
+
+from death_app.data.snapshot import SnapshotStore
+from death_app.metrics import metrics
+from death_app.user_interface.analysis_cache import AnalysisCache
+
+
+class DataReloader:
+    """
+    Analysis cache of current version of datasets, shared by all sessions of one app process.
+    New published version is loaded on a background thread and swapped in when it's ready,
+    meanwhile sessions use the old version. Session which already got the old analysis cache
+    finishes its run with it. Before the first version is published, default files are reloaded when they change.
+    """
+
+    def __init__(
+        self,
+        snapshots: SnapshotStore,
+        load: Callable[[dict[str, Optional[str]]], AnalysisCache],
+        poll_seconds: float = 2.0,
+    ) -> None:
+        """
+        :param snapshots: versions of datasets
+        :param load: function which reads files of version, name of file -> path, and makes analysis cache
+        :param poll_seconds: minimal time between checks of current version
+        """
+        self.snapshots = snapshots
+        self.load = load
+        self.poll_seconds = poll_seconds
+        self.lock = threading.Lock()
+        self.version = None
+        self.analysis_cache = None
+        self.loading = None
+        self.failed = None
+        self.checked = 0.0
+
+    def get(self) -> AnalysisCache:
+        """
+        Return analysis cache of loaded version, loading of newer version is started if it's published.
+        Only the first call waits for data.
+        :return: data loader and plotter with memoized analyses
+        """
+        with self.lock:
+            if self.analysis_cache is None:
+                self.version = self.current_version()
+                self.analysis_cache = self.load(self.paths(self.version))
+                self.checked = time.monotonic()
+            elif time.monotonic() - self.checked >= self.poll_seconds:
+                self.checked = time.monotonic()
+                self.start_loading(self.current_version())
+            return self.analysis_cache
+
+    def current_version(self) -> Hashable:
+        """
+        :return: name of current version or signature of default files if nothing was published
+        """
+        version = self.snapshots.current()
+        if version is not None:
+            return version
+        return AnalysisCache.files_signature(tuple(self.snapshots.defaults.values()))
+
+    def paths(self, version: Hashable) -> dict[str, Optional[str]]:
+        """
+        :param version: name of version or signature of default files
+        :return: name of file -> path
+        """
+        return self.snapshots.paths(version if isinstance(version, str) else None)
+
+    def start_loading(self, version: Hashable) -> None:
+        """
+        Load version on a background thread if it isn't loaded, loading or failed already
+        :param version: name of version
+        """
+        if version in (self.version, self.failed) or self.loading is not None:
+            return
+        self.loading = threading.Thread(
+            target=self.reload, args=(version,), name="reload-data", daemon=True
+        )
+        self.loading.start()
+
+    def reload(self, version: Hashable) -> None:
+        """
+        Load version and swap it in, old version is released when last session stops using it
+        :param version: name of version
+        """
+        try:
+            with metrics.span("reloader.load"):
+                analysis_cache = self.load(self.paths(version))
+        except Exception:
+            # app keeps working on old version
+            traceback.print_exc()
+            metrics.count("reloader.failures")
+            with self.lock:
+                self.failed = version
+                self.loading = None
+            return
+        with self.lock:
+            self.analysis_cache = analysis_cache
+            self.version = version
+            self.loading = None
+        metrics.count("reloader.reloads")
@@ -1,9 +1,60 @@
 import numpy as np
+import pandas as pd
 import streamlit as st
 from death_app.data.data_loader import DataLoader
 from config import settings
 from death_app.plots.plotter import Plotter
-from plotly.graph_objects import Figure
+from death_app.user_interface.analysis_cache import AnalysisCache
+from death_app.user_interface.data_reloader import DataReloader
+from death_app.data.new_data_pipeline import app_snapshots
+from death_app.metrics import metrics
+
+# one instance in process shared by all sessions and reruns,
+# st.cache_resource in new versions of streamlit
+cache_resource = getattr(st, "cache_resource", None) or st.experimental_singleton
+metrics.enabled = settings["metrics"]["enabled"]
+
+
+def load_analysis_cache(paths: dict) -> AnalysisCache:
+    """
+    Read data of one version of datasets
+    :param paths: name of file -> path to file of version
+    :return: data loader and plotter with memoized analyses
+    """
+    return AnalysisCache(
+        DataLoader(
+            path_to_dataset=paths["input"],
+            path_to_index=paths["index"],
+            path_to_development=paths["development"],
+            exact=settings["types"]["exact"],
+        ),
+        Plotter(),
+    )
+
+
+@cache_resource(show_spinner=False)
+def get_data_reloader() -> DataReloader:
+    """
+    Make one reloader for all sessions, it swaps in newly published versions of datasets
+    :return: data reloader
+    """
+    reloader = DataReloader(app_snapshots(), load_analysis_cache)
+    # hits and misses of memoized analyses of loaded version
+    metrics.collect(
+        "analysis_cache",
+        lambda: reloader.analysis_cache.cache_counters()
+        if reloader.analysis_cache is not None
+        else {},
+    )
+    return reloader
+
+
+def get_analysis_cache() -> AnalysisCache:
+    """
+    Return shared analysis cache for current version of datasets
+    :return: data loader and plotter with memoized analyses
+    """
+    return get_data_reloader().get()
 
 
 class UserInterface:
@@ -22,11 +73,9 @@ class UserInterface:
             "Shows top N causes of death, by the level of development, in each year, from a specified date range.",
             "Show trend in cause of death, by level of development from a specified date range.",
         ]
-        self.data_loader = DataLoader(
-            path_to_dataset=settings["paths"]["path_to_save_input"],
-            path_to_index=settings["paths"]["path_save_index"],
-        )
-        self.plotter = Plotter()
+        self.analysis_cache = get_analysis_cache()
+        self.data_loader = self.analysis_cache.data_loader
+        self.plotter = self.analysis_cache.plotter
 
     def app_window(self) -> None:
         """
@@ -45,18 +94,44 @@ class UserInterface:
             analysis = st.selectbox(
                 label="Select type of analysis", options=self.type_of_analysis
             )
-            if analysis == self.type_of_analysis[0]:
-                self.shows_top_summed_data_range()
-            elif analysis == self.type_of_analysis[1]:
-                self.shows_top_by_years()
-            elif analysis == self.type_of_analysis[2]:
-                self.shows_causes_in_countries_by_years()
-            elif analysis == self.type_of_analysis[3]:
-                self.show_top_development()
-            elif analysis == self.type_of_analysis[4]:
-                self.show_causes_by_development_by_year()
-            elif analysis == self.type_of_analysis[5]:
-                self.show_trend_cause_by_development_by_year()
+            views = [
+                self.shows_top_summed_data_range,
+                self.shows_top_by_years,
+                self.shows_causes_in_countries_by_years,
+                self.show_top_development,
+                self.show_causes_by_development_by_year,
+                self.show_trend_cause_by_development_by_year,
+            ]
+            view = views[self.type_of_analysis.index(analysis)]
+            with metrics.span(f"ui.{view.__name__}"):
+                view()
+            if metrics.enabled:
+                self.show_metrics()
+
+    @staticmethod
+    def show_metrics() -> None:
+        """
+        Write metrics of app process to file read by scraper and show them in debug panel if it's enabled.
+        Times of plotter include times of processor, times of loader are measured separately.
+        """
+        metrics.write(settings["paths"]["path_metrics"])
+        if not settings["metrics"]["debug_panel"]:
+            return
+        snapshot = metrics.snapshot()
+        with st.expander("Debug metrics"):
+            spans = pd.DataFrame.from_dict(snapshot["spans"], orient="index")
+            if len(spans):
+                spans[["total", "max", "last"]] *= 1000
+                st.dataframe(
+                    spans.rename(
+                        columns={
+                            "total": "total [ms]",
+                            "max": "max [ms]",
+                            "last": "last [ms]",
+                        }
+                    )
+                )
+            st.dataframe(pd.Series(snapshot["counters"], name="count", dtype=int))
 
     @staticmethod
     def prepare_file_name_countries(
@@ -113,8 +188,8 @@ class UserInterface:
             self.data_loader.get_number_of_death_causes(),
         )
         if (len(list_of_countries) > 0) and (len(list_of_countries) <= 60):
-            min_year, max_year = self.data_loader.get_range_years_for_country(
-                list_of_countries
+            min_year, max_year = self.analysis_cache.get_range_years_for_country(
+                tuple(list_of_countries)
             )
             years = st.select_slider(
                 "Range of years",
@@ -122,18 +197,14 @@ class UserInterface:
                 value=[min_year, max_year],
             )
 
-            df = self.data_loader.get_data_from_specific_countries_and_year(
-                countries=list_of_countries, year_start=years[0], year_end=years[1]
-            )
-            fig = self.plotter.plot_summed(df, top_n, years)
+            analysis = ("plot_summed", tuple(list_of_countries), top_n, tuple(years))
+            fig = self.analysis_cache.plot_summed(*analysis[1:])
 
             file_name = self.prepare_file_name_countries(
                 list_of_countries, top_n, years
             )
 
-            self.download_button(
-                fig, settings["paths"]["path_to_plots"] + f"/{file_name}", file_name
-            )
+            self.download_button(file_name, *analysis)
             st.plotly_chart(fig, use_container_width=True)
 
     def shows_top_by_years(self) -> None:
@@ -154,26 +225,27 @@ class UserInterface:
             min(5, self.data_loader.get_number_of_death_causes()),
         )
         if (len(list_of_countries) > 0) and (len(list_of_countries) <= 3):
-            min_year, max_year = self.data_loader.get_range_years_for_country(
-                list_of_countries
+            min_year, max_year = self.analysis_cache.get_range_years_for_country(
+                tuple(list_of_countries)
             )
             years = st.select_slider(
                 "Range of years",
                 options=np.arange(min_year, max_year + 1),
                 value=[min_year, max_year],
             )
-            df = self.data_loader.get_data_from_specific_countries_and_year(
-                countries=list_of_countries, year_start=years[0], year_end=years[1]
+            analysis = (
+                "plot_in_each_year",
+                tuple(list_of_countries),
+                top_n,
+                tuple(years),
             )
-            fig = self.plotter.plot_in_each_year(df, top_n, years, list_of_countries)
+            fig = self.analysis_cache.plot_in_each_year(*analysis[1:])
 
             file_name = self.prepare_file_name_countries(
                 list_of_countries, top_n, years
             )
 
-            self.download_button(
-                fig, settings["paths"]["path_to_plots"] + f"/{file_name}", file_name
-            )
+            self.download_button(file_name, *analysis)
             st.plotly_chart(fig, use_container_width=True)
 
     def shows_causes_in_countries_by_years(self) -> None:
@@ -193,8 +265,8 @@ class UserInterface:
         )
 
         if (len(list_of_countries) > 0) and (len(list_of_countries) <= 25) and cause:
-            min_year, max_year = self.data_loader.get_range_years_for_country(
-                list_of_countries
+            min_year, max_year = self.analysis_cache.get_range_years_for_country(
+                tuple(list_of_countries)
             )
             years = st.select_slider(
                 "Range of years",
@@ -202,19 +274,19 @@ class UserInterface:
                 value=[min_year, max_year],
             )
 
-            df = self.data_loader.get_data_from_specific_countries_and_year(
-                countries=list_of_countries, year_start=years[0], year_end=years[1]
+            analysis = (
+                "plot_trend_cause_in_each_year",
+                tuple(list_of_countries),
+                cause,
+                tuple(years),
             )
-
-            fig = self.plotter.plot_trend_cause_in_each_year(df, cause, years)
+            fig = self.analysis_cache.plot_trend_cause_in_each_year(*analysis[1:])
 
             file_name = (
                 f"{'_'.join(cause.replace('/', ' ').split())}_death_rate_in_countries_from_{str(years[0])}_to_"
                 f"{str(years[1])}.png"
             )
-            self.download_button(
-                fig, settings["paths"]["path_to_plots"] + f"/{file_name}", file_name
-            )
+            self.download_button(file_name, *analysis)
             st.plotly_chart(fig, use_container_width=True)
 
     def show_top_development(self) -> None:
@@ -239,37 +311,44 @@ class UserInterface:
             )
             if len(list_of_level) > 0:
 
-                df = self.data_loader.get_data_by_level_of_development(
-                    development=list_of_level, year_start=years[0], year_end=years[1]
+                analysis = (
+                    "plot_summed_development",
+                    tuple(list_of_level),
+                    top_n,
+                    tuple(years),
                 )
-
-                fig = self.plotter.plot_summed_development(df, top_n, years)
+                fig = self.analysis_cache.plot_summed_development(*analysis[1:])
 
                 file_name = (
                     f"top_{str(top_n)}_death_causes_from_{str(years[0])}_to_{str(years[1])}_in_"
                     f"{'_'.join(list_of_level)}_level_of_development.png"
                 )
 
-                self.download_button(
-                    fig, settings["paths"]["path_to_plots"] + f"/{file_name}", file_name
-                )
+                self.download_button(file_name, *analysis)
                 st.plotly_chart(fig, use_container_width=True)
 
-    def download_button(self, fig: Figure, path_to_fig: str, name_file: str) -> None:
+    def download_button(self, name_file: str, plot_name: str, *args) -> None:
         """
-        User can download analysis
-        :param fig: plot to save and after download remove
-        :param path_to_fig: path to saved file in folder
+        User can download analysis, PNG file is rendered in memory only after user asks for it
         :param name_file: name file which will be downloaded
+        :param plot_name: name of method of analysis cache which makes the plot
+        :param args: input of this method
         """
-        self.plotter.save_fig(fig, name_file)
-        with open(path_to_fig, "rb") as file:
-            st.download_button(
-                label="Download analysis",
-                data=file,
-                file_name=name_file,
-            )
-        self.plotter.remove_fig(name_file)
+        # name of file doesn't describe whole input, e.g. it has only number of levels of development
+        analysis = (plot_name, *args)
+        if st.session_state.get("prepared_download") != analysis:
+            if not st.button("Prepare analysis to download", key=f"prepare_{analysis}"):
+                return
+            # only the last prepared analysis is kept, it's forgotten when its file is downloaded
+            st.session_state["prepared_download"] = analysis
+        st.download_button(
+            label="Download analysis",
+            data=self.analysis_cache.export_png(plot_name, *args),
+            file_name=name_file,
+            mime="image/png",
+            on_click=st.session_state.pop,
+            args=("prepared_download", None),
+        )
 
     def show_causes_by_development_by_year(self):
         """
@@ -293,19 +372,19 @@ class UserInterface:
                 value=[min_year, max_year],
             )
 
-            df = self.data_loader.get_data_by_level_of_development(
-                development=list_of_level, year_start=years[0], year_end=years[1]
+            analysis = (
+                "plot_development_in_each_year",
+                tuple(list_of_level),
+                top_n,
+                tuple(years),
             )
-
-            fig = self.plotter.plot_development_in_each_year(df, top_n, years)
+            fig = self.analysis_cache.plot_development_in_each_year(*analysis[1:])
 
             file_name = (
                 f"Top_ {str(top_n)}_death_causes_from_{str(years[0])}_to_{str(years[1])}_in_"
                 f"{str(len(list_of_level))}_level_of_development.png"
             )
-            self.download_button(
-                fig, settings["paths"]["path_to_plots"] + f"/{file_name}", file_name
-            )
+            self.download_button(file_name, *analysis)
             st.plotly_chart(fig, use_container_width=True)
 
     def show_trend_cause_by_development_by_year(self):
@@ -324,14 +403,16 @@ class UserInterface:
                 value=[min_year, max_year],
             )
 
-            df = self.data_loader.get_data_by_level_of_development(
-                development=list_of_level, year_start=years[0], year_end=years[1]
+            analysis = (
+                "plot_trend_cause_by_development_by_year",
+                tuple(list_of_level),
+                cause,
+                tuple(years),
+            )
+            fig = self.analysis_cache.plot_trend_cause_by_development_by_year(
+                *analysis[1:]
             )
-
-            fig = self.plotter.plot_trend_cause_by_development_by_year(df, cause, years)
 
             file_name = self.prepare_file_name_development(cause, years, list_of_level)
-            self.download_button(
-                fig, settings["paths"]["path_to_plots"] + f"/{file_name}", file_name
-            )
+            self.download_button(file_name, *analysis)
             st.plotly_chart(fig, use_container_width=True)
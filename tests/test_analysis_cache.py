@@ -0,0 +1,66 @@
+from death_app.user_interface.analysis_cache import AnalysisCache
+from death_app.data.data_loader import DataLoader
+from death_app.plots.plotter import Plotter
+from config import settings
+import os
+import pytest
+import shutil
+
+
+@pytest.fixture(scope="module")
+def analysis_cache(tmp_path_factory):
+    """
+    Analysis cache of copies of datasets, binary cache isn't written next to datasets of repository
+    """
+    folder = tmp_path_factory.mktemp("analysis_cache")
+    return AnalysisCache(
+        DataLoader(
+            path_to_dataset=shutil.copy(
+                settings["paths"]["path_to_save_input"], folder
+            ),
+            path_to_index=shutil.copy(settings["paths"]["path_save_index"], folder),
+        ),
+        Plotter(),
+        max_entries=2,
+    )
+
+
+def test_figure_is_memoized(analysis_cache):
+    """
+    Check if the same input returns the same figure without computing it again
+    """
+    fig = analysis_cache.plot_summed(("Afghanistan",), 2, (2002, 2003))
+    assert analysis_cache.plot_summed(("Afghanistan",), 2, (2002, 2003)) is fig
+    assert analysis_cache.plot_summed.cache_info().hits >= 1
+
+
+def test_cache_is_bounded(analysis_cache):
+    """
+    Check if cache keeps only max_entries figures
+    """
+    for top in range(1, 5):
+        analysis_cache.plot_summed(("Afghanistan",), top, (2002, 2003))
+    assert analysis_cache.plot_summed.cache_info().currsize == 2
+
+
+def test_files_signature_changes(tmp_path):
+    """
+    Check if signature changes when file is modified
+    """
+    path = shutil.copy(settings["paths"]["path_save_index"], tmp_path)
+    signature = AnalysisCache.files_signature((path,))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert AnalysisCache.files_signature((path,)) != signature
+
+
+def test_export_png_is_memoized(analysis_cache):
+    """
+    Check if figure is rendered to PNG in memory once for the same input
+    """
+    png = analysis_cache.export_png("plot_summed", ("Afghanistan",), 2, (2002, 2003))
+    assert png.startswith(b"\x89PNG")
+    assert (
+        analysis_cache.export_png("plot_summed", ("Afghanistan",), 2, (2002, 2003))
+        is png
+    )
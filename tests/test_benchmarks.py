@@ -0,0 +1,46 @@
+from benchmarks.run import find_regressions
+from benchmarks.synthetic import SyntheticDataset
+from death_app.data.data_validator import DataValidator
+import pandas as pd
+import shutil
+
+synthetic = SyntheticDataset(countries=30, years=5, causes=4)
+
+
+def test_synthetic_datasets_are_valid():
+    """
+    Check if generated datasets pass all checks and chunks of countries give the same dataset
+    """
+    path_to_folder = "res/test_synthetic"
+    try:
+        path_to_death, path_to_index = synthetic.write(
+            path_to_folder, countries_in_chunk=7
+        )
+        df = pd.read_csv(path_to_death)
+        assert df.shape == (30 * 5, 8)
+        assert df["code"].nunique() == 30
+        pd.testing.assert_frame_equal(
+            df,
+            pd.concat(
+                [synthetic.death_dataset(0, 7), synthetic.death_dataset(7)]
+            ).reset_index(drop=True),
+        )
+        assert DataValidator(path_to_death, path_to_index).validate().is_valid
+    finally:
+        shutil.rmtree(path_to_folder)
+
+
+def test_regression_is_found():
+    """
+    Check if only growth above tolerance and noise is reported
+    """
+    baseline = {
+        "fast": {"seconds": 0.001, "peak_mb": 1.0},
+        "slow": {"seconds": 1.0, "peak_mb": 100.0},
+    }
+    results = {
+        "fast": {"seconds": 0.004, "peak_mb": 1.5},
+        "slow": {"seconds": 1.6, "peak_mb": 140.0},
+    }
+    regressions = find_regressions(results, baseline, tolerance=0.5)
+    assert len(regressions) == 1 and regressions[0].startswith("slow: seconds")
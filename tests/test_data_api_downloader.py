@@ -1,12 +1,28 @@
 import pandas as pd
+import wbgapi as wb
 from death_app.data.data_api_downloader import DataAPIDownloader
 import os
+import shutil
 
-api_downloader = DataAPIDownloader(
-    year_start=2020,
-    year_end=2021,
+# population recorded from The World Bank Api, in format returned by WBGAPI
+recorded = pd.read_csv("tests/fixtures/world_bank_population.csv", index_col=0)
+
+
+class RecordedAPIDownloader(DataAPIDownloader):
+    """
+    Returns recorded responses instead of calling The World Bank Api
+    """
+
+    def fetch(self, years: list[int]) -> pd.DataFrame:
+        return recorded[[f"YR{year}" for year in years]]
+
+
+api_downloader = RecordedAPIDownloader(
+    year_start=2018,
+    year_end=2019,
     path_to_save="res/test/test_population.csv",
     path_to_folder="res/test",
+    path_to_cache="res/test_api_cache",
 )
 
 
@@ -46,8 +62,53 @@ def test_range_population_dataset():
     Check if DataAPIDownloader downloaded data with correct range of year
     """
     df = pd.read_csv("res/test/test_population.csv")
-    assert min(df["year"]) == 2020
-    assert max(df["year"]) == 2021
+    assert min(df["year"]) == 2018
+    assert max(df["year"]) == 2019
+
+
+def test_only_missing_years_are_downloaded():
+    """
+    Check if cached years aren't downloaded again, until they are older than ttl
+    """
+    path_to_cache = "res/test_api_cache_years"
+
+    def download(year_start, year_end, ttl_days=30):
+        return RecordedAPIDownloader(
+            year_start=year_start,
+            year_end=year_end,
+            path_to_save="res/test_api_years/population.csv",
+            path_to_folder="res/test_api_years",
+            path_to_cache=path_to_cache,
+            ttl_days=ttl_days,
+        )
+
+    try:
+        assert sorted(download(1995, 2003).fetched) == [
+            list(range(1995, 2000)),
+            [2000, 2001, 2002, 2003],
+        ]
+        downloader = download(1990, 2005)
+        assert sorted(downloader.fetched) == [
+            [1990, 1991, 1992, 1993, 1994],
+            [2004, 2005],
+        ]
+        df = pd.read_csv("res/test_api_years/population.csv")
+        assert sorted(df["year"].unique()) == list(range(1990, 2006))
+        assert (
+            df.set_index(["code", "year"]).loc[("ESP", 1990), "population"]
+            == recorded.loc["ESP", "YR1990"]
+        )
+        assert download(1990, 2005).fetched == []
+        assert len(download(1990, 2005, ttl_days=0).fetched) == 2
+
+        # block lost without its meta is downloaded whole
+        os.remove(downloader.path_to_block(range(2000, 2006)))
+        assert sorted(download(1990, 2005).fetched) == [list(range(2000, 2006))]
+        df = pd.read_csv("res/test_api_years/population.csv")
+        assert sorted(df["year"].unique()) == list(range(1990, 2006))
+    finally:
+        shutil.rmtree(path_to_cache)
+        shutil.rmtree("res/test_api_years")
 
 
 def test_remove():
@@ -56,4 +117,40 @@ def test_remove():
     """
     os.remove("res/test/test_population.csv")
     os.rmdir("res/test")
+    shutil.rmtree("res/test_api_cache")
     assert True
+
+
+def test_block_with_one_year_is_downloaded(monkeypatch):
+    """
+    Check if year of block with one year is kept, WBGAPI drops axis of time for one year by default
+    """
+
+    def fetch(series, economy="all", time="all", **kwargs):
+        for code, values in recorded.iterrows():
+            for year in time:
+                yield {
+                    "economy": {"id": code, "value": code},
+                    "series": {"id": series, "value": series},
+                    "time": {"id": f"YR{year}", "value": str(year)},
+                    "value": values[f"YR{year}"],
+                }
+
+    monkeypatch.setattr(wb.data, "fetch", fetch)
+    monkeypatch.setattr(
+        wb.source,
+        "concepts",
+        lambda db=None: {"economy": {}, "series": {}, "time": {}},
+    )
+    try:
+        DataAPIDownloader(
+            year_start=2019,
+            year_end=2019,
+            path_to_save="res/test_api_one_year/population.csv",
+            path_to_folder="res/test_api_one_year",
+        )
+        df = pd.read_csv("res/test_api_one_year/population.csv")
+        assert list(df["year"].unique()) == [2019]
+        assert len(df) == len(recorded)
+    finally:
+        shutil.rmtree("res/test_api_one_year", ignore_errors=True)
@@ -1,6 +1,7 @@
 from death_app.data.data_loader import DataLoader
 from config import settings
 import pandas as pd
+import numpy as np
 
 data_loader = DataLoader(
     path_to_dataset=settings["paths"]["path_to_save_input"],
@@ -45,3 +46,80 @@ def test_type_get_data_by_level_of_development():
 
 def test_type_get_death_causes():
     assert isinstance(data_loader.get_death_causes(), list)
+
+
+def test_type_get_rows_from_specific_countries_and_year():
+    assert isinstance(
+        data_loader.get_rows_from_specific_countries_and_year(
+            ["Afghanistan"], 2002, 2003
+        ),
+        np.ndarray,
+    )
+
+
+def test_memory_mapped_causes():
+    assert isinstance(data_loader.causes, np.memmap)
+
+
+def test_rows_from_specific_countries_and_year():
+    df = data_loader.get_data_from_specific_countries_and_year(
+        ["Afghanistan"], 2002, 2003
+    )
+    assert list(df["country"].unique()) == ["Afghanistan"]
+    assert df["year"].between(2002, 2003).all()
+
+
+def test_data_by_level_of_development():
+    df = data_loader.get_data_by_level_of_development(["low"], 2002, 2003)
+    assert list(df["development"].unique()) == ["low"]
+    assert df["year"].between(2002, 2003).all()
+
+
+def test_type_get_rates_from_specific_countries_and_year():
+    assert isinstance(
+        data_loader.get_rates_from_specific_countries_and_year(
+            ["Afghanistan"], 2002, 2003
+        ),
+        pd.DataFrame,
+    )
+
+
+def test_summed_data_from_specific_countries():
+    df = data_loader.get_data_from_specific_countries_and_year(
+        ["Afghanistan"], 2002, 2003
+    )
+    summed = data_loader.get_summed_data_from_specific_countries(
+        ["Afghanistan"], 2002, 2003
+    )
+    assert summed.shape[0] == 1
+    # prefix sums of float32 values are accumulated in float64
+    population = df["population"].to_numpy(dtype=np.float64).sum()
+    assert abs(summed["population"][0] - population) < 1e-6
+
+
+def test_summed_data_by_level_of_development():
+    df = data_loader.get_data_by_level_of_development(["low"], 2002, 2003)
+    summed = data_loader.get_summed_data_by_level_of_development(["low"], 2002, 2003)
+    assert list(summed["development"]) == ["low"]
+    # prefix sums of float32 values are accumulated in float64
+    population = df["population"].to_numpy(dtype=np.float64).sum()
+    assert abs(summed["population"][0] - population) < 1e-6
+
+
+def test_data_by_level_of_development_and_year():
+    df = data_loader.get_data_by_level_of_development_and_year(["low"], 2002, 2003)
+    assert list(df["development"].unique()) == ["low"]
+    assert df["year"].between(2002, 2003).all()
+
+
+def test_compact_types():
+    """
+    Check if dataset is loaded with types of schema
+    """
+    assert data_loader.keys["country"].dtype == "category"
+    assert data_loader.keys["year"].dtype == np.int16
+    assert data_loader.causes.dtype == np.float32
+    df = data_loader.get_data_from_specific_countries_and_year(
+        ["Afghanistan"], 2002, 2003
+    )
+    assert list(df["country"].cat.categories) == ["Afghanistan"]
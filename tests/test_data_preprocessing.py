@@ -2,6 +2,8 @@ from death_app.data.data_preprocessing_pipeline import (
     DataPreprocessingPipeline,
 )
 from config import settings
+import pandas as pd
+import shutil
 import os
 
 dp = DataPreprocessingPipeline(
@@ -13,6 +15,7 @@ dp = DataPreprocessingPipeline(
     population_from_api=False,
     path_save_index=settings["paths"]["path_save_index"],
     path_to_save_input=settings["paths"]["path_to_save_input"],
+    path_save_development=settings["paths"]["path_save_development"],
 )
 dp.preprocess_data()
 dp.save_preprocessed_dataset()
@@ -118,3 +121,225 @@ def test_if_datasets_saved():
     assert os.path.exists(settings["paths"]["path_save_index"])
     assert os.path.exists(settings["paths"]["path_save_population"])
     assert os.path.exists(settings["paths"]["path_save_death"])
+    assert os.path.exists(settings["paths"]["path_save_development"])
+
+
+def test_development_summed_by_year():
+    """
+    Check if table summed by level of development has one row for each year and level
+    """
+    assert not any(dp.df_development.duplicated(["year", "development"]))
+    assert list(dp.df_development.columns[:3]) == ["year", "development", "population"]
+
+
+def test_streaming_gives_same_datasets():
+    """
+    Check if preprocessing death dataset in chunks saves the same datasets as preprocessing it whole
+    """
+    paths = {
+        name: settings["paths"][name].replace(".csv", "_stream.csv")
+        for name in [
+            "path_save_death",
+            "path_save_population",
+            "path_save_index",
+            "path_to_save_input",
+            "path_save_development",
+        ]
+    }
+    dp_stream = DataPreprocessingPipeline(
+        path_death=settings["paths"]["path_death"],
+        path_population=settings["paths"]["path_population"],
+        path_index=settings["paths"]["path_index"],
+        population_from_api=False,
+        streaming=True,
+        chunk_size=50,
+        **paths,
+    )
+    dp_stream.preprocess_data()
+    dp_stream.save_preprocessed_dataset()
+    try:
+        for name in ["path_save_death", "path_to_save_input"]:
+            pd.testing.assert_frame_equal(
+                pd.read_csv(paths[name]), pd.read_csv(settings["paths"][name])
+            )
+        pd.testing.assert_frame_equal(
+            pd.read_csv(paths["path_save_development"]).sort_values(
+                ["year", "development"], ignore_index=True
+            ),
+            pd.read_csv(settings["paths"]["path_save_development"]).sort_values(
+                ["year", "development"], ignore_index=True
+            ),
+        )
+    finally:
+        for path in paths.values():
+            os.remove(path)
+        os.remove(paths["path_save_development"].replace(".csv", ".stamp.json"))
+
+
+def test_incremental_update_with_new_years():
+    """
+    Check if new years are preprocessed and merged into saved datasets, and if the result is the same
+    as preprocessing all years
+    """
+    path_to_folder = "res/test_incremental"
+    os.makedirs(path_to_folder, exist_ok=True)
+    raw = pd.read_csv(settings["paths"]["path_death"])
+    path_death = f"{path_to_folder}/death.csv"
+    paths = {
+        name: f"{path_to_folder}/{os.path.basename(settings['paths'][name])}"
+        for name in [
+            "path_save_death",
+            "path_save_population",
+            "path_save_index",
+            "path_to_save_input",
+            "path_save_development",
+        ]
+    }
+
+    def make():
+        pipeline = DataPreprocessingPipeline(
+            path_death=path_death,
+            path_population=settings["paths"]["path_population"],
+            path_index=settings["paths"]["path_index"],
+            population_from_api=False,
+            path_to_manifest=f"{path_to_folder}/manifest.json",
+            **paths,
+        )
+        pipeline.preprocess_data()
+        pipeline.save_preprocessed_dataset()
+        return pipeline
+
+    def read_sorted(path):
+        return pd.read_csv(path).sort_values(["code", "year"]).reset_index(drop=True)
+
+    try:
+        raw[raw["Year"] < raw["Year"].max()].to_csv(path_death, index=False)
+        assert not make().updated
+        raw.to_csv(path_death, index=False)
+        assert make().updated
+        for name in ["path_save_death", "path_to_save_input"]:
+            pd.testing.assert_frame_equal(
+                read_sorted(paths[name]), read_sorted(settings["paths"][name])
+            )
+        pd.testing.assert_frame_equal(
+            pd.read_csv(paths["path_save_development"]),
+            pd.read_csv(settings["paths"]["path_save_development"]),
+        )
+
+        # changed block is replaced
+        raw.iloc[0, 3] = 1000.0
+        raw.to_csv(path_death, index=False)
+        assert make().updated
+        updated = pd.read_csv(paths["path_to_save_input"])
+        row = updated[
+            (updated["code"] == raw.iloc[0, 1]) & (updated["year"] == raw.iloc[0, 2])
+        ]
+        assert len(row) == 1 and row.iloc[0, 4] == 1.0
+
+        # raw data sets which didn't change aren't read, touched file is hashed only
+        os.utime(path_death)
+        pipeline = make()
+        assert pipeline.df_death is None and "app_input" in pipeline.skipped
+        pd.testing.assert_frame_equal(pd.read_csv(paths["path_to_save_input"]), updated)
+
+        # deleted output is made again
+        index = pd.read_csv(paths["path_save_index"])
+        os.remove(paths["path_save_index"])
+        assert "index" not in make().skipped
+        pd.testing.assert_frame_equal(pd.read_csv(paths["path_save_index"]), index)
+        assert "app_input" in make().skipped
+    finally:
+        shutil.rmtree(path_to_folder)
+
+
+def test_cached_stages_are_skipped():
+    """
+    Check if stages whose inputs didn't change are skipped and only stages depending on changed input run again
+    """
+    path_to_folder = "res/test_cached_stages"
+    os.makedirs(path_to_folder, exist_ok=True)
+    path_index = f"{path_to_folder}/index.csv"
+    shutil.copy(settings["paths"]["path_index"], path_index)
+    paths = {
+        name: f"{path_to_folder}/{os.path.basename(settings['paths'][name])}"
+        for name in [
+            "path_save_death",
+            "path_save_population",
+            "path_save_index",
+            "path_to_save_input",
+            "path_save_development",
+        ]
+    }
+
+    def make():
+        pipeline = DataPreprocessingPipeline(
+            path_death=settings["paths"]["path_death"],
+            path_population=settings["paths"]["path_population"],
+            path_index=path_index,
+            population_from_api=False,
+            path_to_manifest=f"{path_to_folder}/manifest.json",
+            cache_stages=True,
+            **paths,
+        )
+        pipeline.preprocess_data()
+        pipeline.save_preprocessed_dataset()
+        return pipeline
+
+    try:
+        assert make().skipped == set()
+        saved = pd.read_csv(paths["path_to_save_input"])
+        assert make().skipped == {"death", "population", "index", "app_input"}
+        pd.testing.assert_frame_equal(pd.read_csv(paths["path_to_save_input"]), saved)
+
+        with open(path_index, "a") as file:
+            file.write("\n")
+        assert make().skipped == {"death", "population"}
+        pd.testing.assert_frame_equal(pd.read_csv(paths["path_to_save_input"]), saved)
+        assert make().skipped == {"death", "population", "index", "app_input"}
+    finally:
+        shutil.rmtree(path_to_folder)
+
+
+def test_streaming_without_rows_replaces_old_datasets():
+    """
+    Check if streaming replaces datasets of the previous run when no row of death dataset is left
+    """
+    path_to_folder = "res/test_stream_empty"
+    os.makedirs(path_to_folder, exist_ok=True)
+    paths = {
+        name: f"{path_to_folder}/{name}.csv"
+        for name in [
+            "path_save_death",
+            "path_save_population",
+            "path_save_index",
+            "path_to_save_input",
+            "path_save_development",
+        ]
+    }
+    try:
+        death = pd.read_csv(settings["paths"]["path_death"])
+        death["Code"] = None
+        death.to_csv(f"{path_to_folder}/death.csv", index=False)
+        shutil.copy(settings["paths"]["path_save_death"], paths["path_save_death"])
+        shutil.copy(
+            settings["paths"]["path_to_save_input"], paths["path_to_save_input"]
+        )
+        dp_stream = DataPreprocessingPipeline(
+            path_death=f"{path_to_folder}/death.csv",
+            path_population=settings["paths"]["path_population"],
+            path_index=settings["paths"]["path_index"],
+            population_from_api=False,
+            streaming=True,
+            chunk_size=50,
+            **paths,
+        )
+        dp_stream.preprocess_data()
+        dp_stream.save_preprocessed_dataset()
+        for name in ["path_save_death", "path_to_save_input"]:
+            df = pd.read_csv(paths[name])
+            assert df.empty
+            assert list(df.columns) == list(
+                pd.read_csv(settings["paths"][name]).columns
+            )
+    finally:
+        shutil.rmtree(path_to_folder)
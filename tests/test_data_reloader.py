@@ -0,0 +1,76 @@
+from benchmarks.synthetic import SyntheticDataset
+from death_app.data.data_loader import DataLoader
+from death_app.data.snapshot import SnapshotStore
+from death_app.plots.plotter import Plotter
+from death_app.user_interface.analysis_cache import AnalysisCache
+from death_app.user_interface.data_reloader import DataReloader
+import gc
+import os
+import shutil
+import threading
+import weakref
+
+path_to_folder = "res/test_reloader"
+
+
+def test_new_version_is_swapped_in_background():
+    """
+    Check if old version is returned while new version is loaded and new one is returned after it's loaded
+    """
+    os.makedirs(path_to_folder, exist_ok=True)
+    store = SnapshotStore(
+        f"{path_to_folder}/versions", {"input": f"{path_to_folder}/input.csv"}
+    )
+    release = threading.Event()
+
+    def load(paths):
+        if paths["input"] is None or not paths["input"].startswith(store.path_to_root):
+            return "default"
+        assert release.wait(5)
+        with open(paths["input"]) as file:
+            return file.read()
+
+    try:
+        reloader = DataReloader(store, load, poll_seconds=0)
+        assert reloader.get() == "default"
+        with open(f"{path_to_folder}/new.csv", "w") as file:
+            file.write("new")
+        store.publish({"input": f"{path_to_folder}/new.csv"})
+        assert reloader.get() == "default"
+        loading = reloader.loading
+        release.set()
+        loading.join(5)
+        assert reloader.get() == "new"
+        assert reloader.version == store.current()
+    finally:
+        shutil.rmtree(path_to_folder)
+
+
+def test_old_version_is_released_after_reload():
+    """
+    Check if data loader of old version is garbage collected when new version is swapped in
+    """
+    paths_of_versions = {
+        name: SyntheticDataset(5, 3, 3, seed).write(f"{path_to_folder}/{name}")
+        for seed, name in enumerate(["old", "new"])
+    }
+    store = SnapshotStore(
+        f"{path_to_folder}/versions",
+        dict(zip(["input", "index"], paths_of_versions["old"])),
+    )
+
+    def load(paths):
+        return AnalysisCache(DataLoader(paths["input"], paths["index"]), Plotter())
+
+    try:
+        reloader = DataReloader(store, load, poll_seconds=0)
+        old_loader = weakref.ref(reloader.get().data_loader)
+        assert old_loader().get_list_of_countries()
+        store.publish(dict(zip(["input", "index"], paths_of_versions["new"])))
+        reloader.get()
+        reloader.loading.join(5)
+        assert reloader.get().data_loader is not old_loader()
+        gc.collect()
+        assert old_loader() is None
+    finally:
+        shutil.rmtree(path_to_folder)
@@ -1,7 +1,9 @@
 import pandas as pd
 from death_app.data.data_validator import DataValidator
+from death_app.data.validation_engine import DuplicationCheck, ValidationEngine
 from config import settings
 import os
+import shutil
 import numpy as np
 
 
@@ -570,3 +572,265 @@ def test_code_in_death_and_index():
     ).to_csv(settings["paths"]["path_to_new_index"], index=False)
     assert dv.check_code_in_death_and_index()
     os.remove(settings["paths"]["path_to_new_index"])
+
+
+def test_pipeline_reads_checks_across_chunks():
+    dv_small_chunks = DataValidator(
+        settings["paths"]["path_to_new_death"],
+        settings["paths"]["path_to_new_index"],
+        chunksize=2,
+    )
+    pd.DataFrame(
+        {
+            "country": ["Spain"],
+            "code": ["ESP"],
+            "hdi": [0.720],
+            "development": ["highly"],
+        }
+    ).to_csv(settings["paths"]["path_to_new_index"], index=False)
+    # INCORRECT, gap in years of Italy is in the second chunk
+    pd.DataFrame(
+        {
+            "country": ["Spain", "Spain", "Italy", "Italy"],
+            "code": ["ESP", "ESP", "ITA", "ITA"],
+            "year": [2017, 2018, 2017, 2019],
+            "population": [46593.236, 46797.754, 60536.709, 60421.760],
+            "d: Parkinson's disease": [7.720, 8.036, 5.941, 6.048],
+        }
+    ).to_csv(settings["paths"]["path_to_new_death"], index=False)
+    assert not dv_small_chunks.check_pipeline()
+    # CORRECT
+    pd.DataFrame(
+        {
+            "country": ["Italy", "Spain", "Spain", "Italy"],
+            "code": ["ITA", "ESP", "ESP", "ITA"],
+            "year": [2017, 2017, 2018, 2018],
+            "population": [60536.709, 46593.236, 46797.754, 60421.760],
+            "d: Parkinson's disease": [5.941, 7.720, 8.036, 6.048],
+        }
+    ).to_csv(settings["paths"]["path_to_new_death"], index=False)
+    assert dv_small_chunks.check_pipeline()
+    os.remove(settings["paths"]["path_to_new_death"])
+    os.remove(settings["paths"]["path_to_new_index"])
+
+
+def test_pipeline_in_parallel_partitions():
+    dv_parallel = DataValidator(
+        settings["paths"]["path_to_new_death"],
+        settings["paths"]["path_to_new_index"],
+        processes=2,
+        partition_size=64,
+    )
+    pd.DataFrame(
+        {
+            "country": ["Spain"],
+            "code": ["ESP"],
+            "hdi": [0.720],
+            "development": ["highly"],
+        }
+    ).to_csv(settings["paths"]["path_to_new_index"], index=False)
+    death = pd.DataFrame(
+        {
+            "country": ["Spain", "Spain", "Italy", "Italy"],
+            "code": ["ESP", "ESP", "ITA", "ITA"],
+            "year": [2017, 2018, 2017, 2018],
+            "population": [46593.236, 46797.754, 60536.709, 60421.760],
+            "d: Parkinson's disease": [7.720, 8.036, 5.941, 6.048],
+        }
+    )
+    death.to_csv(settings["paths"]["path_to_new_death"], index=False)
+    assert (
+        len(dv_parallel.engine(dv_parallel.path_to_death_dataset, []).partitions[1])
+        == 2
+    )
+    # CORRECT
+    assert dv_parallel.check_pipeline()
+    # INCORRECT, negative value in the last part
+    death.loc[3, "population"] = -1
+    death.to_csv(settings["paths"]["path_to_new_death"], index=False)
+    assert not dv_parallel.check_pipeline()
+    os.remove(settings["paths"]["path_to_new_death"])
+    os.remove(settings["paths"]["path_to_new_index"])
+
+
+def test_duplication_and_years_across_chunks():
+    dv_small_chunks = DataValidator(
+        settings["paths"]["path_to_new_death"],
+        settings["paths"]["path_to_new_index"],
+        chunksize=2,
+    )
+    # INCORRECT, first row is repeated in the second chunk
+    pd.DataFrame(
+        {
+            "country": ["Spain", "Spain", "Italy", "Spain"],
+            "code": ["ESP", "ESP", "ITA", "ESP"],
+            "year": [2017, 2018, 2017, 2017],
+            "population": [46593.236, 46797.754, 60536.709, 46593.236],
+            "d: Parkinson's disease": [7.720, 8.036, 5.941, 7.720],
+        }
+    ).to_csv(settings["paths"]["path_to_new_death"], index=False)
+    assert not dv_small_chunks.check_duplication_in_death_dataset()
+    assert not dv_small_chunks.check_year_and_country_in_death_dataset()
+    # CORRECT
+    pd.DataFrame(
+        {
+            "country": ["Spain", "Italy", "Italy", "Spain"],
+            "code": ["ESP", "ITA", "ITA", "ESP"],
+            "year": [2018, 2017, 2018, 2017],
+            "population": [46797.754, 60536.709, 60421.760, 46593.236],
+            "d: Parkinson's disease": [8.036, 5.941, 6.048, 7.720],
+        }
+    ).to_csv(settings["paths"]["path_to_new_death"], index=False)
+    assert dv_small_chunks.check_duplication_in_death_dataset()
+    assert dv_small_chunks.check_year_and_country_in_death_dataset()
+    os.remove(settings["paths"]["path_to_new_death"])
+
+
+def test_duplicates_across_partitions_have_lines():
+    """
+    Check if rows repeated from previous part are reported with the same lines and values as in one pass
+    """
+    rows = [["Spain", "ESP", 2000 + year, 1000.0 + year, 1.5] for year in range(12)]
+    rows += [rows[1], rows[7], rows[1], rows[10]]
+    pd.DataFrame(
+        rows,
+        columns=["country", "code", "year", "population", "d: Parkinson's disease"],
+    ).to_csv(settings["paths"]["path_to_new_death"], index=False)
+    samples = []
+    for partition_size in [1 << 20, 200, 64]:
+        engine = ValidationEngine(
+            settings["paths"]["path_to_new_death"],
+            [DuplicationCheck()],
+            chunksize=3,
+            partition_size=partition_size,
+            fail_fast=False,
+        )
+        (check,) = engine.run()
+        assert not check.is_valid
+        samples.append(check.samples)
+    assert len(engine.partitions[1]) > 2
+    assert [sample["line"] for sample in samples[0]] == [14, 15, 16, 17]
+    assert samples[0][0]["values"]["year"] == 2001
+    assert samples[1] == samples[0] and samples[2] == samples[0]
+    os.remove(settings["paths"]["path_to_new_death"])
+
+
+def test_full_report():
+    pd.DataFrame(
+        {
+            "country": ["Spain"],
+            "code": ["ESP"],
+            "hdi": [0.720],
+            "development": ["highly"],
+        }
+    ).to_csv(settings["paths"]["path_to_new_index"], index=False)
+    pd.DataFrame(
+        {
+            "country": ["Spain", "Spain", "Italy", "Italy"],
+            "code": ["ESP", "ESP", "ITA", "ITA"],
+            "year": [2017, 2018, 2017, 2018],
+            "population": [46593.236, -1, 60536.709, 60421.760],
+            "d: Parkinson's disease": [7.720, 8.036, np.nan, 6.048],
+        }
+    ).to_csv(settings["paths"]["path_to_new_death"], index=False)
+    report = dv.validate(fail_fast=False).to_dict()
+    failed = {
+        check["check"]: check for check in report["checks"] if not check["passed"]
+    }
+    assert not report["valid"]
+    assert set(failed) == {"NonNegativeCheck", "PopulationCheck", "NanCheck"}
+    assert [sample["line"] for sample in failed["NanCheck"]["samples"]] == [4]
+    assert all(check["rows_scanned"] == 4 for check in report["checks"][:12])
+    # fail fast report ends at the first failed check
+    report = dv.validate(fail_fast=True).to_dict()
+    assert report["checks"][-1]["check"] == "NonNegativeCheck"
+    os.remove(settings["paths"]["path_to_new_death"])
+    os.remove(settings["paths"]["path_to_new_index"])
+
+
+def test_results_are_cached_by_content(monkeypatch):
+    path_to_cache = settings["dirs"]["raw_data"] + "/test_validation_cache.json"
+    if os.path.exists(path_to_cache):
+        os.remove(path_to_cache)
+    dv_cached = DataValidator(
+        settings["paths"]["path_to_new_death"],
+        settings["paths"]["path_to_new_index"],
+        path_to_cache=path_to_cache,
+    )
+    pd.DataFrame(
+        {
+            "country": ["Spain"],
+            "code": ["ESP"],
+            "hdi": [0.720],
+            "development": ["highly"],
+        }
+    ).to_csv(settings["paths"]["path_to_new_index"], index=False)
+    death = pd.DataFrame(
+        {
+            "country": ["Spain", "Spain", "Italy", "Italy"],
+            "code": ["ESP", "ESP", "ITA", "ITA"],
+            "year": [2017, 2018, 2017, 2018],
+            "population": [46593.236, 46797.754, 60536.709, 60421.760],
+            "d: Parkinson's disease": [7.720, 8.036, 5.941, 6.048],
+        }
+    )
+    death.to_csv(settings["paths"]["path_to_new_death"], index=False)
+    report = dv_cached.validate(fail_fast=True)
+    assert report.is_valid and not report.datasets["death"]["cached"]
+    report = dv_cached.validate(fail_fast=True)
+    assert report.is_valid and report.datasets["death"]["cached"]
+    # changed file is checked again
+    death.loc[3, "population"] = -1
+    death.to_csv(settings["paths"]["path_to_new_death"], index=False)
+    report = dv_cached.validate(fail_fast=False)
+    assert not report.is_valid and not report.datasets["death"]["cached"]
+    assert report.datasets["index"]["cached"]
+    # copy of checked file is only hashed
+    path_to_copy = settings["dirs"]["raw_data"] + "/test_death_copy.csv"
+    shutil.copy(settings["paths"]["path_to_new_death"], path_to_copy)
+    dv_copy = DataValidator(
+        path_to_copy,
+        settings["paths"]["path_to_new_index"],
+        path_to_cache=path_to_cache,
+    )
+    report = dv_copy.validate(fail_fast=False)
+    assert not report.is_valid and report.datasets["death"]["cached"]
+    # file with another size than checked files is read only once, while it's checked
+    hashed = []
+    monkeypatch.setattr(
+        ValidationEngine, "hash_content", lambda engine: hashed.append(engine)
+    )
+    death.loc[3, "population"] = 60421.76123
+    death.to_csv(path_to_copy, index=False)
+    report = dv_copy.validate(fail_fast=False)
+    assert report.is_valid and not report.datasets["death"]["cached"]
+    assert hashed == []
+    os.remove(path_to_copy)
+    os.remove(settings["paths"]["path_to_new_death"])
+    os.remove(settings["paths"]["path_to_new_index"])
+    os.remove(path_to_cache)
+
+
+def test_digest_does_not_depend_on_processes():
+    death = pd.DataFrame(
+        {
+            "country": ["Spain", "Spain", "Italy", "Italy"],
+            "code": ["ESP", "ESP", "ITA", "ITA"],
+            "year": [2017, 2018, 2017, 2018],
+            "population": [46593.236, 46797.754, 60536.709, 60421.760],
+            "d: Parkinson's disease": [7.720, 8.036, 5.941, 6.048],
+        }
+    )
+    death.to_csv(settings["paths"]["path_to_new_death"], index=False)
+    digests = []
+    for processes in [1, 2]:
+        engine = DataValidator(
+            settings["paths"]["path_to_new_death"],
+            settings["paths"]["path_to_new_index"],
+            processes=processes,
+            partition_size=64,
+        ).engine(settings["paths"]["path_to_new_death"], [])
+        engine.run()
+        digests.append(engine.digest)
+    assert digests[0] == digests[1]
+    os.remove(settings["paths"]["path_to_new_death"])
@@ -0,0 +1,83 @@
+from death_app.data.dataset_cache import DatasetCache
+from death_app.data.schema import Schema
+import numpy as np
+import pandas as pd
+import shutil
+import os
+
+path_to_folder = "res/test_cache"
+path_to_dataset = f"{path_to_folder}/input_dataset.csv"
+
+df_example = pd.DataFrame(
+    {
+        "country": ["Spain", "Spain", "Italy", "Italy"],
+        "code": ["ESP", "ESP", "ITA", "ITA"],
+        "year": [2017, 2018, 2017, 2018],
+        "population": [46593.236, 46797.754, 60536.709, 60421.760],
+        "d: Parkinson's disease": [7.720, 8.036, 5.941, 6.048],
+        "d: Acute hepatitis": [1.04, 2.04, 0.08, 0.014],
+    }
+)
+
+
+def save_example() -> DatasetCache:
+    os.makedirs(path_to_folder, exist_ok=True)
+    df_example.to_csv(path_to_dataset, index=False)
+    cache = DatasetCache(path_to_dataset)
+    cache.save(df_example)
+    return cache
+
+
+def test_load_same_dataframe():
+    """
+    Check if cache returns the same data as saved, with compact types
+    """
+    cache = save_example()
+    pd.testing.assert_frame_equal(cache.load(), Schema().apply(df_example))
+    shutil.rmtree(path_to_folder)
+
+
+def test_touched_csv_is_fresh():
+    """
+    Check if cache is still used when csv was only touched
+    """
+    cache = save_example()
+    os.utime(path_to_dataset, ns=(0, 0))
+    assert cache.is_fresh()
+    shutil.rmtree(path_to_folder)
+
+
+def test_changed_csv_is_stale():
+    """
+    Check if cache isn't used when csv changed
+    """
+    cache = save_example()
+    df_example.iloc[:2].to_csv(path_to_dataset, index=False)
+    assert cache.load() is None
+    shutil.rmtree(path_to_folder)
+
+
+def test_exact_cache_keeps_float64():
+    """
+    Check if cache made in exact mode keeps float64 values and isn't used in compact mode
+    """
+    os.makedirs(path_to_folder, exist_ok=True)
+    df_example.to_csv(path_to_dataset, index=False)
+    cache = DatasetCache(path_to_dataset, exact=True)
+    cache.save(df_example)
+    pd.testing.assert_frame_equal(cache.load(), Schema(exact=True).apply(df_example))
+    assert cache.load_causes().dtype == "float64"
+    assert not DatasetCache(path_to_dataset).is_fresh()
+    shutil.rmtree(path_to_folder)
+
+
+def test_rates_are_saved_with_causes():
+    """
+    Check if cache keeps number of deaths per one inhabitant for each row and cause
+    """
+    cache = save_example()
+    causes, rates = cache.load_causes(), cache.load_rates(mmap_mode="r")
+    population = cache.load_keys()["population"].to_numpy()
+    np.testing.assert_array_equal(rates, causes / population[:, None])
+    assert rates.dtype == causes.dtype
+    shutil.rmtree(path_to_folder)
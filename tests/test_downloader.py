@@ -1,4 +1,9 @@
+import hashlib
+import http.server
 import os
+import shutil
+import threading
+import pytest
 from death_app.data.downloader import DataDownloader
 from config import settings
 
@@ -36,3 +41,157 @@ def test_if_population_dataset_exists():
 
 def test_if_index_dataset_exists():
     assert os.path.isfile(settings["paths"]["path_index"])
+
+
+def make_handler(content: bytes, content_type: str = "text/csv", length: bool = True):
+    """
+    Make handler of server of one file with support of Range header, the first response is cut in half
+    :param content: content of file
+    :param content_type: type sent in header
+    :param length: if False Content-Length isn't sent
+    :return: class of handler, each test has its own one
+    """
+
+    class RangeHandler(http.server.BaseHTTPRequestHandler):
+        requests = []
+        encodings = []
+
+        def do_GET(self):
+            start = int(self.headers.get("Range", "bytes=0-")[6:].rstrip("-"))
+            self.requests.append(start)
+            self.encodings.append(self.headers.get("Accept-Encoding"))
+            body = self.content[start:]
+            self.send_response(206 if start else 200)
+            if start:
+                self.send_header(
+                    "Content-Range",
+                    f"bytes {start}-{len(self.content) - 1}/{len(self.content)}",
+                )
+            self.send_header("Content-Type", content_type)
+            if length:
+                self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if len(self.requests) == 1:
+                body = body[: len(body) // 2]
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    RangeHandler.content = content
+    return RangeHandler
+
+
+def serve(handler) -> tuple[http.server.ThreadingHTTPServer, str]:
+    """
+    :param handler: class of handler
+    :return: running server and url of file
+    """
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/data.bin"
+
+
+path_to_folder = "res/test_downloads"
+path_to_save = f"{path_to_folder}/data.bin"
+
+
+def test_interrupted_download_is_resumed_and_verified():
+    """
+    Check if download cut by server is resumed from part, renamed when complete and checked against manifest
+    """
+    handler = make_handler(bytes(range(256)) * 4096)
+    server, url = serve(handler)
+    try:
+        downloader = DataDownloader(url, path_to_save, path_to_folder)
+        with open(path_to_save, "rb") as file:
+            assert file.read() == handler.content
+        # the second request asks only for the rest of file
+        assert len(handler.requests) == 2 and handler.requests[1] > 0
+        assert not os.path.exists(downloader.path_to_part)
+        assert not os.path.exists(downloader.path_to_record)
+        # compressed response would be counted in other bytes than file
+        assert set(handler.encodings) == {"identity"}
+        assert downloader.read_entry()["size"] == len(handler.content)
+
+        # damaged file is downloaded again
+        with open(path_to_save, "r+b") as file:
+            file.truncate(100)
+        DataDownloader(url, path_to_save, path_to_folder)
+        assert os.path.getsize(path_to_save) == len(handler.content)
+
+        # content which doesn't match manifest is rejected
+        os.remove(path_to_save)
+        handler.content = bytes(len(handler.content))
+        with pytest.raises(ValueError):
+            DataDownloader(url, path_to_save, path_to_folder)
+        assert not os.path.exists(path_to_save)
+    finally:
+        server.shutdown()
+        shutil.rmtree(path_to_folder)
+
+
+def test_first_download_is_verified_against_declared_checksum():
+    """
+    Check if the first download which doesn't match declared size and sha256 is rejected
+    """
+    content = bytes(range(256)) * 16
+    server, url = serve(make_handler(content))
+    try:
+        with pytest.raises(ValueError):
+            DataDownloader(
+                url,
+                path_to_save,
+                path_to_folder,
+                expected={"size": len(content), "sha256": "0" * 64},
+            )
+        assert not os.path.exists(path_to_save)
+        DataDownloader(
+            url,
+            path_to_save,
+            path_to_folder,
+            expected={
+                "size": len(content),
+                "sha256": hashlib.sha256(content).hexdigest(),
+            },
+        )
+        assert os.path.getsize(path_to_save) == len(content)
+    finally:
+        server.shutdown()
+        shutil.rmtree(path_to_folder)
+
+
+@pytest.mark.parametrize(
+    "content_type, length", [("text/html; charset=utf-8", True), ("text/csv", False)]
+)
+def test_page_or_response_without_size_is_rejected(content_type, length):
+    """
+    Check if web page, e.g. page of exceeded quota, and response without Content-Length aren't saved
+    """
+    server, url = serve(make_handler(b"<html></html>" * 100, content_type, length))
+    try:
+        with pytest.raises(ValueError):
+            DataDownloader(url, path_to_save, path_to_folder)
+        assert not os.path.exists(path_to_save)
+    finally:
+        server.shutdown()
+        shutil.rmtree(path_to_folder)
+
+
+def test_part_without_record_is_downloaded_again():
+    """
+    Check if part left without record of file it was downloaded from isn't resumed
+    """
+    handler = make_handler(bytes(range(256)) * 64)
+    server, url = serve(handler)
+    try:
+        os.makedirs(path_to_folder, exist_ok=True)
+        with open(f"{path_to_save}.part", "wb") as file:
+            file.write(b"x" * 100)
+        DataDownloader(url, path_to_save, path_to_folder)
+        with open(path_to_save, "rb") as file:
+            assert file.read() == handler.content
+        assert handler.requests[0] == 0
+    finally:
+        server.shutdown()
+        shutil.rmtree(path_to_folder)
@@ -0,0 +1,97 @@
+from death_app.metrics import Metrics, NULL_SPAN
+import os
+import shutil
+import threading
+
+path_to_folder = "res/test_metrics"
+
+
+def test_disabled_metrics_record_nothing():
+    """
+    Check if disabled metrics return shared span which does nothing and don't count events
+    """
+    metrics = Metrics()
+    with metrics.span("loader.get_summed_data") as span:
+        pass
+    metrics.count("dataset_cache.hits")
+    assert span is NULL_SPAN
+    assert metrics.snapshot() == {"spans": {}, "counters": {}}
+
+
+def test_spans_and_counters_are_recorded():
+    """
+    Check if enabled metrics record times of spans, counters and counters of collectors
+    """
+    metrics = Metrics(enabled=True)
+    for _ in range(2):
+        with metrics.span("plotter.plot_summed"):
+            pass
+    metrics.count("dataset_cache.hits")
+    metrics.count("dataset_cache.hits", 2)
+    metrics.collect("analysis_cache", lambda: {"plot_summed.misses": 1})
+    snapshot = metrics.snapshot()
+    stats = snapshot["spans"]["plotter.plot_summed"]
+    assert stats["count"] == 2
+    assert 0 <= stats["last"] <= stats["max"] <= stats["total"]
+    assert snapshot["counters"] == {
+        "dataset_cache.hits": 3,
+        "analysis_cache.plot_summed.misses": 1,
+    }
+    metrics.reset()
+    assert metrics.snapshot()["spans"] == {}
+
+
+def test_metrics_are_written_in_prometheus_format():
+    """
+    Check if written file contains span and counter in text format of Prometheus
+    """
+    metrics = Metrics(enabled=True)
+    metrics.record("loader.data", 0.5)
+    metrics.count("dataset_cache.misses")
+    path_to_file = f"{path_to_folder}/death_app.prom"
+    try:
+        metrics.write(path_to_file)
+        with open(path_to_file) as file:
+            lines = file.read().splitlines()
+        assert 'death_app_span_seconds_count{span="loader.data"} 1' in lines
+        assert 'death_app_span_seconds_sum{span="loader.data"} 0.5' in lines
+        assert 'death_app_events_total{name="dataset_cache.misses"} 1' in lines
+        assert os.listdir(path_to_folder) == ["death_app.prom"]
+    finally:
+        shutil.rmtree(path_to_folder, ignore_errors=True)
+
+
+def test_sessions_write_metrics_at_the_same_time():
+    """
+    Check if threads writing the same metrics file don't collide and leave no temporary files
+    """
+    metrics = Metrics(enabled=True)
+    metrics.record("loader.data", 0.5)
+    path_to_file = f"{path_to_folder}/death_app.prom"
+    errors = []
+
+    def write():
+        try:
+            for _ in range(50):
+                metrics.write(path_to_file)
+        except Exception as error:
+            errors.append(error)
+
+    try:
+        threads = [threading.Thread(target=write) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        assert os.listdir(path_to_folder) == ["death_app.prom"]
+        with open(path_to_file) as file:
+            assert file.read() == metrics.to_prometheus()
+        # scraper can run as another user, file has permissions like file made by open
+        with open(f"{path_to_folder}/plain", "w"):
+            pass
+        assert (
+            os.stat(path_to_file).st_mode == os.stat(f"{path_to_folder}/plain").st_mode
+        )
+    finally:
+        shutil.rmtree(path_to_folder, ignore_errors=True)
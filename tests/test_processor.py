@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from death_app.data.processor import DataProcessor
 
@@ -128,3 +129,37 @@ def test_get_trend_cause_in_each_year_by_level_of_develop():
     # then
     df_example.drop(columns=["development"], axis=1, inplace=True)
     assert list(df_result.columns) == ["year", "development", cause]
+
+
+def test_get_top_k():
+    """
+    Test if get_top_k returns top N values in each row sorted descending
+    """
+    # given
+    values = np.array([[1.0, 4.0, 3.0, 2.0], [5.0, 0.5, np.nan, 7.0]])
+
+    # when
+    top_values, top_columns = processor.get_top_k(values, 2)
+
+    # then
+    assert (top_columns == np.array([[1, 2], [3, 0]])).all()
+    assert (top_values == np.array([[4.0, 3.0], [7.0, 5.0]])).all()
+
+
+def test_get_top_causes_in_each_year_per_capita():
+    """
+    Test if dataprocessor returns the same result for number of deaths and for deaths per one inhabitant
+    """
+    # given
+    top = 2
+    df_rates = df_example.copy()
+    df_rates.iloc[:, 4:] = df_rates.iloc[:, 4:].divide(df_rates["population"], axis=0)
+
+    # when
+    df_result = processor.get_top_causes_in_each_year(df_example, top)
+    df_result_per_capita = processor.get_top_causes_in_each_year(
+        df_rates, top, per_capita=True
+    )
+
+    # then
+    pd.testing.assert_frame_equal(df_result, df_result_per_capita)
@@ -0,0 +1,70 @@
+from death_app.data.snapshot import SnapshotStore
+import os
+import shutil
+
+path_to_folder = "res/test_snapshots"
+
+
+def make_store():
+    os.makedirs(path_to_folder, exist_ok=True)
+    return SnapshotStore(
+        f"{path_to_folder}/versions",
+        {
+            "input": f"{path_to_folder}/input.csv",
+            "index": f"{path_to_folder}/index.csv",
+        },
+        keep=2,
+    )
+
+
+def test_published_version_becomes_current():
+    """
+    Check if files are published together, default paths are used before the first version
+    and old versions are removed
+    """
+    store = make_store()
+    try:
+        assert store.current() is None
+        assert store.paths(None) == store.defaults
+        versions = []
+        for number in range(3):
+            for name in ["new_input.csv", "new_index.csv"]:
+                with open(f"{path_to_folder}/{name}", "w") as file:
+                    file.write(f"{name},{number}\n")
+            versions.append(
+                store.publish(
+                    {
+                        "input": f"{path_to_folder}/new_input.csv",
+                        "index": f"{path_to_folder}/new_index.csv",
+                    },
+                    move=number > 0,
+                )
+            )
+        assert store.current() == versions[-1]
+        assert store.versions() == versions[1:]
+        paths = store.paths(store.current())
+        with open(paths["input"]) as file:
+            assert file.read() == "new_input.csv,2\n"
+        assert os.path.basename(paths["index"]) == "index.csv"
+        assert not os.path.exists(f"{path_to_folder}/new_input.csv")
+    finally:
+        shutil.rmtree(path_to_folder)
+
+
+def test_same_files_are_current():
+    """
+    Check if files with the same content as current version don't have to be published
+    """
+    store = make_store()
+    sources = {"input": f"{path_to_folder}/new_input.csv"}
+    try:
+        with open(sources["input"], "w") as file:
+            file.write("input\n")
+        assert not store.is_current(sources)
+        store.publish(sources)
+        assert store.is_current(sources)
+        with open(sources["input"], "a") as file:
+            file.write("changed\n")
+        assert not store.is_current(sources)
+    finally:
+        shutil.rmtree(path_to_folder)
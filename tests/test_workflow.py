@@ -0,0 +1,53 @@
+from death_app.data.workflow import Stage, Workflow
+import threading
+import pytest
+
+
+def test_independent_stages_run_at_the_same_time():
+    """
+    Check if independent stages run concurrently and dependent stage waits for them
+    """
+    barrier = threading.Barrier(2, timeout=5)
+    finished = []
+    workflow = Workflow(
+        [
+            Stage("first", lambda: finished.append(barrier.wait() is not None)),
+            Stage("second", lambda: finished.append(barrier.wait() is not None)),
+            Stage("join", lambda: finished.append(len(finished)), ["first", "second"]),
+        ],
+        report=lambda message: None,
+    )
+    seconds = workflow.run()
+    assert finished == [True, True, 2]
+    assert list(seconds) == ["first", "second", "join"]
+
+
+def test_failed_stage_skips_dependent_stages():
+    """
+    Check if stages which depend on failed stage aren't started and error is raised
+    """
+    started = []
+
+    def fail():
+        raise ValueError("wrong data")
+
+    workflow = Workflow(
+        [
+            Stage("fail", fail),
+            Stage("next", lambda: started.append("next"), ["fail"]),
+        ],
+        report=lambda message: None,
+    )
+    with pytest.raises(ValueError, match="wrong data"):
+        workflow.run()
+    assert started == []
+
+
+def test_cycle_is_rejected():
+    """
+    Check if stages which depend on each other are rejected
+    """
+    with pytest.raises(ValueError):
+        Workflow([Stage("a", print, ["b"]), Stage("b", print, ["a"])])
+    with pytest.raises(ValueError):
+        Workflow([Stage("a", print, ["unknown"])])